@@ -0,0 +1,33 @@
+"""Add engagement polling columns to post_platform_status
+
+Revision ID: 3f8a1d5c7e26
+Revises: b41f6c2d8e90
+Create Date: 2026-10-19 14:21:08.553901
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f8a1d5c7e26'
+down_revision: Union[str, Sequence[str], None] = 'b41f6c2d8e90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('post_platform_status', sa.Column('next_poll_at', sa.DateTime(), nullable=True))
+    op.add_column('post_platform_status', sa.Column('engagement_polled_at', sa.DateTime(), nullable=True))
+    op.create_index(op.f('ix_post_platform_status_next_poll_at'), 'post_platform_status', ['next_poll_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_post_platform_status_next_poll_at'), table_name='post_platform_status')
+    with op.batch_alter_table('post_platform_status') as batch_op:
+        batch_op.drop_column('engagement_polled_at')
+        batch_op.drop_column('next_poll_at')
@@ -0,0 +1,67 @@
+"""Add full-text search index over scheduled_posts content and hashtags
+
+SQLite: external-content FTS5 table kept in sync by triggers.
+PostgreSQL: generated tsvector column with a GIN index.
+
+Revision ID: 4b7d9e1a3c52
+Revises: e2a6b3f9c471
+Create Date: 2026-10-19 20:15:37.902441
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b7d9e1a3c52'
+down_revision: Union[str, Sequence[str], None] = 'e2a6b3f9c471'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        op.execute(
+            "CREATE VIRTUAL TABLE scheduled_posts_fts USING fts5("
+            "content, hashtags, content='scheduled_posts', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+        )
+        op.execute(
+            "CREATE TRIGGER scheduled_posts_fts_ai AFTER INSERT ON scheduled_posts BEGIN "
+            "INSERT INTO scheduled_posts_fts(rowid, content, hashtags) VALUES (new.id, new.content, new.hashtags); END"
+        )
+        op.execute(
+            "CREATE TRIGGER scheduled_posts_fts_ad AFTER DELETE ON scheduled_posts BEGIN "
+            "INSERT INTO scheduled_posts_fts(scheduled_posts_fts, rowid, content, hashtags) "
+            "VALUES ('delete', old.id, old.content, old.hashtags); END"
+        )
+        op.execute(
+            "CREATE TRIGGER scheduled_posts_fts_au AFTER UPDATE OF content, hashtags ON scheduled_posts BEGIN "
+            "INSERT INTO scheduled_posts_fts(scheduled_posts_fts, rowid, content, hashtags) "
+            "VALUES ('delete', old.id, old.content, old.hashtags); "
+            "INSERT INTO scheduled_posts_fts(rowid, content, hashtags) VALUES (new.id, new.content, new.hashtags); END"
+        )
+        op.execute("INSERT INTO scheduled_posts_fts(scheduled_posts_fts) VALUES ('rebuild')")
+    elif dialect == "postgresql":
+        op.execute(
+            "ALTER TABLE scheduled_posts ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('simple', coalesce(hashtags, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(content, '')), 'B')) STORED"
+        )
+        op.execute("CREATE INDEX ix_scheduled_posts_search_vector ON scheduled_posts USING gin (search_vector)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        op.execute("DROP TRIGGER IF EXISTS scheduled_posts_fts_au")
+        op.execute("DROP TRIGGER IF EXISTS scheduled_posts_fts_ad")
+        op.execute("DROP TRIGGER IF EXISTS scheduled_posts_fts_ai")
+        op.execute("DROP TABLE IF EXISTS scheduled_posts_fts")
+    elif dialect == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_scheduled_posts_search_vector")
+        op.execute("ALTER TABLE scheduled_posts DROP COLUMN IF EXISTS search_vector")
@@ -0,0 +1,52 @@
+"""Add recurring_series and scheduled_posts.series_id
+
+Revision ID: 6e1c8f3a9b27
+Revises: 4b7d9e1a3c52
+Create Date: 2026-10-19 21:34:08.551902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6e1c8f3a9b27'
+down_revision: Union[str, Sequence[str], None] = '4b7d9e1a3c52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('recurring_series',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('content', sa.Text(), nullable=False),
+    sa.Column('image_url', sa.String(length=500), nullable=True),
+    sa.Column('platforms', sa.JSON(), nullable=True),
+    sa.Column('hashtags', sa.Text(), nullable=True),
+    sa.Column('frequency', sa.String(length=20), nullable=False),
+    sa.Column('interval', sa.Integer(), nullable=False),
+    sa.Column('weekdays', sa.String(length=20), nullable=True),
+    sa.Column('starts_at', sa.DateTime(), nullable=False),
+    sa.Column('until', sa.DateTime(), nullable=True),
+    sa.Column('count', sa.Integer(), nullable=True),
+    sa.Column('occurrences', sa.Integer(), nullable=True),
+    sa.Column('next_post_id', sa.Integer(), nullable=True),
+    sa.Column('active', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_recurring_series_id'), 'recurring_series', ['id'], unique=False)
+    op.add_column('scheduled_posts', sa.Column('series_id', sa.Integer(), nullable=True))
+    op.create_index(op.f('ix_scheduled_posts_series_id'), 'scheduled_posts', ['series_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_scheduled_posts_series_id'), table_name='scheduled_posts')
+    # Plain ALTER TABLE (SQLite >= 3.35): a batch copy would drop the search triggers
+    op.drop_column('scheduled_posts', 'series_id')
+    op.drop_index(op.f('ix_recurring_series_id'), table_name='recurring_series')
+    op.drop_table('recurring_series')
@@ -0,0 +1,45 @@
+"""Add post_platform_status
+
+Revision ID: 7d2e4b9a1c3f
+Revises: 5cf0eb9d9ccd
+Create Date: 2026-10-19 09:12:31.402118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d2e4b9a1c3f'
+down_revision: Union[str, Sequence[str], None] = '5cf0eb9d9ccd'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('post_platform_status',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('post_id', sa.Integer(), nullable=False),
+    sa.Column('platform', sa.String(length=50), nullable=False),
+    sa.Column('status', sa.String(length=50), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=True),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('external_id', sa.String(length=100), nullable=True),
+    sa.Column('published_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('post_id', 'platform', name='uq_post_platform_status_post_platform')
+    )
+    op.create_index(op.f('ix_post_platform_status_id'), 'post_platform_status', ['id'], unique=False)
+    op.create_index(op.f('ix_post_platform_status_post_id'), 'post_platform_status', ['post_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_post_platform_status_post_id'), table_name='post_platform_status')
+    op.drop_index(op.f('ix_post_platform_status_id'), table_name='post_platform_status')
+    op.drop_table('post_platform_status')
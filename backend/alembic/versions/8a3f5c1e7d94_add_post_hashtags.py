@@ -0,0 +1,115 @@
+"""Add post_hashtags, hashtag_stats and hashtag_stats_progress
+
+Backfills post_hashtags and per-platform usage counts from existing posts;
+engagement is folded in by the first app.hashtags pass (its watermark starts
+at 0, so all existing post_analytics rows are included).
+
+Revision ID: 8a3f5c1e7d94
+Revises: 6e1c8f3a9b27
+Create Date: 2026-10-19 23:41:17.305826
+
+"""
+from collections import Counter
+from typing import Sequence, Union
+import json
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a3f5c1e7d94'
+down_revision: Union[str, Sequence[str], None] = '6e1c8f3a9b27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+
+
+# Same rules as app.hashtags.parse_tags / _platforms at the time of this migration
+def _tags(hashtags):
+    if not hashtags:
+        return []
+    words = re.findall(r"#(\w+)", hashtags) if "#" in hashtags else re.findall(r"\w+", hashtags)
+    return list(dict.fromkeys(word.lower()[:100] for word in words))
+
+
+def _platforms(value):
+    for _ in range(2):
+        if not isinstance(value, str):
+            break
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return [platform.strip().lower() for platform in value.split(",") if platform.strip()]
+    return [str(platform).lower() for platform in value] if isinstance(value, list) else []
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    post_hashtags = op.create_table('post_hashtags',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('post_id', sa.Integer(), nullable=False),
+    sa.Column('tag', sa.String(length=100), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('post_id', 'tag', name='uq_post_hashtags_post_tag')
+    )
+    op.create_index(op.f('ix_post_hashtags_id'), 'post_hashtags', ['id'], unique=False)
+    op.create_index(op.f('ix_post_hashtags_tag'), 'post_hashtags', ['tag'], unique=False)
+    hashtag_stats = op.create_table('hashtag_stats',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('tag', sa.String(length=100), nullable=False),
+    sa.Column('platform', sa.String(length=50), nullable=False),
+    sa.Column('posts', sa.Integer(), nullable=True),
+    sa.Column('samples', sa.Integer(), nullable=True),
+    sa.Column('engagement_total', sa.Float(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('tag', 'platform', name='uq_hashtag_stats_tag_platform')
+    )
+    op.create_index(op.f('ix_hashtag_stats_id'), 'hashtag_stats', ['id'], unique=False)
+    op.create_index('ix_hashtag_stats_platform_posts', 'hashtag_stats', ['platform', 'posts'], unique=False)
+    progress = op.create_table('hashtag_stats_progress',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('last_analytics_id', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    # Backfill from existing posts, keyset-paged by id
+    connection = op.get_bind()
+    posts = sa.table('scheduled_posts', sa.column('id', sa.Integer), sa.column('hashtags', sa.Text), sa.column('platforms', sa.Text))
+    usage = Counter()
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(posts.c.id, posts.c.hashtags, posts.c.platforms)
+            .where(posts.c.id > last_id, posts.c.hashtags.isnot(None))
+            .order_by(posts.c.id).limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        tag_rows = []
+        for row in rows:
+            tags = _tags(row.hashtags)
+            tag_rows.extend({"post_id": row.id, "tag": tag} for tag in tags)
+            usage.update((tag, platform) for tag in tags for platform in _platforms(row.platforms))
+        if tag_rows:
+            op.bulk_insert(post_hashtags, tag_rows)
+        last_id = rows[-1].id
+    if usage:
+        op.bulk_insert(hashtag_stats, [
+            {"tag": tag, "platform": platform, "posts": count, "samples": 0, "engagement_total": 0.0}
+            for (tag, platform), count in usage.items()
+        ])
+    op.bulk_insert(progress, [{"id": 1, "last_analytics_id": 0}])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('hashtag_stats_progress')
+    op.drop_index('ix_hashtag_stats_platform_posts', table_name='hashtag_stats')
+    op.drop_index(op.f('ix_hashtag_stats_id'), table_name='hashtag_stats')
+    op.drop_table('hashtag_stats')
+    op.drop_index(op.f('ix_post_hashtags_tag'), table_name='post_hashtags')
+    op.drop_index(op.f('ix_post_hashtags_id'), table_name='post_hashtags')
+    op.drop_table('post_hashtags')
@@ -0,0 +1,90 @@
+"""Add post_analytics_rollup and post_analytics created_at index
+
+Optionally converts post_analytics to a table partitioned by month on
+PostgreSQL (ANALYTICS_PARTITIONING=monthly), so app.retention can drop
+expired months instead of deleting their rows.
+
+Revision ID: 9c4e7a2b5d18
+Revises: 3f8a1d5c7e26
+Create Date: 2026-10-19 16:02:44.718320
+
+"""
+from datetime import datetime, timedelta
+from typing import Sequence, Union
+import os
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c4e7a2b5d18'
+down_revision: Union[str, Sequence[str], None] = '3f8a1d5c7e26'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _next_month(value: datetime) -> datetime:
+    return (value.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _partition_by_month():
+    """Recreate post_analytics as a range-partitioned table, one partition per month of data"""
+    bind = op.get_bind()
+    first = bind.execute(sa.text("SELECT min(created_at) FROM post_analytics")).scalar() or datetime.utcnow()
+    month = first.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    last = _next_month(_next_month(datetime.utcnow()))
+
+    # created_at becomes part of the primary key
+    op.execute("UPDATE post_analytics SET created_at = now() AT TIME ZONE 'utc' WHERE created_at IS NULL")
+    op.execute("ALTER TABLE post_analytics RENAME TO post_analytics_unpartitioned")
+    op.execute("ALTER TABLE post_analytics_unpartitioned RENAME CONSTRAINT post_analytics_pkey TO post_analytics_unpartitioned_pkey")
+    op.execute("ALTER INDEX IF EXISTS ix_post_analytics_id RENAME TO ix_post_analytics_unpartitioned_id")
+    op.execute(
+        "CREATE TABLE post_analytics (LIKE post_analytics_unpartitioned INCLUDING DEFAULTS) "
+        "PARTITION BY RANGE (created_at)"
+    )
+    # The primary key of a partitioned table has to include the partition key
+    op.execute("ALTER TABLE post_analytics ADD PRIMARY KEY (id, created_at)")
+    op.execute("ALTER SEQUENCE IF EXISTS post_analytics_id_seq OWNED BY post_analytics.id")
+    while month <= last:
+        upper = _next_month(month)
+        op.execute(
+            f"CREATE TABLE post_analytics_p{month:%Y%m} PARTITION OF post_analytics "
+            f"FOR VALUES FROM ('{month.isoformat(sep=' ')}') TO ('{upper.isoformat(sep=' ')}')"
+        )
+        month = upper
+    op.execute("CREATE TABLE post_analytics_default PARTITION OF post_analytics DEFAULT")
+    op.execute("INSERT INTO post_analytics SELECT * FROM post_analytics_unpartitioned")
+    op.execute("DROP TABLE post_analytics_unpartitioned")
+    op.create_index(op.f('ix_post_analytics_id'), 'post_analytics', ['id'], unique=False)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('post_analytics_rollup',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('resolution', sa.String(length=10), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('platform', sa.String(length=50), nullable=True),
+    sa.Column('samples', sa.Integer(), nullable=True),
+    sa.Column('views', sa.BigInteger(), nullable=True),
+    sa.Column('likes', sa.BigInteger(), nullable=True),
+    sa.Column('shares', sa.BigInteger(), nullable=True),
+    sa.Column('comments', sa.BigInteger(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('resolution', 'bucket_start', 'platform', name='uq_post_analytics_rollup_bucket')
+    )
+    op.create_index(op.f('ix_post_analytics_rollup_id'), 'post_analytics_rollup', ['id'], unique=False)
+
+    if op.get_bind().dialect.name == "postgresql" and os.getenv("ANALYTICS_PARTITIONING", "").lower() == "monthly":
+        _partition_by_month()
+    op.create_index('ix_post_analytics_created_at', 'post_analytics', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # A partitioned post_analytics stays partitioned; it works unchanged with the old code
+    op.drop_index('ix_post_analytics_created_at', table_name='post_analytics')
+    op.drop_index(op.f('ix_post_analytics_rollup_id'), table_name='post_analytics_rollup')
+    op.drop_table('post_analytics_rollup')
@@ -0,0 +1,28 @@
+"""Add scheduled_posts (status, scheduled_time) index
+
+Revision ID: b41f6c2d8e90
+Revises: 7d2e4b9a1c3f
+Create Date: 2026-10-19 10:03:47.215530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b41f6c2d8e90'
+down_revision: Union[str, Sequence[str], None] = '7d2e4b9a1c3f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_scheduled_posts_status_scheduled_time', 'scheduled_posts', ['status', 'scheduled_time'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_scheduled_posts_status_scheduled_time', table_name='scheduled_posts')
@@ -0,0 +1,34 @@
+"""Add claimed_at to scheduled_posts and post_platform_status
+
+Revision ID: c5d2a7e9f013
+Revises: 8a3f5c1e7d94
+Create Date: 2026-10-20 10:12:44.218307
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5d2a7e9f013'
+down_revision: Union[str, Sequence[str], None] = '8a3f5c1e7d94'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('scheduled_posts', sa.Column('claimed_at', sa.DateTime(), nullable=True))
+    op.add_column('post_platform_status', sa.Column('claimed_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_post_platform_status_status_claimed_at', 'post_platform_status', ['status', 'claimed_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_post_platform_status_status_claimed_at', table_name='post_platform_status')
+    with op.batch_alter_table('post_platform_status') as batch_op:
+        batch_op.drop_column('claimed_at')
+    with op.batch_alter_table('scheduled_posts') as batch_op:
+        batch_op.drop_column('claimed_at')
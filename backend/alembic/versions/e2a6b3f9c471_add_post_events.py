@@ -0,0 +1,39 @@
+"""Add post_events
+
+Revision ID: e2a6b3f9c471
+Revises: 9c4e7a2b5d18
+Create Date: 2026-10-19 18:40:12.306157
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2a6b3f9c471'
+down_revision: Union[str, Sequence[str], None] = '9c4e7a2b5d18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('post_events',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('post_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=50), nullable=False),
+    sa.Column('error_message', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_post_events_id'), 'post_events', ['id'], unique=False)
+    op.create_index(op.f('ix_post_events_created_at'), 'post_events', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_post_events_created_at'), table_name='post_events')
+    op.drop_index(op.f('ix_post_events_id'), table_name='post_events')
+    op.drop_table('post_events')
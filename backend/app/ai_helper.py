@@ -1,21 +1,68 @@
-import openai
 import os
 from typing import List
 import random
 import asyncio
+import time
 from dotenv import load_dotenv
 
+from .metrics import AI_CALL_LATENCY, AI_CACHE_REQUESTS
+from .profiling import profile_job
+
 load_dotenv()
 
-# Set OpenAI API key from environment
-openai.api_key = os.getenv("OPENAI_API_KEY")
+# OpenAI API key from environment; the openai package itself is only imported
+# on the first real AI call so startup doesn't pay for it
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+
+_openai = None
+
+def ai_enabled() -> bool:
+    return bool(OPENAI_API_KEY) and OPENAI_API_KEY.startswith('sk-')
+
+def get_openai():
+    """Import and configure the openai module on first use"""
+    global _openai
+    if _openai is None:
+        import openai
+        openai.api_key = OPENAI_API_KEY
+        _openai = openai
+    return _openai
+
+# How long AI insights / best-time recommendations are reused before asking the model again
+AI_CACHE_TTL_SECONDS = float(os.getenv("AI_CACHE_TTL_SECONDS", "300"))
+
+_cache = {}
+
+def _cache_get(operation: str, key):
+    """Return a cached AI result or None, recording the hit/miss"""
+    entry = _cache.get((operation, key))
+    if entry and entry[0] > time.monotonic():
+        AI_CACHE_REQUESTS.labels(operation, "hit").inc()
+        return entry[1]
+    AI_CACHE_REQUESTS.labels(operation, "miss").inc()
+    return None
 
+def _cache_set(operation: str, key, value):
+    _cache[(operation, key)] = (time.monotonic() + AI_CACHE_TTL_SECONDS, value)
+
+@profile_job("ai.hashtags")
 async def suggest_hashtags(content: str) -> List[str]:
+    """Hashtag suggestions, tags with the best measured engagement first"""
+    suggestions = await _generate_hashtags(content)
+    try:
+        from .hashtags import rank_suggestions
+        return await asyncio.to_thread(rank_suggestions, suggestions)
+    except Exception as e:
+        print(f"Error ranking hashtags: {e}")
+        return suggestions
+
+async def _generate_hashtags(content: str) -> List[str]:
     """Generate hashtag suggestions using AI or fallback to mock"""
     try:
-        if openai.api_key and openai.api_key.startswith('sk-'):
+        if ai_enabled():
             # Use OpenAI API
-            response = await openai.ChatCompletion.acreate(
+            started = time.perf_counter()
+            response = await get_openai().ChatCompletion.acreate(
                 model="gpt-3.5-turbo",
                 messages=[
                     {
@@ -30,6 +77,7 @@ async def suggest_hashtags(content: str) -> List[str]:
                 max_tokens=100,
                 temperature=0.7
             )
+            AI_CALL_LATENCY.labels("hashtags", "openai").observe(time.perf_counter() - started)
             hashtags_text = response.choices[0].message.content.strip()
             hashtags = [tag.strip() for tag in hashtags_text.split() if tag.startswith('#')]
             return hashtags[:8] if hashtags else generate_mock_hashtags(content)
@@ -62,30 +110,43 @@ def generate_mock_hashtags(content: str) -> List[str]:
     all_hashtags = base_hashtags + content_hashtags[:3]
     return random.sample(all_hashtags, min(6, len(all_hashtags)))
 
+BEST_TIME_MESSAGES = [
+    {
+        "role": "system",
+        "content": "You are a social media analytics expert. Provide practical advice about the best times to post on social media for maximum engagement."
+    },
+    {
+        "role": "user",
+        "content": "What are the best times to post on social media platforms (Twitter, Facebook, Instagram) for maximum engagement? Give specific time recommendations."
+    }
+]
+
+def _best_time_result(recommendation: str) -> dict:
+    return {
+        "recommendation": recommendation,
+        "optimal_times": ["9:00 AM", "1:00 PM", "7:00 PM"]
+    }
+
+@profile_job("ai.best_time")
 async def suggest_best_posting_time() -> dict:
     """Suggest optimal posting time using AI or return best practices"""
+    cached = _cache_get("best_time", None)
+    if cached is not None:
+        return cached
     try:
-        if openai.api_key and openai.api_key.startswith('sk-'):
-            response = await openai.ChatCompletion.acreate(
+        if ai_enabled():
+            started = time.perf_counter()
+            response = await get_openai().ChatCompletion.acreate(
                 model="gpt-3.5-turbo",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a social media analytics expert. Provide practical advice about the best times to post on social media for maximum engagement."
-                    },
-                    {
-                        "role": "user",
-                        "content": "What are the best times to post on social media platforms (Twitter, Facebook, Instagram) for maximum engagement? Give specific time recommendations."
-                    }
-                ],
+                messages=BEST_TIME_MESSAGES,
                 max_tokens=200,
                 temperature=0.5
             )
+            AI_CALL_LATENCY.labels("best_time", "openai").observe(time.perf_counter() - started)
             recommendation = response.choices[0].message.content.strip()
-            return {
-                "recommendation": recommendation,
-                "optimal_times": ["9:00 AM", "1:00 PM", "7:00 PM"]
-            }
+            result = _best_time_result(recommendation)
+            _cache_set("best_time", None, result)
+            return result
         else:
             return get_mock_best_times()
     except Exception as e:
@@ -105,11 +166,15 @@ def get_mock_best_times() -> dict:
         "optimal_times": ["9:00 AM", "10:00 AM", "1:00 PM", "7:00 PM", "8:00 PM"]
     }
 
-async def generate_analytics_insight(posts_data: dict) -> dict:
-    """Generate AI insights for analytics dashboard"""
-    try:
-        if openai.api_key and openai.api_key.startswith('sk-'):
-            prompt = f"""
+def _insight_cache_key(posts_data: dict):
+    return (
+        posts_data.get('posts_published', 0),
+        posts_data.get('posts_scheduled', 0),
+        posts_data.get('posts_failed', 0),
+    )
+
+def _insight_messages(posts_data: dict) -> list:
+    prompt = f"""
             Based on these social media analytics:
             - Published posts: {posts_data.get('posts_published', 0)}
             - Scheduled posts: {posts_data.get('posts_scheduled', 0)}
@@ -117,26 +182,43 @@ async def generate_analytics_insight(posts_data: dict) -> dict:
             
             Provide a brief insight and 2-3 actionable recommendations to improve social media performance.
             """
-            
-            response = await openai.ChatCompletion.acreate(
+    return [
+        {"role": "system", "content": "You are a social media analytics expert providing actionable insights."},
+        {"role": "user", "content": prompt}
+    ]
+
+def _insight_result(insight: str) -> dict:
+    return {
+        "insight": insight,
+        "recommendations": [
+            "Schedule posts during peak engagement hours",
+            "Use AI-suggested hashtags to increase reach",
+            "Monitor failed posts and retry with optimized content"
+        ]
+    }
+
+@profile_job("ai.insight")
+async def generate_analytics_insight(posts_data: dict) -> dict:
+    """Generate AI insights for analytics dashboard"""
+    cache_key = _insight_cache_key(posts_data)
+    cached = _cache_get("insight", cache_key)
+    if cached is not None:
+        return cached
+    try:
+        if ai_enabled():
+            started = time.perf_counter()
+            response = await get_openai().ChatCompletion.acreate(
                 model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are a social media analytics expert providing actionable insights."},
-                    {"role": "user", "content": prompt}
-                ],
+                messages=_insight_messages(posts_data),
                 max_tokens=150,
                 temperature=0.6
             )
+            AI_CALL_LATENCY.labels("insight", "openai").observe(time.perf_counter() - started)
             
             insight = response.choices[0].message.content.strip()
-            return {
-                "insight": insight,
-                "recommendations": [
-                    "Schedule posts during peak engagement hours",
-                    "Use AI-suggested hashtags to increase reach",
-                    "Monitor failed posts and retry with optimized content"
-                ]
-            }
+            result = _insight_result(insight)
+            _cache_set("insight", cache_key, result)
+            return result
         else:
             return get_mock_insights(posts_data)
     except Exception as e:
@@ -184,4 +266,88 @@ def get_mock_insights(posts_data: dict) -> dict:
         "insight": insight,
         "recommendations": recommendations,
         "best_performing_platform": "Twitter"  # Mock data
-    }
\ No newline at end of file
+    }
+
+# Streaming variants: yield {"event": "token", "text": ...} as the model produces
+# text, then {"event": "done", "result": ...} with the same dict the
+# non-streaming functions return. Cache hits and the mock fallback are sent
+# at once; a completed stream is cached like a normal call.
+
+# Give up on the model (and use the mock answer) if the first token takes longer
+AI_STREAM_FIRST_TOKEN_SECONDS = float(os.getenv("AI_STREAM_FIRST_TOKEN_SECONDS", "5"))
+
+async def _stream_completion(operation: str, messages: list, max_tokens: int, temperature: float):
+    """Yield the text deltas of a streamed chat completion"""
+    started = time.perf_counter()
+    response = await asyncio.wait_for(
+        get_openai().ChatCompletion.acreate(
+            model="gpt-3.5-turbo",
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True
+        ),
+        timeout=AI_STREAM_FIRST_TOKEN_SECONDS
+    )
+    chunks = response.__aiter__()
+    first = True
+    while True:
+        try:
+            if first:
+                chunk = await asyncio.wait_for(chunks.__anext__(), timeout=AI_STREAM_FIRST_TOKEN_SECONDS)
+            else:
+                chunk = await chunks.__anext__()
+        except StopAsyncIteration:
+            break
+        text = chunk.choices[0].delta.get("content") if chunk.choices else None
+        if not text:
+            continue
+        if first:
+            AI_CALL_LATENCY.labels(operation, "openai_first_token").observe(time.perf_counter() - started)
+            first = False
+        yield text
+    AI_CALL_LATENCY.labels(operation, "openai_stream").observe(time.perf_counter() - started)
+
+async def _stream_with_fallback(operation: str, cache_key, messages: list, max_tokens: int,
+                                temperature: float, make_result, text_field: str, fallback):
+    cached = _cache_get(operation, cache_key)
+    if cached is not None:
+        yield {"event": "token", "text": cached[text_field]}
+        yield {"event": "done", "result": cached}
+        return
+    if not ai_enabled():
+        result = fallback()
+        yield {"event": "token", "text": result[text_field]}
+        yield {"event": "done", "result": result}
+        return
+
+    parts = []
+    try:
+        async for text in _stream_completion(operation, messages, max_tokens, temperature):
+            parts.append(text)
+            yield {"event": "token", "text": text}
+    except Exception as e:
+        print(f"Error streaming {operation}: {e or type(e).__name__}")
+        result = fallback()
+        if not parts:
+            yield {"event": "token", "text": result[text_field]}
+        # The done event carries the full answer; clients show it instead of a cut-off stream
+        yield {"event": "done", "result": result}
+        return
+    result = make_result("".join(parts).strip())
+    _cache_set(operation, cache_key, result)
+    yield {"event": "done", "result": result}
+
+def stream_analytics_insight(posts_data: dict):
+    """generate_analytics_insight() as a stream of tokens"""
+    return _stream_with_fallback(
+        "insight", _insight_cache_key(posts_data), _insight_messages(posts_data), 150, 0.6,
+        _insight_result, "insight", lambda: get_mock_insights(posts_data)
+    )
+
+def stream_best_posting_time():
+    """suggest_best_posting_time() as a stream of tokens"""
+    return _stream_with_fallback(
+        "best_time", None, BEST_TIME_MESSAGES, 200, 0.5,
+        _best_time_result, "recommendation", get_mock_best_times
+    )
@@ -0,0 +1,91 @@
+from datetime import datetime
+from typing import List, Optional
+import asyncio
+import atexit
+import logging
+import os
+import threading
+
+from sqlalchemy import insert
+
+from .database import engine
+from .models import PostAnalytics
+
+logger = logging.getLogger(__name__)
+
+# Buffered rows are written when this many are waiting...
+ANALYTICS_FLUSH_ROWS = int(os.getenv("ANALYTICS_FLUSH_ROWS", "500"))
+# ...or this long after the first one arrived, whichever comes first
+ANALYTICS_FLUSH_INTERVAL = float(os.getenv("ANALYTICS_FLUSH_INTERVAL_MS", "1000")) / 1000
+
+
+class AnalyticsBuffer:
+    """Write-behind buffer for PostAnalytics rows.
+
+    Rows are collected in memory and inserted with one executemany INSERT in a
+    single transaction, instead of a commit + refresh per row.
+    """
+
+    def __init__(self, flush_rows: int = ANALYTICS_FLUSH_ROWS, flush_interval: float = ANALYTICS_FLUSH_INTERVAL):
+        self.flush_rows = max(1, flush_rows)
+        self.flush_interval = flush_interval
+        self._rows: List[dict] = []
+        self._lock = threading.Lock()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def add(self, post_id: int, platform: str, views: int = 0, likes: int = 0,
+            shares: int = 0, comments: int = 0):
+        """Queue one analytics row; flushed by size, by timer or on shutdown"""
+        with self._lock:
+            self._rows.append({
+                "post_id": post_id,
+                "platform": platform,
+                "views": views,
+                "likes": likes,
+                "shares": shares,
+                "comments": comments,
+                "engagement_rate": (likes + shares) / max(views, 1) * 100,
+                "created_at": datetime.utcnow(),
+            })
+            pending = len(self._rows)
+        if pending >= self.flush_rows:
+            self.flush()
+        elif self._timer is None:
+            self._arm_timer()
+
+    def _arm_timer(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop (scripts, tests): write through
+            self.flush()
+            return
+        self._timer = loop.call_later(self.flush_interval, self.flush)
+
+    def flush(self) -> int:
+        """Insert everything buffered so far; returns the number of rows written"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        with self._lock:
+            rows, self._rows = self._rows, []
+        if not rows:
+            return 0
+        try:
+            with engine.begin() as connection:
+                connection.execute(insert(PostAnalytics.__table__), rows)
+        except Exception as e:
+            logger.error(f"Failed to write {len(rows)} analytics rows: {str(e)}")
+            with self._lock:
+                # Keep them for the next flush rather than losing them
+                self._rows[:0] = rows
+            return 0
+        return len(rows)
+
+    def pending(self) -> int:
+        return len(self._rows)
+
+
+buffer = AnalyticsBuffer()
+# Last resort for processes that exit without running the app's shutdown
+atexit.register(buffer.flush)
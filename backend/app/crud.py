@@ -1,5 +1,5 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from sqlalchemy import Text, cast, func, desc, or_, update
 from typing import List, Optional
 import json
 from datetime import datetime, timedelta
@@ -8,6 +8,11 @@ import uuid
 import os
 
 from . import models, schemas
+from .metrics import UPLOAD_BYTES
+from .engagement import next_poll_time
+from . import events
+# Registers the ORM events that keep post_hashtags in sync
+from . import hashtags  # noqa: F401
 
 # Posts CRUD
 def create_post(db: Session, post: schemas.PostCreate, image_url: Optional[str] = None):
@@ -37,15 +42,146 @@ def update_post_status(db: Session, post_id: int, status: str, error_message: Op
         db_post.status = status
         if error_message:
             db_post.error_message = error_message
+        elif status == "published":
+            # Errors of earlier attempts (e.g. "retry 1/3 ...") no longer apply
+            db_post.error_message = None
         if status == "published":
             db_post.published_at = datetime.utcnow()
+        # Same transaction as the status change; streamed by app.events
+        events.record(db, post_id, status, error_message)
         db.commit()
         db.refresh(db_post)
+        events.notify()
     return db_post
 
 def get_posts_by_status(db: Session, status: str):
     return db.query(models.ScheduledPost).filter(models.ScheduledPost.status == status).all()
 
+def count_posts_by_status(db: Session, status: str) -> int:
+    return db.query(func.count(models.ScheduledPost.id)).filter(models.ScheduledPost.status == status).scalar()
+
+def claim_post(db: Session, post_id: int) -> bool:
+    """Atomically move a post from scheduled to publishing; False if someone else got it"""
+    claimed = db.query(models.ScheduledPost).filter(
+        models.ScheduledPost.id == post_id,
+        models.ScheduledPost.status == "scheduled"
+    ).update({"status": "publishing", "claimed_at": datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+    return claimed == 1
+
+def cancel_post(db: Session, post_id: int) -> bool:
+    """Move a post that has not started publishing to cancelled; False if it already did"""
+    cancelled = db.query(models.ScheduledPost).filter(
+        models.ScheduledPost.id == post_id,
+        models.ScheduledPost.status == "scheduled"
+    ).update({"status": "cancelled"}, synchronize_session=False)
+    if cancelled:
+        events.record(db, post_id, "cancelled")
+    db.commit()
+    if cancelled:
+        events.notify()
+    return cancelled == 1
+
+# Bulk operations: one set-based UPDATE over every matching post that has not
+# started publishing
+def _bulk_conditions(ids: Optional[List[int]] = None, scheduled_from: Optional[datetime] = None,
+                     scheduled_to: Optional[datetime] = None, platform: Optional[str] = None):
+    posts = models.ScheduledPost.__table__
+    # Served by ix_scheduled_posts_status_scheduled_time
+    conditions = [posts.c.status == "scheduled"]
+    if ids:
+        conditions.append(posts.c.id.in_(ids))
+    if scheduled_from:
+        conditions.append(posts.c.scheduled_time >= scheduled_from)
+    if scheduled_to:
+        conditions.append(posts.c.scheduled_time < scheduled_to)
+    if platform:
+        stored = cast(posts.c.platforms, Text)
+        conditions.append(or_(*(stored.ilike(pattern, escape="\\") for pattern in platform_patterns(platform))))
+    return conditions
+
+def platform_patterns(platform: str) -> List[str]:
+    """Case-insensitive LIKE patterns (escape character "\\") matching one whole element of platforms.
+
+    platforms is stored as JSON text, encoded once or twice; both forms of the
+    quoted element are matched, so "x" never selects posts for "xy".
+    """
+    element = json.dumps(platform.lower())
+    return [f"%{_escape_like(form)}%" for form in (element, json.dumps(element)[1:-1])]
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def bulk_cancel_posts(db: Session, **filters) -> List[tuple]:
+    """Cancel every matching scheduled post; returns [(id, series_id)] of the cancelled ones"""
+    posts = models.ScheduledPost.__table__
+    rows = db.execute(
+        update(posts).where(*_bulk_conditions(**filters)).values(status="cancelled")
+        .returning(posts.c.id, posts.c.series_id)
+    ).all()
+    events.record_many(db, [row.id for row in rows], "cancelled")
+    db.commit()
+    if rows:
+        events.notify()
+    return [tuple(row) for row in rows]
+
+def bulk_shift_posts(db: Session, seconds: int, **filters) -> List[tuple]:
+    """Move every matching scheduled post by `seconds`; returns [(id, new scheduled_time)]"""
+    posts = models.ScheduledPost.__table__
+    if db.get_bind().dialect.name == "sqlite":
+        # Keep SQLAlchemy's "YYYY-MM-DD HH:MM:SS.ffffff" storage format; shifts are whole seconds
+        new_time = func.strftime("%Y-%m-%d %H:%M:%S", posts.c.scheduled_time, f"{seconds:+d} seconds") \
+            .concat(func.substr(posts.c.scheduled_time, 20))
+    else:
+        new_time = posts.c.scheduled_time + timedelta(seconds=seconds)
+    rows = db.execute(
+        update(posts).where(*_bulk_conditions(**filters)).values(scheduled_time=new_time)
+        .returning(posts.c.id, posts.c.scheduled_time)
+    ).all()
+    db.commit()
+    return [tuple(row) for row in rows]
+
+# Per-platform publish state
+def claim_platform_retry(db: Session, post_id: int, platform: str) -> bool:
+    """Atomically take a pending retry of one platform; False if someone else got it"""
+    claimed = db.query(models.PostPlatformStatus).filter(
+        models.PostPlatformStatus.post_id == post_id,
+        models.PostPlatformStatus.platform == platform,
+        models.PostPlatformStatus.status == "retrying"
+    ).update({"status": "publishing", "claimed_at": datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+    return claimed == 1
+
+def get_platform_states(db: Session, post_id: int):
+    rows = db.query(models.PostPlatformStatus).filter(models.PostPlatformStatus.post_id == post_id).all()
+    return {row.platform: row for row in rows}
+
+def record_platform_attempt(db: Session, post_id: int, platform: str, success: bool,
+                            error: Optional[str] = None, next_attempt_at: Optional[datetime] = None,
+                            external_id: Optional[str] = None):
+    """Record one publish attempt; the caller commits (update_post_status does)"""
+    state = db.query(models.PostPlatformStatus).filter(
+        models.PostPlatformStatus.post_id == post_id,
+        models.PostPlatformStatus.platform == platform
+    ).first()
+    if not state:
+        state = models.PostPlatformStatus(post_id=post_id, platform=platform, attempts=0)
+        db.add(state)
+    state.attempts = (state.attempts or 0) + 1
+    if success:
+        state.status = "published"
+        state.published_at = datetime.utcnow()
+        state.external_id = external_id
+        # First engagement poll (app.engagement) a few minutes after publishing
+        state.next_poll_at = next_poll_time(state.published_at, state.published_at) if external_id else None
+        state.last_error = None
+        state.next_attempt_at = None
+    else:
+        state.status = "retrying" if next_attempt_at else "failed"
+        state.last_error = error
+        state.next_attempt_at = next_attempt_at
+    return state
+
 # Product Customizations CRUD
 def create_customization(db: Session, customization: schemas.CustomizationCreate, image_data: Optional[str] = None):
     image_url = None
@@ -62,6 +198,7 @@ def create_customization(db: Session, customization: schemas.CustomizationCreate
             # Save the image
             with open(file_path, "wb") as f:
                 f.write(binary_data)
+            UPLOAD_BYTES.labels("customization").inc(len(binary_data))
             image_url = f"/{file_path}"
         except Exception as e:
             print(f"Error saving image: {e}")
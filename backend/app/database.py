@@ -2,8 +2,12 @@ from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
+import time
 from dotenv import load_dotenv
 
+from .metrics import DB_SESSION_DURATION
+from . import query_stats
+
 load_dotenv()
 
 # Database URL - fallback to SQLite for easy testing
@@ -17,12 +21,38 @@ if DATABASE_URL.startswith("sqlite"):
 else:
     engine = create_engine(DATABASE_URL)
 
+if query_stats.SQL_INSTRUMENTATION:
+    query_stats.install(engine)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+
+def schema_is_current() -> bool:
+    """True when the database is stamped with the latest Alembic revision.
+
+    Lets startup skip Base.metadata.create_all(), which inspects every table.
+    Any problem (no alembic_version table, Alembic not installed) returns False
+    so the caller falls back to create_all.
+    """
+    try:
+        from alembic.config import Config
+        from alembic.runtime.migration import MigrationContext
+        from alembic.script import ScriptDirectory
+
+        heads = set(ScriptDirectory.from_config(Config(ALEMBIC_INI)).get_heads())
+        with engine.connect() as connection:
+            current = set(MigrationContext.configure(connection).get_current_heads())
+        return bool(current) and current == heads
+    except Exception:
+        return False
+
 def get_db():
     db = SessionLocal()
+    started = time.perf_counter()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+        DB_SESSION_DURATION.labels("request").observe(time.perf_counter() - started)
\ No newline at end of file
@@ -0,0 +1,214 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import asyncio
+import logging
+import os
+import time
+
+from sqlalchemy import bindparam, insert, select, update
+
+from .database import SessionLocal, engine
+from .models import PostAnalytics, PostPlatformStatus
+from .platforms import get_adapter, get_adapters, get_http_client, get_limiter
+from . import hashtags, metrics
+
+logger = logging.getLogger(__name__)
+
+ENGAGEMENT_POLLING = os.getenv("ENGAGEMENT_POLLING", "true").lower() == "true"
+# How often the poller looks for posts that are due
+ENGAGEMENT_POLL_TICK_SECONDS = float(os.getenv("ENGAGEMENT_POLL_TICK_SECONDS", "30"))
+# Request budget shared by all platforms; posts over budget stay due for the next tick
+ENGAGEMENT_REQUESTS_PER_MINUTE = float(os.getenv("ENGAGEMENT_REQUESTS_PER_MINUTE", "60"))
+# Decaying cadence: a post is polled again after a quarter of its age, clamped to
+# [MIN, MAX], so fresh posts every few minutes and week-old ones a few times a day
+ENGAGEMENT_POLL_MIN_SECONDS = float(os.getenv("ENGAGEMENT_POLL_MIN_SECONDS", "300"))
+ENGAGEMENT_POLL_MAX_SECONDS = float(os.getenv("ENGAGEMENT_POLL_MAX_SECONDS", "21600"))
+ENGAGEMENT_POLL_MAX_AGE_DAYS = float(os.getenv("ENGAGEMENT_POLL_MAX_AGE_DAYS", "7"))
+
+ENGAGEMENT_FIELDS = ("views", "likes", "shares", "comments")
+
+_poller_task: Optional[asyncio.Task] = None
+
+
+def next_poll_time(published_at: datetime, now: datetime) -> Optional[datetime]:
+    """When to poll a post next; None once it is too old to be worth polling"""
+    age = (now - published_at).total_seconds()
+    if age >= ENGAGEMENT_POLL_MAX_AGE_DAYS * 86400:
+        return None
+    interval = min(ENGAGEMENT_POLL_MAX_SECONDS, max(ENGAGEMENT_POLL_MIN_SECONDS, age / 4))
+    return now + timedelta(seconds=interval)
+
+
+def _plan_requests(rows, budget: int) -> List[tuple]:
+    """Group due rows (freshest first) into per-platform requests and keep the first `budget`"""
+    requests, open_chunks = [], {}
+    for row in rows:
+        chunk = open_chunks.get(row.platform)
+        if chunk is None:
+            chunk = open_chunks[row.platform] = []
+            requests.append((row.platform, chunk))
+        chunk.append(row)
+        if len(chunk) >= get_adapter(row.platform).engagement_batch_size:
+            del open_chunks[row.platform]
+    return requests[:budget]
+
+
+async def _fetch(platform: str, rows) -> Dict[str, dict]:
+    adapter = get_adapter(platform)
+    limiter = get_limiter(platform)
+    await limiter.acquire()
+    started = time.perf_counter()
+    overloaded, retry_after = False, None
+    try:
+        engagement = await adapter.fetch_engagement(get_http_client(), [row.external_id for row in rows])
+        metrics.ENGAGEMENT_POLL_REQUESTS.labels(platform, "success").inc()
+        return engagement
+    except Exception as e:
+        response = getattr(e, "response", None)
+        status_code = response.status_code if response is not None else None
+        overloaded = status_code is None or status_code == 429 or status_code >= 500
+        if status_code == 429:
+            retry_after = float(response.headers.get("Retry-After", 0) or 0)
+        metrics.ENGAGEMENT_POLL_REQUESTS.labels(platform, "error").inc()
+        logger.warning(f"Engagement poll of {len(rows)} {platform} posts failed: {str(e)}")
+        return {}
+    finally:
+        limiter.release(time.perf_counter() - started, overloaded, retry_after)
+
+
+def _due_rows(now: datetime, platforms: List[str], max_rows: int):
+    """Published posts due for a poll, freshest first"""
+    db = SessionLocal()
+    try:
+        return db.query(
+            PostPlatformStatus.id, PostPlatformStatus.post_id, PostPlatformStatus.platform,
+            PostPlatformStatus.external_id, PostPlatformStatus.published_at
+        ).filter(
+            PostPlatformStatus.next_poll_at <= now,
+            PostPlatformStatus.status == "published",
+            PostPlatformStatus.external_id.isnot(None),
+            PostPlatformStatus.platform.in_(platforms)
+        ).order_by(PostPlatformStatus.published_at.desc()).limit(max_rows).all()
+    finally:
+        db.close()
+
+
+def _apply(polled: List[tuple], now: datetime):
+    """Write only the analytics rows whose numbers changed, then move every polled post to its next poll time"""
+    post_ids = sorted({row.post_id for rows, _ in polled for row in rows})
+    db = SessionLocal()
+    try:
+        current = {}
+        for start in range(0, len(post_ids), 500):
+            chunk = post_ids[start:start + 500]
+            for analytics in db.query(PostAnalytics).filter(PostAnalytics.post_id.in_(chunk)).order_by(PostAnalytics.id):
+                # Latest row per (post, platform) wins
+                current[(analytics.post_id, analytics.platform)] = analytics
+    finally:
+        db.close()
+
+    inserts, updates, schedule = [], [], []
+    for rows, engagement in polled:
+        for row in rows:
+            item = engagement.get(row.external_id)
+            if item is None:
+                continue
+            values = {field: int(item.get(field) or 0) for field in ENGAGEMENT_FIELDS}
+            values["engagement_rate"] = (values["likes"] + values["shares"]) / max(values["views"], 1) * 100
+            existing = current.get((row.post_id, row.platform))
+            if existing is None:
+                inserts.append({"post_id": row.post_id, "platform": row.platform, "created_at": now, **values})
+            elif any(getattr(existing, field) != values[field] for field in ENGAGEMENT_FIELDS):
+                updates.append({"analytics_id": existing.id, "post_id": row.post_id, "platform": row.platform, **values})
+            else:
+                continue
+            metrics.ENGAGEMENT_ROWS_CHANGED.labels(row.platform).inc()
+        for row in rows:
+            schedule.append({"status_id": row.id, "next_poll": next_poll_time(row.published_at, now), "polled": now})
+
+    table = PostAnalytics.__table__
+    status_table = PostPlatformStatus.__table__
+    with engine.begin() as connection:
+        if inserts:
+            connection.execute(insert(table), inserts)
+        if updates:
+            # Rates as committed, locked until this transaction ends, for hashtag_stats below
+            previous = {}
+            for start in range(0, len(updates), 500):
+                chunk = [item["analytics_id"] for item in updates[start:start + 500]]
+                previous.update(connection.execute(
+                    select(table.c.id, table.c.engagement_rate).where(table.c.id.in_(chunk)).with_for_update()
+                ).all())
+            connection.execute(
+                update(table).where(table.c.id == bindparam("analytics_id")).values(
+                    **{field: bindparam(field) for field in ENGAGEMENT_FIELDS + ("engagement_rate",)}
+                ),
+                updates,
+            )
+            # Rows rewritten in place are not new to the hashtag stats pass
+            hashtags.fold_engagement_changes(connection, [
+                (item["analytics_id"], item["post_id"], item["platform"],
+                 previous.get(item["analytics_id"]), item["engagement_rate"])
+                for item in updates
+            ])
+        if schedule:
+            connection.execute(
+                update(status_table).where(status_table.c.id == bindparam("status_id")).values(
+                    next_poll_at=bindparam("next_poll"), engagement_polled_at=bindparam("polled")
+                ),
+                schedule,
+            )
+    return len(inserts) + len(updates)
+
+
+async def poll_once(now: Optional[datetime] = None) -> int:
+    """Refresh engagement for due posts within one tick's request budget; returns rows changed"""
+    now = now or datetime.utcnow()
+    platforms = [name for name, adapter in get_adapters().items() if adapter.supports_engagement]
+    budget = max(1, int(ENGAGEMENT_REQUESTS_PER_MINUTE * ENGAGEMENT_POLL_TICK_SECONDS / 60))
+    max_rows = budget * max(get_adapter(name).engagement_batch_size for name in platforms) if platforms else 0
+    if not max_rows:
+        return 0
+
+    # Database work runs in a thread so the event loop keeps serving requests
+    rows = await asyncio.to_thread(_due_rows, now, platforms, max_rows)
+    if not rows:
+        return 0
+
+    requests = _plan_requests(rows, budget)
+    results = await asyncio.gather(*(_fetch(platform, chunk) for platform, chunk in requests))
+    # Failed requests leave their posts due, so they are picked up again next tick
+    polled = [(chunk, engagement) for (_, chunk), engagement in zip(requests, results) if engagement]
+    changed = await asyncio.to_thread(_apply, polled, now) if polled else 0
+    logger.info(f"Engagement poll: {len(requests)} requests, {sum(len(c) for c, _ in polled)} posts, {changed} rows changed")
+    return changed
+
+
+async def _run():
+    while True:
+        try:
+            await poll_once()
+        except Exception as e:
+            logger.error(f"Engagement poll failed: {str(e)}")
+        await asyncio.sleep(ENGAGEMENT_POLL_TICK_SECONDS)
+
+
+def start_poller():
+    """Start polling in the background if enabled and any platform has a metrics endpoint"""
+    global _poller_task
+    if not ENGAGEMENT_POLLING or _poller_task is not None:
+        return
+    if not any(adapter.supports_engagement for adapter in get_adapters().values()):
+        return
+    _poller_task = asyncio.create_task(_run())
+
+
+async def stop_poller():
+    global _poller_task
+    if _poller_task is not None:
+        _poller_task.cancel()
+        try:
+            await _poller_task
+        except asyncio.CancelledError:
+            pass
+    _poller_task = None
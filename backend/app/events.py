@@ -0,0 +1,243 @@
+"""Post status change events for Server-Sent Events clients.
+
+crud.update_post_status() writes a post_events row in the same transaction as
+the status change. Each process runs one tailer that reads new rows (one
+indexed query for all of its clients) and fans them out to subscriber queues,
+so events from publisher workers reach clients of every API process. Local
+changes wake the tailer immediately; on PostgreSQL (psycopg2) other processes
+are woken by LISTEN/NOTIFY, elsewhere they are seen within EVENTS_POLL_SECONDS.
+The row id is the SSE event id, so clients resume with Last-Event-ID.
+
+Ids are not committed in order when several processes write (a transaction
+may commit a lower id after a higher one is visible), so the tailer re-reads
+the last EVENTS_LOOKBACK_IDS ids on every pass and delivers ids it has not
+seen yet. Database reads run in a thread, off the event loop.
+"""
+from datetime import datetime
+from typing import List, Optional, Set
+import asyncio
+import json
+import logging
+import os
+
+from sqlalchemy import insert, text
+
+from .database import SessionLocal, engine
+from .models import PostEvent
+
+logger = logging.getLogger(__name__)
+
+EVENTS_POLL_SECONDS = float(os.getenv("EVENTS_POLL_SECONDS", "0.5"))
+# Events a slow client may fall behind by before it is disconnected (it can resume)
+EVENTS_CLIENT_QUEUE_SIZE = int(os.getenv("EVENTS_CLIENT_QUEUE_SIZE", "1000"))
+# Events read per query while replaying to a resuming client
+EVENTS_REPLAY_LIMIT = int(os.getenv("EVENTS_REPLAY_LIMIT", "1000"))
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+# How far below the newest delivered id the tailer looks for late commits
+EVENTS_LOOKBACK_IDS = int(os.getenv("EVENTS_LOOKBACK_IDS", "100"))
+
+NOTIFY_CHANNEL = "post_events"
+
+
+def record(db, post_id: int, status: str, error_message: Optional[str] = None):
+    """Add a status change event to the caller's transaction"""
+    db.add(PostEvent(post_id=post_id, status=status, error_message=error_message))
+    if engine.dialect.name == "postgresql":
+        # Delivered to listeners when the transaction commits
+        db.execute(text(f"NOTIFY {NOTIFY_CHANNEL}"))
+
+
+def record_many(db, post_ids: List[int], status: str):
+    """Add the same status change for many posts to the caller's transaction (one INSERT)"""
+    if not post_ids:
+        return
+    db.execute(insert(PostEvent.__table__), [
+        {"post_id": post_id, "status": status, "created_at": datetime.utcnow()} for post_id in post_ids
+    ])
+    if engine.dialect.name == "postgresql":
+        db.execute(text(f"NOTIFY {NOTIFY_CHANNEL}"))
+
+
+def format_event(event: PostEvent) -> str:
+    data = {
+        "post_id": event.post_id,
+        "status": event.status,
+        "error_message": event.error_message,
+        "created_at": event.created_at.isoformat() if event.created_at else None,
+    }
+    return f"id: {event.id}\nevent: status\ndata: {json.dumps(data)}\n\n"
+
+
+def _events_after(last_id: int, limit: int) -> List[PostEvent]:
+    db = SessionLocal()
+    try:
+        return db.query(PostEvent).filter(PostEvent.id > last_id).order_by(PostEvent.id).limit(limit).all()
+    finally:
+        db.close()
+
+
+def _recent_ids() -> List[int]:
+    """Ids within the lookback window below the newest one"""
+    db = SessionLocal()
+    try:
+        latest = db.query(PostEvent.id).order_by(PostEvent.id.desc()).first()
+        if not latest:
+            return []
+        return [row[0] for row in db.query(PostEvent.id).filter(PostEvent.id > latest[0] - EVENTS_LOOKBACK_IDS)]
+    finally:
+        db.close()
+
+
+class EventHub:
+    """Per-process fan-out of post_events rows to SSE subscribers"""
+
+    def __init__(self):
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.last_id = 0
+        # Ids delivered within the lookback window
+        self._delivered: Set[int] = set()
+        self._wake: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._listen_connection = None
+
+    def notify(self):
+        """Wake the tailer now (safe to call from any thread)"""
+        if self._loop is not None and self._wake is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._wake.set)
+            except RuntimeError:
+                # Loop already closed
+                pass
+
+    async def subscribe(self) -> asyncio.Queue:
+        self._ensure_started()
+        if not self.subscribers:
+            # The tailer idles without subscribers; start from now, not from where it stopped
+            recent = await asyncio.to_thread(_recent_ids)
+            self.last_id = max(recent, default=0)
+            self._delivered = set(recent)
+        queue = asyncio.Queue(maxsize=EVENTS_CLIENT_QUEUE_SIZE)
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers.discard(queue)
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._loop = asyncio.get_running_loop()
+            self._wake = asyncio.Event()
+            self._listen()
+            self._task = asyncio.create_task(self._tail())
+
+    def _listen(self):
+        """PostgreSQL: wake on NOTIFY from other processes instead of waiting for the next poll"""
+        if engine.dialect.name != "postgresql" or engine.dialect.driver != "psycopg2":
+            return
+        try:
+            connection = engine.raw_connection()
+            dbapi_connection = connection.driver_connection
+            dbapi_connection.autocommit = True
+            dbapi_connection.cursor().execute(f"LISTEN {NOTIFY_CHANNEL}")
+
+            def on_notify():
+                dbapi_connection.poll()
+                dbapi_connection.notifies.clear()
+                self._wake.set()
+
+            self._loop.add_reader(dbapi_connection.fileno(), on_notify)
+            self._listen_connection = connection
+        except Exception as e:
+            logger.warning(f"LISTEN {NOTIFY_CHANNEL} failed, falling back to polling: {str(e)}")
+
+    async def _tail(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=EVENTS_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if not self.subscribers:
+                continue
+            floor = max(0, self.last_id - EVENTS_LOOKBACK_IDS)
+            try:
+                rows = await asyncio.to_thread(_events_after, floor, 500)
+            except Exception as e:
+                logger.error(f"Reading post events failed: {str(e)}")
+                continue
+            self._delivered = {event_id for event_id in self._delivered if event_id > floor}
+            new_events = [event for event in rows if event.id not in self._delivered]
+            for event in new_events:
+                message = (event.id, format_event(event))
+                for queue in list(self.subscribers):
+                    try:
+                        queue.put_nowait(message)
+                    except asyncio.QueueFull:
+                        # Too slow; end its stream so it reconnects with Last-Event-ID
+                        self.subscribers.discard(queue)
+                        while not queue.empty():
+                            queue.get_nowait()
+                        queue.put_nowait(None)
+                self._delivered.add(event.id)
+                self.last_id = max(self.last_id, event.id)
+            if len(rows) == 500:
+                self._wake.set()
+
+    async def stop(self):
+        if self._listen_connection is not None:
+            try:
+                self._loop.remove_reader(self._listen_connection.driver_connection.fileno())
+                self._listen_connection.close()
+            except Exception:
+                pass
+            self._listen_connection = None
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+hub = EventHub()
+
+
+def notify():
+    hub.notify()
+
+
+async def stream(last_event_id: Optional[int] = None):
+    """SSE body: replay events after last_event_id, then live events and heartbeats"""
+    queue = await hub.subscribe()
+    try:
+        # The live queue may repeat replayed events; late commits can arrive below them
+        replayed = set()
+        if last_event_id is not None:
+            # Page up to what the hub had delivered when this client subscribed;
+            # anything newer comes through the queue
+            caught_up, after = hub.last_id, last_event_id
+            while after < caught_up:
+                page = await asyncio.to_thread(_events_after, after, EVENTS_REPLAY_LIMIT)
+                for event in page:
+                    yield format_event(event)
+                    replayed.add(event.id)
+                if len(page) < EVENTS_REPLAY_LIMIT:
+                    break
+                after = page[-1].id
+        # Tell the browser how long to wait before reconnecting
+        yield f"retry: {int(EVENTS_POLL_SECONDS * 1000) + 500}\n\n"
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=EVENTS_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if item is None:
+                return
+            event_id, message = item
+            if event_id not in replayed:
+                yield message
+    finally:
+        hub.unsubscribe(queue)
@@ -0,0 +1,346 @@
+"""Hashtag index and per-tag performance.
+
+ScheduledPost.hashtags is free text; its tags are parsed into post_hashtags
+(indexed on tag) whenever a post is inserted, updated or deleted through the
+ORM. hashtag_stats holds, per tag and platform, how many posts use the tag and
+the summed engagement_rate of their post_analytics rows. Usage is adjusted in
+the same flush as the post; engagement is folded in by a background pass that
+reads only post_analytics rows newer than its watermark, and rows the
+engagement poller rewrites in place below the watermark add the change of
+their rate in the same transaction, so top-tag queries are index lookups on
+hashtag_stats instead of scans over posts and analytics.
+
+Rows written with Core inserts (the migration backfill, benchmarks) bypass the
+ORM events.
+
+    python -m app.hashtags    # one engagement pass
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import asyncio
+import json
+import logging
+import os
+import re
+
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from .database import engine
+from .models import HashtagStats, HashtagStatsProgress, PostAnalytics, PostHashtag, ScheduledPost
+
+logger = logging.getLogger(__name__)
+
+HASHTAG_STATS = os.getenv("HASHTAG_STATS", "true").lower() == "true"
+HASHTAG_STATS_INTERVAL_SECONDS = float(os.getenv("HASHTAG_STATS_INTERVAL_SECONDS", "300"))
+# post_analytics ids folded per transaction
+HASHTAG_STATS_BATCH_SIZE = int(os.getenv("HASHTAG_STATS_BATCH_SIZE", "5000"))
+# Rows younger than this are left for the next pass: a transaction that is still
+# open may commit lower ids than ones already visible
+HASHTAG_STATS_SETTLE_SECONDS = float(os.getenv("HASHTAG_STATS_SETTLE_SECONDS", "60"))
+
+TAG_MAX_LENGTH = 100
+WORD = re.compile(r"\w+")
+HASHTAG = re.compile(r"#(\w+)")
+
+_stats_task: Optional[asyncio.Task] = None
+
+posts_t = ScheduledPost.__table__
+tags_t = PostHashtag.__table__
+stats_t = HashtagStats.__table__
+progress_t = HashtagStatsProgress.__table__
+analytics_t = PostAnalytics.__table__
+
+
+def parse_tags(hashtags: Optional[str]) -> List[str]:
+    """Distinct lower-case tags without "#", in order of appearance.
+
+    "#launch #Sale" and "launch, sale" both give ["launch", "sale"]; once the
+    text contains a "#", only "#"-prefixed words count.
+    """
+    if not hashtags:
+        return []
+    words = HASHTAG.findall(hashtags) if "#" in hashtags else WORD.findall(hashtags)
+    return list(dict.fromkeys(word.lower()[:TAG_MAX_LENGTH] for word in words))
+
+
+def content_hashtags(content: Optional[str]) -> Optional[str]:
+    """The "#"-prefixed tags written in a post's content, as hashtags text ("#a #b"), or None"""
+    tags = HASHTAG.findall(content or "")
+    return " ".join(f"#{tag}" for tag in dict.fromkeys(tags)) or None
+
+
+def _platforms(value) -> List[str]:
+    # platforms may be stored JSON-encoded once or twice
+    for _ in range(2):
+        if not isinstance(value, str):
+            break
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return [platform.strip().lower() for platform in value.split(",") if platform.strip()]
+    return [str(platform).lower() for platform in value] if isinstance(value, list) else []
+
+
+def _pairs(hashtags, platforms) -> Set[Tuple[str, str]]:
+    return {(tag, platform) for tag in parse_tags(hashtags) for platform in _platforms(platforms)}
+
+
+def _insert(connection, table):
+    """INSERT supporting ON CONFLICT for the connection's dialect, or None if it has none"""
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        return sqlite.insert(table)
+    if dialect == "postgresql":
+        return postgresql.insert(table)
+    return None
+
+
+def _upsert_stats(connection, rows: List[dict]):
+    """Add posts / samples / engagement_total to hashtag_stats rows keyed by (tag, platform)"""
+    if not rows:
+        return
+    fields = ("posts", "samples", "engagement_total")
+    rows = [
+        {"tag": row["tag"], "platform": row["platform"], "posts": row.get("posts", 0),
+         "samples": row.get("samples", 0), "engagement_total": row.get("engagement_total", 0.0)}
+        for row in rows
+    ]
+    insert = _insert(connection, stats_t)
+    if insert is not None:
+        connection.execute(insert.on_conflict_do_update(
+            index_elements=["tag", "platform"],
+            set_={field: stats_t.c[field] + insert.excluded[field] for field in fields},
+        ), rows)
+        return
+    # Portable fallback: add to the existing row, insert the ones that are missing
+    for row in rows:
+        updated = connection.execute(
+            stats_t.update()
+            .where(stats_t.c.tag == row["tag"], stats_t.c.platform == row["platform"])
+            .values(**{field: stats_t.c[field] + row[field] for field in fields})
+        ).rowcount
+        if not updated:
+            connection.execute(stats_t.insert().values(**row))
+
+
+def _reindex(connection, post_id: int, old_tags: Iterable[str], new_tags: Iterable[str],
+             old_pairs: Set[Tuple[str, str]], new_pairs: Set[Tuple[str, str]]):
+    old_tags, new_tags = set(old_tags), set(new_tags)
+    if old_tags - new_tags:
+        connection.execute(tags_t.delete().where(tags_t.c.post_id == post_id, tags_t.c.tag.in_(old_tags - new_tags)))
+    if new_tags - old_tags:
+        connection.execute(tags_t.insert(), [{"post_id": post_id, "tag": tag} for tag in new_tags - old_tags])
+    _upsert_stats(connection, [
+        {"tag": tag, "platform": platform, "posts": 1} for tag, platform in new_pairs - old_pairs
+    ] + [
+        {"tag": tag, "platform": platform, "posts": -1} for tag, platform in old_pairs - new_pairs
+    ])
+
+
+@event.listens_for(ScheduledPost, "after_insert")
+def _post_inserted(mapper, connection, post):
+    tags = parse_tags(post.hashtags)
+    if tags:
+        _reindex(connection, post.id, (), tags, set(), _pairs(post.hashtags, post.platforms))
+
+
+def _stored(connection, post_id: int):
+    # What the row holds before this flush; the instance may not have the old
+    # values loaded (e.g. an attribute set after commit expired it)
+    return connection.execute(select(posts_t.c.hashtags, posts_t.c.platforms).where(posts_t.c.id == post_id)).first()
+
+
+@event.listens_for(ScheduledPost, "before_update")
+def _post_updating(mapper, connection, post):
+    state = inspect(post)
+    if not state.attrs.hashtags.history.has_changes() and not state.attrs.platforms.history.has_changes():
+        return
+    old = _stored(connection, post.id)
+    if old is None:
+        return
+    _reindex(
+        connection, post.id, parse_tags(old.hashtags), parse_tags(post.hashtags),
+        _pairs(old.hashtags, old.platforms), _pairs(post.hashtags, post.platforms),
+    )
+
+
+@event.listens_for(ScheduledPost, "before_delete")
+def _post_deleting(mapper, connection, post):
+    old = _stored(connection, post.id)
+    if old is not None and old.hashtags:
+        _reindex(connection, post.id, parse_tags(old.hashtags), (), _pairs(old.hashtags, old.platforms), set())
+
+
+# Engagement
+
+def _progress(connection) -> int:
+    last = connection.execute(select(progress_t.c.last_analytics_id).where(progress_t.c.id == 1)).scalar()
+    if last is None:
+        # Another process may create it at the same time
+        insert = _insert(connection, progress_t)
+        if insert is not None:
+            connection.execute(insert.values(id=1, last_analytics_id=0).on_conflict_do_nothing())
+        else:
+            try:
+                with connection.begin_nested():
+                    connection.execute(progress_t.insert().values(id=1, last_analytics_id=0))
+            except IntegrityError:
+                pass
+        last = 0
+    return last
+
+
+def refresh_stats(now: Optional[datetime] = None) -> int:
+    """Fold post_analytics rows added since the last pass into hashtag_stats; returns how many ids were covered.
+
+    Each batch moves the watermark with a conditional UPDATE in the same
+    transaction as the sums, so concurrent passes never count a row twice.
+    """
+    batch_size = max(1, HASHTAG_STATS_BATCH_SIZE)
+    settled = (now or datetime.utcnow()) - timedelta(seconds=HASHTAG_STATS_SETTLE_SECONDS)
+    total = 0
+    while True:
+        with engine.begin() as connection:
+            after = _progress(connection)
+            newest = connection.execute(
+                select(func.max(analytics_t.c.id))
+                .where(analytics_t.c.id > after, analytics_t.c.created_at <= settled)
+            ).scalar() or 0
+            if newest <= after:
+                break
+            upto = min(after + batch_size, newest)
+            claimed = connection.execute(
+                progress_t.update()
+                .where(progress_t.c.id == 1, progress_t.c.last_analytics_id == after)
+                .values(last_analytics_id=upto)
+            ).rowcount
+            if not claimed:
+                break
+            # ph.post_id is served by uq_post_hashtags_post_tag
+            rows = connection.execute(
+                select(
+                    tags_t.c.tag, func.lower(analytics_t.c.platform), func.count(),
+                    func.coalesce(func.sum(analytics_t.c.engagement_rate), 0.0),
+                )
+                .select_from(analytics_t.join(tags_t, tags_t.c.post_id == analytics_t.c.post_id))
+                .where(analytics_t.c.id > after, analytics_t.c.id <= upto, analytics_t.c.platform.isnot(None))
+                .group_by(tags_t.c.tag, func.lower(analytics_t.c.platform))
+            ).all()
+            _upsert_stats(connection, [
+                {"tag": tag, "platform": platform, "samples": samples, "engagement_total": engagement}
+                for tag, platform, samples, engagement in rows
+            ])
+            total += upto - after
+    return total
+
+
+def fold_engagement_changes(connection, changes: List[tuple]):
+    """Add the rate change of post_analytics rows updated in place to hashtag_stats.
+
+    `changes` are (analytics_id, post_id, platform, old_rate, new_rate) within
+    the updating transaction. Rows above the watermark are left to the next
+    pass, which reads their new rate; locking the watermark row keeps a pass
+    from folding a row between the two.
+    """
+    watermark = connection.execute(
+        select(progress_t.c.last_analytics_id).where(progress_t.c.id == 1).with_for_update()
+    ).scalar() or 0
+    deltas: Dict[Tuple[int, str], float] = {}
+    for analytics_id, post_id, platform, old_rate, new_rate in changes:
+        if analytics_id <= watermark and platform and old_rate is not None and new_rate != old_rate:
+            key = (post_id, platform.lower())
+            deltas[key] = deltas.get(key, 0.0) + (new_rate or 0.0) - old_rate
+    if not deltas:
+        return
+    post_ids = sorted({post_id for post_id, _ in deltas})
+    tags: Dict[int, List[str]] = {}
+    for start in range(0, len(post_ids), 500):
+        for post_id, tag in connection.execute(
+            select(tags_t.c.post_id, tags_t.c.tag).where(tags_t.c.post_id.in_(post_ids[start:start + 500]))
+        ):
+            tags.setdefault(post_id, []).append(tag)
+    totals: Dict[Tuple[str, str], float] = {}
+    for (post_id, platform), delta in deltas.items():
+        for tag in tags.get(post_id, ()):
+            totals[(tag, platform)] = totals.get((tag, platform), 0.0) + delta
+    _upsert_stats(connection, [
+        {"tag": tag, "platform": platform, "engagement_total": delta} for (tag, platform), delta in totals.items()
+    ])
+
+
+def top_tags(db: Session, platform: str, limit: int = 10) -> List[dict]:
+    """Most used tags on a platform (ix_hashtag_stats_platform_posts)"""
+    rows = db.execute(
+        select(stats_t.c.tag, stats_t.c.posts, stats_t.c.samples, stats_t.c.engagement_total)
+        .where(stats_t.c.platform == platform.lower(), stats_t.c.posts > 0)
+        .order_by(stats_t.c.posts.desc(), stats_t.c.tag)
+        .limit(limit)
+    ).all()
+    return [
+        {
+            "hashtag": f"#{row.tag}",
+            "usage_count": row.posts,
+            "avg_engagement": round(row.engagement_total / row.samples, 2) if row.samples else 0.0,
+        }
+        for row in rows
+    ]
+
+
+def tag_engagement(tags: List[str]) -> Dict[str, float]:
+    """Average engagement of each known tag across platforms (unique (tag, platform) index)"""
+    tags = list({tag.lstrip("#").lower() for tag in tags if tag.lstrip("#")})
+    if not tags:
+        return {}
+    with engine.connect() as connection:
+        rows = connection.execute(
+            select(stats_t.c.tag, func.sum(stats_t.c.engagement_total), func.sum(stats_t.c.samples))
+            .where(stats_t.c.tag.in_(tags))
+            .group_by(stats_t.c.tag)
+        ).all()
+    return {tag: engagement / samples for tag, engagement, samples in rows if samples}
+
+
+def rank_suggestions(suggestions: List[str]) -> List[str]:
+    """Order suggested hashtags by their measured engagement; tags without data keep their place after them"""
+    engagement = tag_engagement(suggestions)
+    if not engagement:
+        return suggestions
+    key = lambda suggestion: engagement.get(suggestion.lstrip("#").lower())
+    measured = sorted((s for s in suggestions if key(s) is not None), key=key, reverse=True)
+    return measured + [s for s in suggestions if key(s) is None]
+
+
+async def _run():
+    while True:
+        try:
+            # Blocking database work; keep it off the event loop
+            await asyncio.to_thread(refresh_stats)
+        except Exception as e:
+            logger.error(f"Hashtag stats refresh failed: {str(e)}")
+        await asyncio.sleep(HASHTAG_STATS_INTERVAL_SECONDS)
+
+
+def start_stats():
+    """Fold new analytics into hashtag_stats periodically in the background"""
+    global _stats_task
+    if HASHTAG_STATS and _stats_task is None:
+        _stats_task = asyncio.create_task(_run())
+
+
+async def stop_stats():
+    global _stats_task
+    if _stats_task is not None:
+        _stats_task.cancel()
+        try:
+            await _stats_task
+        except asyncio.CancelledError:
+            pass
+    _stats_task = None
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(refresh_stats())
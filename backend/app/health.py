@@ -0,0 +1,110 @@
+"""Cached health state for /api/status and the liveness/readiness probes.
+
+A background sampler checks the database every HEALTH_SAMPLE_SECONDS and
+counts pending jobs and scheduler lag with indexed queries; the probes only
+read the last sample, so their cost does not depend on the backlog.
+"""
+from datetime import datetime
+from typing import Optional
+import asyncio
+import logging
+import os
+import time
+
+from sqlalchemy import func, select, text
+
+from .database import engine
+from .models import ScheduledPost
+
+logger = logging.getLogger(__name__)
+
+HEALTH_SAMPLE_SECONDS = float(os.getenv("HEALTH_SAMPLE_SECONDS", "5"))
+# Readiness fails if the last successful sample is older than this
+HEALTH_MAX_STALENESS_SECONDS = float(os.getenv("HEALTH_MAX_STALENESS_SECONDS", "30"))
+
+_sample_task: Optional[asyncio.Task] = None
+
+# Last sample; `ok_at` is the monotonic time of the last successful one
+state = {
+    "database": "unknown",
+    "jobs_count": None,
+    "posts_pending": None,
+    "scheduler_lag_seconds": None,
+    "sampled_at": None,
+    "sample_ms": None,
+    "ok_at": None,
+}
+
+
+def _count_jobs() -> int:
+    """Rows in the jobstore table; a COUNT, not get_jobs(), which unpickles every job"""
+    from .scheduler import get_jobstore
+
+    jobstore = get_jobstore()
+    with jobstore.engine.connect() as connection:
+        return connection.execute(select(func.count()).select_from(jobstore.jobs_t)).scalar()
+
+
+def sample(now: Optional[datetime] = None):
+    """Refresh `state` (blocking; run off the event loop)"""
+    now = now or datetime.now()
+    started = time.perf_counter()
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+            # Both use ix_scheduled_posts_status_scheduled_time
+            pending, oldest_due = connection.execute(
+                select(func.count(), func.min(ScheduledPost.scheduled_time)).where(ScheduledPost.status == "scheduled")
+            ).one()
+        state.update(
+            database="connected",
+            posts_pending=pending,
+            # How long the oldest due post has been waiting for a publisher
+            scheduler_lag_seconds=round(max(0.0, (now - oldest_due).total_seconds()), 3) if oldest_due else 0.0,
+            ok_at=time.monotonic(),
+        )
+        # The jobstore lives in the same database; its count is informational
+        try:
+            state["jobs_count"] = _count_jobs()
+        except Exception as e:
+            logger.warning(f"Counting scheduler jobs failed: {str(e)}")
+    except Exception as e:
+        state["database"] = f"error: {str(e)}"
+    state["sampled_at"] = datetime.utcnow().isoformat()
+    state["sample_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+
+def is_ready() -> bool:
+    ok_at = state["ok_at"]
+    return ok_at is not None and time.monotonic() - ok_at <= HEALTH_MAX_STALENESS_SECONDS
+
+
+def snapshot() -> dict:
+    return {key: value for key, value in state.items() if key != "ok_at"}
+
+
+async def _run():
+    while True:
+        try:
+            await asyncio.to_thread(sample)
+        except Exception as e:
+            logger.error(f"Health sample failed: {str(e)}")
+        await asyncio.sleep(HEALTH_SAMPLE_SECONDS)
+
+
+def start_sampler():
+    """Sample health in the background until stop_sampler()"""
+    global _sample_task
+    if _sample_task is None:
+        _sample_task = asyncio.create_task(_run())
+
+
+async def stop_sampler():
+    global _sample_task
+    if _sample_task is not None:
+        _sample_task.cancel()
+        try:
+            await _sample_task
+        except asyncio.CancelledError:
+            pass
+    _sample_task = None
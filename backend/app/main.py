@@ -1,13 +1,22 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, Response
+from sqlalchemy.orm import Session
 import uvicorn
 import os
+import time
 from contextlib import asynccontextmanager
 
-from .database import engine, Base
-from .scheduler import scheduler
+from .database import engine, get_db, schema_is_current
+from .models import Base
+from .scheduler import (
+    RUN_SCHEDULER, scheduler_running, shutdown_scheduler, start_enqueue_only, start_scheduler
+)
+from .platforms import close_http_client
+from .analytics_buffer import buffer as analytics_buffer
+from . import engagement, events, hashtags, health, recovery, retention, search
+from . import crud, metrics, profiling, query_stats
 from .routes import posts, products, analytics
 
 
@@ -16,24 +25,49 @@ async def lifespan(app: FastAPI):
     """Handle application startup and shutdown"""
     # Startup
     print("Starting Social Media Scheduler API...")
+    startup_started = time.perf_counter()
     
-    # Create database tables
-    Base.metadata.create_all(bind=engine)
+    # Create database tables, unless Alembic already brought the schema up to date
+    if not schema_is_current():
+        Base.metadata.create_all(bind=engine)
+        with engine.begin() as connection:
+            search.install(connection)
     
     # Start the scheduler
-    if not scheduler.running:
-        scheduler.start()
+    if RUN_SCHEDULER:
+        # Deal with posts that came due while we were down before the scheduler
+        # sees their jobs; catch-up publishing runs in the background
+        overdue, rescheduled = recovery.claim_overdue_posts()
+        start_scheduler()
+        recovery.start_catchup(overdue, rescheduled)
+        recovery.start_claim_sweeper()
+        engagement.start_poller()
+        retention.start_retention()
+        hashtags.start_stats()
         print("Background scheduler started")
+    else:
+        # Publishing happens in `python -m app.worker`; we only enqueue jobs
+        start_enqueue_only()
+        print("Scheduler disabled (RUN_SCHEDULER=false), jobs are published by app.worker")
+    health.start_sampler()
     
-    print("Application startup complete")
+    print(f"Application startup complete ({(time.perf_counter() - startup_started) * 1000:.0f} ms)")
     
     yield
     
     # Shutdown
     print("Shutting down application...")
-    if scheduler.running:
-        scheduler.shutdown()
-        print("Background scheduler stopped")
+    await health.stop_sampler()
+    await recovery.stop_catchup()
+    await recovery.stop_claim_sweeper()
+    await engagement.stop_poller()
+    await retention.stop_retention()
+    await hashtags.stop_stats()
+    await events.hub.stop()
+    shutdown_scheduler()
+    print("Background scheduler stopped")
+    await close_http_client()
+    analytics_buffer.flush()
 
 
 # Create FastAPI app with lifespan
@@ -57,6 +91,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-request query count / DB time as Server-Timing headers
+if query_stats.SQL_INSTRUMENTATION:
+    app.middleware("http")(query_stats.query_stats_middleware)
+
+# Sampled / X-Profile requested CPU profiles (off unless PROFILING=true)
+if profiling.PROFILING:
+    app.middleware("http")(profiling.profiling_middleware)
+
 # Static file serving for uploads
 uploads_dir = "uploads"
 if not os.path.exists(uploads_dir):
@@ -77,7 +119,7 @@ async def root():
         "message": "Social Media Scheduler API",
         "version": "1.0.0",
         "status": "running",
-        "scheduler_status": "running" if scheduler.running else "stopped",
+        "scheduler_status": "running" if scheduler_running() else "stopped",
         "endpoints": {
             "posts": "/api/posts",
             "products": "/api/products", 
@@ -93,29 +135,37 @@ async def health_check():
     return {
         "status": "healthy",
         "timestamp": "2024-01-01T00:00:00Z",
-        "scheduler": "running" if scheduler.running else "stopped",
+        "scheduler": "running" if scheduler_running() else "stopped",
         "database": "connected"
     }
 
+@app.get("/health/live")
+async def liveness():
+    """Liveness probe: the event loop is answering"""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness():
+    """Readiness probe from the cached health sample (no database round trip)"""
+    if not health.is_ready():
+        return JSONResponse(status_code=503, content={"status": "unavailable", **health.snapshot()})
+    return {"status": "ready", **health.snapshot()}
+
 @app.get("/api/status")
 async def api_status():
-    """Detailed API status"""
-    try:
-        from .database import SessionLocal
-        db = SessionLocal()
-        db.execute("SELECT 1")
-        db.close()
-        db_status = "connected"
-    except Exception as e:
-        db_status = f"error: {str(e)}"
-    
+    """Detailed API status (database and job figures from the cached health sample)"""
+    sample = health.snapshot()
     return {
         "api": "running",
-        "database": db_status,
+        "database": sample["database"],
         "scheduler": {
-            "running": scheduler.running,
-            "jobs_count": len(scheduler.get_jobs())
+            "running": scheduler_running(),
+            "publisher": "api" if RUN_SCHEDULER else "worker",
+            "jobs_count": sample["jobs_count"],
+            "posts_pending": sample["posts_pending"],
+            "lag_seconds": sample["scheduler_lag_seconds"],
         },
+        "sampled_at": sample["sampled_at"],
         "features": {
             "post_scheduling": True,
             "ai_hashtags": True,
@@ -124,14 +174,21 @@ async def api_status():
         }
     }
 
+@app.get("/metrics", include_in_schema=False)
+def metrics_endpoint(db: Session = Depends(get_db)):
+    """Prometheus scrape endpoint"""
+    metrics.JOBS_PENDING.set(crud.count_posts_by_status(db, "scheduled"))
+    payload, content_type = metrics.render_metrics()
+    return Response(content=payload, media_type=content_type)
+
 # Error handlers
 @app.exception_handler(404)
 async def not_found_handler(request, exc):
-    return {"error": "Not found", "message": "The requested resource was not found"}
+    return JSONResponse(status_code=404, content={"error": "Not found", "message": "The requested resource was not found"})
 
 @app.exception_handler(500)
 async def internal_error_handler(request, exc):
-    return {"error": "Internal server error", "message": "An internal server error occurred"}
+    return JSONResponse(status_code=500, content={"error": "Internal server error", "message": "An internal server error occurred"})
 
 
 if __name__ == "__main__":
@@ -0,0 +1,136 @@
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from datetime import datetime, timezone
+import os
+
+# When running several workers (uvicorn --workers / gunicorn), point
+# PROMETHEUS_MULTIPROC_DIR at an empty, writable directory *before* the
+# process starts. prometheus_client then keeps samples in mmap'd files there
+# and /metrics aggregates them across all workers.
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+# Buckets tuned for outbound HTTP calls to social platforms (tens of ms to tens of s)
+PUBLISH_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0, 20.0, 30.0, 60.0)
+# Lag may legitimately be minutes/hours after downtime
+LAG_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+DB_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+PUBLISH_LATENCY = Histogram(
+    "social_publish_duration_seconds",
+    "Time spent in platform calls publishing a post (excludes waiting for rate/concurrency capacity)",
+    ["platform"],
+    buckets=PUBLISH_BUCKETS,
+)
+
+PUBLISH_RESULTS = Counter(
+    "social_publish_total",
+    "Publish attempts per platform by result (success, failure, error)",
+    ["platform", "result"],
+)
+
+PLATFORM_CONCURRENCY_LIMIT = Gauge(
+    "social_platform_concurrency_limit",
+    "Current adaptive concurrency limit for outbound calls per platform",
+    ["platform"],
+    multiprocess_mode="livesum",
+)
+
+PLATFORM_QUEUE_WAIT = Histogram(
+    "social_platform_queue_wait_seconds",
+    "Time a publish waited for platform rate/concurrency capacity",
+    ["platform"],
+    buckets=LAG_BUCKETS,
+)
+
+ENGAGEMENT_POLL_REQUESTS = Counter(
+    "social_engagement_poll_requests_total",
+    "Engagement metric requests per platform by result (success, error)",
+    ["platform", "result"],
+)
+
+ENGAGEMENT_ROWS_CHANGED = Counter(
+    "social_engagement_rows_changed_total",
+    "Analytics rows inserted or updated by the engagement poller",
+    ["platform"],
+)
+
+SCHEDULER_LAG = Histogram(
+    "social_scheduler_lag_seconds",
+    "Delay between a post's scheduled_time and the moment publishing started",
+    buckets=LAG_BUCKETS,
+)
+
+JOBS_PENDING = Gauge(
+    "social_scheduler_jobs_pending",
+    "Posts still waiting to be published",
+    multiprocess_mode="livemax",
+)
+
+DB_SESSION_DURATION = Histogram(
+    "social_db_session_duration_seconds",
+    "Lifetime of a database session from open to close",
+    ["source"],
+    buckets=DB_BUCKETS,
+)
+
+DB_QUERY_DURATION = Histogram(
+    "social_db_query_duration_seconds",
+    "Execution time of individual SQL statements (requires SQL_INSTRUMENTATION)",
+    buckets=DB_BUCKETS,
+)
+
+AI_CALL_LATENCY = Histogram(
+    "social_ai_call_duration_seconds",
+    "Latency of AI helper calls",
+    ["operation", "backend"],
+    buckets=PUBLISH_BUCKETS,
+)
+
+AI_CACHE_REQUESTS = Counter(
+    "social_ai_cache_requests_total",
+    "AI helper cache lookups by result (hit, miss)",
+    ["operation", "result"],
+)
+
+UPLOAD_BYTES = Counter(
+    "social_upload_bytes_total",
+    "Bytes written to the uploads directory",
+    ["kind"],
+)
+
+
+def observe_scheduler_lag(scheduled_time: datetime):
+    """Record how late a job started relative to its scheduled time"""
+    if scheduled_time.tzinfo is not None:
+        now = datetime.now(timezone.utc)
+    else:
+        # Naive datetimes are stored and scheduled in server local time
+        now = datetime.now()
+    lag = (now - scheduled_time).total_seconds()
+    SCHEDULER_LAG.observe(max(lag, 0.0))
+    return lag
+
+
+def render_metrics():
+    """Return (payload, content_type) for the /metrics endpoint"""
+    if PROMETHEUS_MULTIPROC_DIR:
+        # Fresh registry per scrape, as recommended for multiprocess mode
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid: int):
+    """Clean up live gauges of a dead worker (call from gunicorn's child_exit hook)"""
+    if PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid)
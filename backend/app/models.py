@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, JSON, Float
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Text, Boolean, JSON, Float, UniqueConstraint, Index
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 
@@ -6,6 +6,10 @@ Base = declarative_base()
 
 class ScheduledPost(Base):
     __tablename__ = "scheduled_posts"
+    __table_args__ = (
+        # Startup recovery / pending counts: WHERE status = ? AND scheduled_time <= ?
+        Index("ix_scheduled_posts_status_scheduled_time", "status", "scheduled_time"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     content = Column(Text, nullable=False)
@@ -17,6 +21,62 @@ class ScheduledPost(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     published_at = Column(DateTime)
     error_message = Column(Text)
+    series_id = Column(Integer, index=True)  # RecurringSeries this post is an occurrence of
+    claimed_at = Column(DateTime)  # UTC; when a publisher moved it to publishing (app.recovery lease)
+
+class RecurringSeries(Base):
+    """A recurring post; only its next occurrence exists as a ScheduledPost (see app.recurrence)"""
+    __tablename__ = "recurring_series"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    content = Column(Text, nullable=False)
+    image_url = Column(String(500))
+    platforms = Column(JSON)
+    hashtags = Column(Text)
+    frequency = Column(String(20), nullable=False)  # hourly, daily, weekly
+    interval = Column(Integer, nullable=False, default=1)  # every N hours/days/weeks
+    weekdays = Column(String(20))  # weekly only: "0,2,4" (Monday = 0); default: weekday of starts_at
+    starts_at = Column(DateTime, nullable=False)  # same clock as ScheduledPost.scheduled_time
+    until = Column(DateTime)
+    count = Column(Integer)  # total number of occurrences
+    occurrences = Column(Integer, default=0)  # occurrences materialized so far
+    next_post_id = Column(Integer)  # the materialized occurrence; NULL once the series ended
+    active = Column(Boolean, default=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class PostHashtag(Base):
+    """One parsed tag of ScheduledPost.hashtags, kept in sync by app.hashtags"""
+    __tablename__ = "post_hashtags"
+    __table_args__ = (
+        UniqueConstraint("post_id", "tag", name="uq_post_hashtags_post_tag"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    post_id = Column(Integer, nullable=False)
+    tag = Column(String(100), nullable=False, index=True)  # lower case, without "#"
+
+class HashtagStats(Base):
+    """Per tag and platform usage and engagement, maintained incrementally by app.hashtags"""
+    __tablename__ = "hashtag_stats"
+    __table_args__ = (
+        UniqueConstraint("tag", "platform", name="uq_hashtag_stats_tag_platform"),
+        # Top tags of a platform: WHERE platform = ? ORDER BY posts DESC
+        Index("ix_hashtag_stats_platform_posts", "platform", "posts"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    tag = Column(String(100), nullable=False)
+    platform = Column(String(50), nullable=False)
+    posts = Column(Integer, default=0)  # posts using the tag on this platform
+    samples = Column(Integer, default=0)  # post_analytics rows folded in
+    engagement_total = Column(Float, default=0.0)  # sum of their engagement_rate
+
+class HashtagStatsProgress(Base):
+    """Single row: the last post_analytics id folded into hashtag_stats"""
+    __tablename__ = "hashtag_stats_progress"
+    
+    id = Column(Integer, primary_key=True)
+    last_analytics_id = Column(Integer, nullable=False, default=0)
 
 class ProductCustomization(Base):
     __tablename__ = "product_customizations"
@@ -31,6 +91,10 @@ class ProductCustomization(Base):
 
 class PostAnalytics(Base):
     __tablename__ = "post_analytics"
+    __table_args__ = (
+        # Retention roll-up: WHERE created_at < ?
+        Index("ix_post_analytics_created_at", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     post_id = Column(Integer)
@@ -40,4 +104,55 @@ class PostAnalytics(Base):
     shares = Column(Integer, default=0)
     comments = Column(Integer, default=0)
     engagement_rate = Column(Float, default=0.0)
-    created_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class PostAnalyticsRollup(Base):
+    """Hourly / daily aggregates of post_analytics rows removed by app.retention"""
+    __tablename__ = "post_analytics_rollup"
+    __table_args__ = (
+        UniqueConstraint("resolution", "bucket_start", "platform", name="uq_post_analytics_rollup_bucket"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    resolution = Column(String(10), nullable=False)  # hour, day
+    bucket_start = Column(DateTime, nullable=False)  # UTC, like PostAnalytics.created_at
+    platform = Column(String(50))
+    samples = Column(Integer, default=0)  # raw rows folded into this bucket
+    views = Column(BigInteger, default=0)
+    likes = Column(BigInteger, default=0)
+    shares = Column(BigInteger, default=0)
+    comments = Column(BigInteger, default=0)
+
+class PostEvent(Base):
+    """Post status changes, streamed to clients by app.events (id = SSE event id)"""
+    __tablename__ = "post_events"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    post_id = Column(Integer, nullable=False)
+    status = Column(String(50), nullable=False)
+    error_message = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class PostPlatformStatus(Base):
+    """Per-platform publish state of a post, including retry bookkeeping"""
+    __tablename__ = "post_platform_status"
+    __table_args__ = (
+        UniqueConstraint("post_id", "platform", name="uq_post_platform_status_post_platform"),
+        # Stale claim sweep: WHERE status = 'publishing' AND claimed_at < ?
+        Index("ix_post_platform_status_status_claimed_at", "status", "claimed_at"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    post_id = Column(Integer, nullable=False, index=True)
+    platform = Column(String(50), nullable=False)
+    status = Column(String(50), default="pending")  # pending, published, retrying, failed
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime)  # same clock as ScheduledPost.scheduled_time
+    last_error = Column(Text)
+    external_id = Column(String(100))
+    published_at = Column(DateTime)
+    # Engagement polling (UTC like published_at); NULL next_poll_at = no longer polled
+    next_poll_at = Column(DateTime, index=True)
+    engagement_polled_at = Column(DateTime)
+    claimed_at = Column(DateTime)  # UTC; when a retry of this platform was claimed
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,425 @@
+from typing import Dict, List, Optional, TYPE_CHECKING
+import asyncio
+import logging
+import os
+import random
+import time
+
+from . import metrics
+from .rate_limit import PlatformLimiter
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+# Mock social media APIs endpoint (JSONPlaceholder accepts any POST to /posts)
+MOCK_API_URL = "https://jsonplaceholder.typicode.com/posts"
+
+# Point publishing at a local stand-in platform server (see benchmarks/mock_platform_server.py).
+# Each platform then lives under {PLATFORM_API_BASE_URL}/{platform}/ and batch / media
+# endpoints become available; JSONPlaceholder has neither.
+PLATFORM_API_BASE_URL = os.getenv("PLATFORM_API_BASE_URL")
+
+# Simulated latency range (seconds) and failure rate layered on top of the mock call.
+# A stand-in server models these itself, so they default to off when one is configured.
+_delay = [float(value) for value in os.getenv("MOCK_PUBLISH_DELAY", "0,0" if PLATFORM_API_BASE_URL else "0.5,2.0").split(",")]
+MOCK_PUBLISH_DELAY = (_delay[0], _delay[-1])
+MOCK_FAILURE_RATE = float(os.getenv("MOCK_FAILURE_RATE", "0" if PLATFORM_API_BASE_URL else "0.15"))
+
+# How long the dispatcher waits for more due posts before sending a partial batch
+BATCH_WINDOW_SECONDS = float(os.getenv("PUBLISH_BATCH_WINDOW_MS", "50")) / 1000
+
+HTTP_TIMEOUT = 10.0
+
+# Per-platform request rate overrides, e.g. "twitter=50,facebook=200" (requests/second)
+PLATFORM_RATE_LIMITS = {
+    name.strip(): float(rate)
+    for name, _, rate in (item.partition("=") for item in os.getenv("PLATFORM_RATE_LIMITS", "").split(","))
+    if name.strip() and rate
+}
+# How many times a rate-limited (429) request is queued again before it counts as failed
+RATE_LIMIT_MAX_REQUEUES = int(os.getenv("RATE_LIMIT_MAX_REQUEUES", "3"))
+
+
+class PublishResult:
+    """Outcome of publishing one post to one platform"""
+
+    __slots__ = ("success", "status_code", "error", "retry_after", "external_id", "retryable")
+
+    def __init__(self, success: bool, status_code: Optional[int] = None, error: Optional[str] = None,
+                 retry_after: Optional[float] = None, external_id: Optional[str] = None,
+                 retryable: bool = True):
+        self.success = success
+        self.status_code = status_code
+        self.error = error
+        self.retry_after = retry_after
+        self.external_id = external_id
+        # Network errors, 429 and 5xx are transient; other 4xx will fail the same way again
+        self.retryable = retryable
+
+    def __repr__(self):
+        return f"PublishResult(success={self.success}, status_code={self.status_code}, error={self.error!r})"
+
+
+def _retry_after(response: "httpx.Response") -> Optional[float]:
+    value = response.headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class PlatformAdapter:
+    """Base adapter: one platform's payload shape, endpoints and capabilities.
+
+    Subclasses override build_payload() and declare capabilities:
+      supports_batch / max_batch_size - platform accepts several posts in one request
+      requires_media_preupload        - images are uploaded first and referenced by id
+      rate_limit / rate_burst         - requests/second we allow ourselves (0 = unlimited)
+      max_concurrency                 - ceiling for the adaptive in-flight limit
+      engagement_batch_size           - post ids per engagement metrics request
+    """
+
+    name = "generic"
+    supports_batch = False
+    max_batch_size = 1
+    requires_media_preupload = False
+    rate_limit = 10.0
+    rate_burst = 20
+    max_concurrency = 32
+    engagement_batch_size = 100
+
+    def __init__(self, base_url: Optional[str] = None):
+        # base_url is the platform root on a stand-in server; None means JSONPlaceholder
+        self.base_url = base_url.rstrip("/") if base_url else None
+        if self.base_url is None:
+            # JSONPlaceholder only has the single /posts endpoint
+            self.supports_batch = False
+            self.max_batch_size = 1
+            self.requires_media_preupload = False
+
+    @property
+    def post_url(self) -> str:
+        return f"{self.base_url}/posts" if self.base_url else MOCK_API_URL
+
+    @property
+    def batch_url(self) -> str:
+        return f"{self.base_url}/posts/batch"
+
+    @property
+    def media_url(self) -> str:
+        return f"{self.base_url}/media"
+
+    @property
+    def metrics_url(self) -> str:
+        return f"{self.base_url}/posts/metrics"
+
+    @property
+    def supports_engagement(self) -> bool:
+        # JSONPlaceholder has no metrics endpoint
+        return self.base_url is not None
+
+    def build_payload(self, post, media_id: Optional[str] = None) -> dict:
+        return {
+            "title": post.content[:50] + "..." if len(post.content) > 50 else post.content,
+            "body": post.content,
+            "userId": 1
+        }
+
+    async def _simulate_delay(self):
+        if MOCK_PUBLISH_DELAY[-1] > 0:
+            await asyncio.sleep(random.uniform(*MOCK_PUBLISH_DELAY))
+
+    def _simulate_success(self) -> bool:
+        # Mock success rate (85% success by default for realistic simulation)
+        return random.random() >= MOCK_FAILURE_RATE
+
+    def _result(self, status_code: int, body: Optional[dict], simulated_ok: bool, response=None) -> PublishResult:
+        if status_code >= 400:
+            return PublishResult(
+                False, status_code, f"HTTP {status_code}",
+                retry_after=_retry_after(response) if response is not None else None,
+                retryable=status_code == 429 or status_code >= 500,
+            )
+        if not simulated_ok:
+            return PublishResult(False, status_code, "Simulated platform failure")
+        external_id = str(body.get("id")) if isinstance(body, dict) and body.get("id") is not None else None
+        return PublishResult(True, status_code, external_id=external_id)
+
+    async def upload_media(self, client: "httpx.AsyncClient", post) -> Optional[str]:
+        """Upload the post image ahead of publishing; returns the platform media id"""
+        response = await client.post(self.media_url, json={"image_url": post.image_url}, timeout=HTTP_TIMEOUT)
+        response.raise_for_status()
+        return str(response.json().get("id"))
+
+    async def publish(self, client: "httpx.AsyncClient", post) -> PublishResult:
+        """Publish a single post"""
+        await self._simulate_delay()
+        simulated_ok = self._simulate_success()
+        media_id = None
+        if self.requires_media_preupload and post.image_url:
+            media_id = await self.upload_media(client, post)
+        response = await client.post(self.post_url, json=self.build_payload(post, media_id), timeout=HTTP_TIMEOUT)
+        body = response.json() if response.status_code < 400 else None
+        return self._result(response.status_code, body, simulated_ok, response)
+
+    async def publish_batch(self, client: "httpx.AsyncClient", posts: list) -> List[PublishResult]:
+        """Publish several posts; uses the batch endpoint when the platform has one"""
+        if not self.supports_batch:
+            return list(await asyncio.gather(*(self.publish(client, post) for post in posts)))
+
+        await self._simulate_delay()
+        simulated = [self._simulate_success() for _ in posts]
+        payloads = []
+        for post in posts:
+            media_id = None
+            if self.requires_media_preupload and post.image_url:
+                media_id = await self.upload_media(client, post)
+            payloads.append(self.build_payload(post, media_id))
+
+        response = await client.post(self.batch_url, json={"posts": payloads}, timeout=HTTP_TIMEOUT)
+        if response.status_code >= 400:
+            failure = self._result(response.status_code, None, True, response)
+            return [failure for _ in posts]
+
+        items = response.json().get("results", [])
+        results = []
+        for index, simulated_ok in enumerate(simulated):
+            item = items[index] if index < len(items) else {"status": 502}
+            results.append(self._result(item.get("status", 200), item, simulated_ok))
+        return results
+
+    async def fetch_engagement(self, client: "httpx.AsyncClient", external_ids: List[str]) -> Dict[str, dict]:
+        """Current engagement totals (views, likes, shares, comments) keyed by external id"""
+        response = await client.get(self.metrics_url, params={"ids": ",".join(external_ids)}, timeout=HTTP_TIMEOUT)
+        response.raise_for_status()
+        return {str(item["id"]): item for item in response.json().get("results", [])}
+
+
+class TwitterAdapter(PlatformAdapter):
+    name = "twitter"
+    rate_limit = 5.0
+    rate_burst = 10
+
+    def build_payload(self, post, media_id: Optional[str] = None) -> dict:
+        if self.base_url is None:
+            return super().build_payload(post, media_id)
+        payload = {"text": post.content[:280]}
+        if media_id:
+            payload["media_ids"] = [media_id]
+        return payload
+
+
+class FacebookAdapter(PlatformAdapter):
+    name = "facebook"
+    # Graph API batch requests accept up to 50 operations
+    supports_batch = True
+    max_batch_size = 50
+    engagement_batch_size = 50
+    rate_limit = 20.0
+    rate_burst = 40
+
+    def build_payload(self, post, media_id: Optional[str] = None) -> dict:
+        if self.base_url is None:
+            return super().build_payload(post, media_id)
+        payload = {"message": post.content}
+        if post.image_url:
+            payload["link"] = post.image_url
+        return payload
+
+
+class InstagramAdapter(PlatformAdapter):
+    name = "instagram"
+    # Images are uploaded as a media container first, then published by id
+    requires_media_preupload = True
+    rate_limit = 5.0
+    rate_burst = 10
+
+    def build_payload(self, post, media_id: Optional[str] = None) -> dict:
+        if self.base_url is None:
+            return super().build_payload(post, media_id)
+        payload = {"caption": post.content}
+        if media_id:
+            payload["creation_id"] = media_id
+        return payload
+
+
+_adapters: Dict[str, PlatformAdapter] = {}
+
+
+def register_adapter(adapter: PlatformAdapter):
+    """Register (or replace) the adapter used for adapter.name"""
+    _adapters[adapter.name] = adapter
+    return adapter
+
+
+def get_adapter(platform: str) -> PlatformAdapter:
+    """Adapter for a platform; unknown platforms fall back to the Twitter adapter like before"""
+    adapter = _adapters.get(platform)
+    if adapter is None:
+        adapter = _adapters["twitter"]
+    return adapter
+
+
+def get_adapters() -> Dict[str, PlatformAdapter]:
+    return dict(_adapters)
+
+
+def _platform_base_url(platform: str) -> Optional[str]:
+    if not PLATFORM_API_BASE_URL:
+        return None
+    return f"{PLATFORM_API_BASE_URL.rstrip('/')}/{platform}"
+
+
+for _adapter_class in (TwitterAdapter, FacebookAdapter, InstagramAdapter):
+    register_adapter(_adapter_class(_platform_base_url(_adapter_class.name)))
+
+
+_limiters: Dict[str, PlatformLimiter] = {}
+
+
+def get_limiter(platform: str) -> PlatformLimiter:
+    """Outbound rate/concurrency limiter for a platform, created on first use"""
+    limiter = _limiters.get(platform)
+    if limiter is None:
+        adapter = get_adapter(platform)
+        limiter = PlatformLimiter(
+            platform,
+            rate=PLATFORM_RATE_LIMITS.get(platform, adapter.rate_limit),
+            burst=adapter.rate_burst,
+            max_concurrency=adapter.max_concurrency,
+        )
+        _limiters[platform] = limiter
+    return limiter
+
+
+_client: Optional["httpx.AsyncClient"] = None
+
+
+def get_http_client() -> "httpx.AsyncClient":
+    """Shared HTTP client so publishes reuse connections instead of a new client per call"""
+    global _client
+    if _client is None or _client.is_closed:
+        import httpx
+        _client = httpx.AsyncClient(timeout=HTTP_TIMEOUT)
+    return _client
+
+
+async def close_http_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+class BatchDispatcher:
+    """Coalesces concurrent publishes per platform into batch requests.
+
+    Jobs that come due together each call submit(); for platforms with a batch
+    endpoint the posts are held for up to BATCH_WINDOW_SECONDS (or until
+    max_batch_size is reached) and sent in one request. Other platforms are
+    published immediately.
+    """
+
+    def __init__(self, window: float = BATCH_WINDOW_SECONDS):
+        self.window = window
+        self._pending: Dict[str, list] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        # Strong references to in-flight batch deliveries (the loop only keeps weak ones)
+        self._deliveries: set = set()
+
+    async def submit(self, platform: str, post) -> PublishResult:
+        adapter = get_adapter(platform)
+        if not adapter.supports_batch:
+            results = await self._send(platform, adapter, [post])
+            return results[0]
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        queue = self._pending.setdefault(platform, [])
+        queue.append((post, future))
+        if len(queue) >= adapter.max_batch_size:
+            self._flush(platform)
+        elif platform not in self._timers:
+            self._timers[platform] = loop.call_later(self.window, self._flush, platform)
+        return await future
+
+    def _flush(self, platform: str):
+        timer = self._timers.pop(platform, None)
+        if timer is not None:
+            timer.cancel()
+        queue = self._pending.pop(platform, [])
+        if not queue:
+            return
+        adapter = get_adapter(platform)
+        for start in range(0, len(queue), adapter.max_batch_size):
+            chunk = queue[start:start + adapter.max_batch_size]
+            task = asyncio.ensure_future(self._deliver(platform, adapter, chunk))
+            self._deliveries.add(task)
+            task.add_done_callback(self._deliveries.discard)
+
+    async def _deliver(self, platform: str, adapter: PlatformAdapter, chunk: list):
+        error = f"Batch delivery to {platform} was cancelled"
+        try:
+            results = await self._send(platform, adapter, [post for post, _ in chunk])
+            for (_, future), result in zip(chunk, results):
+                if not future.done():
+                    future.set_result(result)
+        except Exception as e:
+            error = str(e)
+            logger.error(f"Batch delivery of {len(chunk)} {platform} post(s) failed: {error}")
+        finally:
+            # Whatever went wrong (including cancellation), no submit() is left waiting
+            for _, future in chunk:
+                if not future.done():
+                    future.set_result(PublishResult(False, error=error))
+
+    async def _send(self, platform: str, adapter: PlatformAdapter, posts: list) -> List[PublishResult]:
+        limiter = get_limiter(platform)
+        # Time in platform calls only; waiting for the limiter is PLATFORM_QUEUE_WAIT
+        elapsed = 0.0
+        for attempt in range(RATE_LIMIT_MAX_REQUEUES + 1):
+            # Waits (rather than fails) until the platform has capacity
+            await limiter.acquire()
+            call_started = time.perf_counter()
+            overloaded, retry_after = False, 0
+            try:
+                try:
+                    if len(posts) == 1:
+                        results = [await adapter.publish(get_http_client(), posts[0])]
+                    else:
+                        results = await adapter.publish_batch(get_http_client(), posts)
+                except Exception as e:
+                    logger.error(f"Mock API call failed for {platform}: {str(e)}")
+                    results = [PublishResult(False, error=str(e)) for _ in posts]
+
+                overloaded = any(
+                    result.status_code is None or result.status_code == 429 or result.status_code >= 500
+                    for result in results if not result.success
+                )
+                retry_after = max((result.retry_after or 0 for result in results), default=0)
+            finally:
+                # Also on cancellation, or the in-flight slot leaks and the platform stalls
+                call_elapsed = time.perf_counter() - call_started
+                elapsed += call_elapsed
+                limiter.release(call_elapsed, overloaded, retry_after)
+
+            rate_limited = all(result.status_code == 429 for result in results)
+            if not rate_limited or attempt == RATE_LIMIT_MAX_REQUEUES:
+                break
+            logger.info(f"{platform} rate limited {len(posts)} post(s); queueing again")
+
+        for result in results:
+            metrics.PUBLISH_LATENCY.labels(platform).observe(elapsed)
+            if result.success:
+                outcome = "success"
+            elif result.status_code is None:
+                outcome = "error"
+            else:
+                outcome = "failure"
+            metrics.PUBLISH_RESULTS.labels(platform, outcome).inc()
+        return results
+
+
+dispatcher = BatchDispatcher()
@@ -0,0 +1,208 @@
+"""On-demand CPU profiling of requests, scheduler jobs and AI calls.
+
+Off unless PROFILING=true; when off, nothing is installed and the decorators
+return the function unchanged. When on, PROFILE_SAMPLE_RATE of requests and
+jobs are profiled, and a single request can be profiled by sending
+`X-Profile: <PROFILE_TOKEN>`. Each profile is written to PROFILE_DIR as
+
+    <time>-<name>.pstats     cProfile data (python -m pstats, snakeviz)
+    <time>-<name>.collapsed  sampled stacks (flamegraph.pl, speedscope)
+
+One profile runs at a time; units that come up meanwhile are not profiled.
+Profiles of async code also include whatever else the event loop ran while
+the unit was awaiting, and the sampled stacks include threadpool threads
+running app code (sync endpoints).
+"""
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+import asyncio
+import cProfile
+import functools
+import hmac
+import logging
+import os
+import random
+import re
+import sys
+import threading
+
+logger = logging.getLogger(__name__)
+
+PROFILING = os.getenv("PROFILING", "false").lower() == "true"
+# Fraction of requests / jobs profiled without being asked to
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+# Requests sending this in X-Profile are always profiled; unset disables the header
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+# Oldest profiles are deleted beyond this many
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))
+PROFILE_STACK_INTERVAL = float(os.getenv("PROFILE_STACK_INTERVAL_MS", "5")) / 1000
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_active = threading.Lock()
+
+
+def _frame_name(code) -> str:
+    path = code.co_filename
+    if path.startswith(APP_DIR):
+        path = "app" + path[len(APP_DIR):]
+    else:
+        path = "/".join(path.split(os.sep)[-2:])
+    return f"{code.co_name} ({path}:{code.co_firstlineno})"
+
+
+class StackSampler(threading.Thread):
+    """Samples the stacks of the profiled thread, and of threads running app code, into collapsed form"""
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_STACK_INTERVAL):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._done = threading.Event()
+
+    def run(self):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        while not self._done.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == self.ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame.f_code)
+                    frame = frame.f_back
+                if thread_id != self.thread_id and not any(code.co_filename.startswith(APP_DIR) for code in stack):
+                    # Idle pool workers and other threads unrelated to the unit
+                    continue
+                if thread_id not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                self.stacks[(names.get(thread_id, str(thread_id)),) + tuple(reversed(stack))] += 1
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+    def collapsed(self) -> str:
+        return "".join(
+            ";".join([thread] + [_frame_name(code) for code in stack]) + f" {count}\n"
+            for (thread, *stack), count in self.stacks.items()
+        )
+
+
+class Profile:
+    """cProfile plus stack sampling for one unit of work on the current thread"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started_at = datetime.utcnow()
+        self.profiler = cProfile.Profile()
+        self.sampler = StackSampler(threading.get_ident())
+
+    def start(self):
+        self.sampler.start()
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+        self.sampler.stop()
+
+    @property
+    def file_stem(self) -> str:
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", self.name).strip("_")[:80]
+        return f"{self.started_at:%Y%m%dT%H%M%S%f}-{slug}"
+
+    def write(self) -> str:
+        """Write the .pstats and .collapsed files; returns their path without extension"""
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, self.file_stem)
+        self.profiler.dump_stats(f"{path}.pstats")
+        with open(f"{path}.collapsed", "w") as f:
+            f.write(self.sampler.collapsed())
+        _prune()
+        return path
+
+
+def _prune():
+    try:
+        names = sorted(name for name in os.listdir(PROFILE_DIR) if name.endswith(".pstats"))
+    except OSError:
+        return
+    for name in names[:max(0, len(names) - PROFILE_MAX_FILES)]:
+        for extension in (".pstats", ".collapsed"):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, name[:-len(".pstats")] + extension))
+            except OSError:
+                pass
+
+
+def begin(name: str, requested: bool = False) -> Optional[Profile]:
+    """Start profiling a unit if requested or sampled and no other profile runs; None otherwise"""
+    if not requested and (PROFILE_SAMPLE_RATE <= 0 or random.random() >= PROFILE_SAMPLE_RATE):
+        return None
+    if not _active.acquire(blocking=False):
+        return None
+    profile = Profile(name)
+    try:
+        profile.start()
+    except Exception as e:
+        _active.release()
+        logger.warning(f"Could not start profiling {name}: {str(e)}")
+        return None
+    return profile
+
+
+async def finish(profile: Profile) -> Optional[str]:
+    """Stop a profile and write its files off the event loop"""
+    try:
+        profile.stop()
+    finally:
+        _active.release()
+    try:
+        path = await asyncio.to_thread(profile.write)
+    except Exception as e:
+        logger.error(f"Writing profile {profile.name} failed: {str(e)}")
+        return None
+    logger.info(f"Profiled {profile.name}: {path}.pstats / .collapsed")
+    return path
+
+
+def requested(request) -> bool:
+    token = request.headers.get("x-profile")
+    # Bytes: compare_digest rejects str with non-ASCII characters (headers decode as latin-1)
+    return bool(token and PROFILE_TOKEN) and hmac.compare_digest(token.encode(), PROFILE_TOKEN.encode())
+
+
+async def profiling_middleware(request, call_next):
+    """Profile sampled requests and those sending X-Profile: <PROFILE_TOKEN>"""
+    profile = begin(f"{request.method} {request.url.path}", requested(request))
+    if profile is None:
+        return await call_next(request)
+    try:
+        response = await call_next(request)
+    finally:
+        path = await finish(profile)
+    if path:
+        response.headers["X-Profile-Id"] = os.path.basename(path)
+    return response
+
+
+def profile_job(name: Optional[str] = None):
+    """Decorator profiling a sampled fraction of calls of a coroutine function (job, AI call)"""
+    def decorate(func):
+        if not PROFILING:
+            return func
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            profile = begin(f"{label}({', '.join(map(str, args))})")
+            if profile is None:
+                return await func(*args, **kwargs)
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                await finish(profile)
+        return wrapper
+    return decorate
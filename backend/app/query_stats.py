@@ -0,0 +1,147 @@
+from sqlalchemy import event
+from contextlib import contextmanager
+from contextvars import ContextVar
+from collections import Counter
+from typing import Optional
+import functools
+import logging
+import os
+import time
+
+from .metrics import DB_QUERY_DURATION
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger("app.sql.slow")
+
+# Off by default: hooks add a couple of perf_counter() calls per statement
+SQL_INSTRUMENTATION = os.getenv("SQL_INSTRUMENTATION", "false").lower() == "true"
+# Statements slower than this are written to the "app.sql.slow" logger
+SQL_SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", "100"))
+# Same statement issued at least this many times in one unit of work => suspected N+1
+SQL_N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", "5"))
+# How many of the slowest statements to keep per unit of work
+SQL_SLOWEST_KEPT = 3
+
+_current: ContextVar[Optional["QueryStats"]] = ContextVar("query_stats", default=None)
+
+
+class QueryStats:
+    """Query count, DB time and slowest statements for one request or scheduler job"""
+
+    __slots__ = ("name", "count", "total_time", "slowest", "statements")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.count = 0
+        self.total_time = 0.0
+        self.slowest = []  # [(duration, statement)], longest first
+        self.statements = Counter()
+
+    def record(self, statement: str, duration: float):
+        self.count += 1
+        self.total_time += duration
+        self.statements[statement] += 1
+        if len(self.slowest) < SQL_SLOWEST_KEPT or duration > self.slowest[-1][0]:
+            self.slowest.append((duration, statement))
+            self.slowest.sort(key=lambda item: item[0], reverse=True)
+            del self.slowest[SQL_SLOWEST_KEPT:]
+
+    def suspected_n_plus_one(self):
+        """Statements repeated often enough to look like a per-row query loop"""
+        return [
+            (statement, count)
+            for statement, count in self.statements.items()
+            if count >= SQL_N_PLUS_ONE_THRESHOLD
+        ]
+
+    def server_timing(self) -> str:
+        """Value for the Server-Timing response header: total DB time, then the slowest statements"""
+        entries = [f'db;dur={self.total_time * 1000:.2f};desc="{self.count} queries"']
+        for rank, (duration, statement) in enumerate(self.slowest, 1):
+            entries.append(f'db-slow-{rank};dur={duration * 1000:.2f};desc="{_header_text(statement)}"')
+        return ", ".join(entries)
+
+
+def _shorten(statement: str, length: int) -> str:
+    return " ".join(statement.split())[:length]
+
+
+def _header_text(statement: str) -> str:
+    # Quoted-string in a header: no quotes, backslashes or non-ASCII
+    text = _shorten(statement, 100).replace("\\", "").replace('"', "'")
+    return text.encode("ascii", "replace").decode("ascii")
+
+
+def current() -> Optional[QueryStats]:
+    return _current.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info["query_start_time"].pop()
+    DB_QUERY_DURATION.observe(duration)
+
+    stats = _current.get()
+    if stats is not None:
+        stats.record(statement, duration)
+
+    if duration * 1000 >= SQL_SLOW_QUERY_MS:
+        slow_query_logger.warning(
+            f"Slow query ({duration * 1000:.1f} ms) in {stats.name if stats else 'unknown'}: "
+            f"{' '.join(statement.split())[:500]}"
+        )
+
+
+def install(engine):
+    """Attach timing hooks to an engine"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    logger.info(f"SQL instrumentation enabled (slow query threshold {SQL_SLOW_QUERY_MS} ms)")
+
+
+def report(stats: QueryStats):
+    """Log suspected N+1 patterns collected for a unit of work"""
+    for statement, count in stats.suspected_n_plus_one():
+        logger.warning(
+            f"Suspected N+1 in {stats.name}: statement issued {count} times: "
+            f"{' '.join(statement.split())[:300]}"
+        )
+    slowest = "; ".join(f"{duration * 1000:.1f} ms {_shorten(statement, 200)}" for duration, statement in stats.slowest)
+    logger.debug(
+        f"{stats.name}: {stats.count} queries, {stats.total_time * 1000:.1f} ms DB time"
+        + (f"; slowest: {slowest}" if slowest else "")
+    )
+
+
+@contextmanager
+def track(name: str):
+    """Collect query stats for everything executed inside the block"""
+    stats = QueryStats(name)
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+        if SQL_INSTRUMENTATION:
+            report(stats)
+
+
+def track_job(func):
+    """Decorator collecting query stats for a scheduler job coroutine"""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        label = f"{func.__name__}({', '.join(map(str, args))})"
+        with track(label):
+            return await func(*args, **kwargs)
+    return wrapper
+
+
+async def query_stats_middleware(request, call_next):
+    """Per-request query stats exposed as a Server-Timing header"""
+    with track(f"{request.method} {request.url.path}") as stats:
+        response = await call_next(request)
+    response.headers.append("Server-Timing", stats.server_timing())
+    return response
@@ -0,0 +1,156 @@
+from collections import deque
+from typing import Optional
+import asyncio
+import logging
+import os
+import time
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Concurrency window per platform: starts small, grows while the platform is healthy
+PLATFORM_INITIAL_CONCURRENCY = int(os.getenv("PLATFORM_INITIAL_CONCURRENCY", "4"))
+PLATFORM_MAX_CONCURRENCY = int(os.getenv("PLATFORM_MAX_CONCURRENCY", "64"))
+# Multiplicative decrease on 429/5xx/timeouts, gentler decrease on latency growth
+OVERLOAD_BACKOFF = 0.5
+LATENCY_BACKOFF = 0.9
+# Recent latency above baseline * this factor counts as queueing at the platform
+LATENCY_TOLERANCE = float(os.getenv("PLATFORM_LATENCY_TOLERANCE", "2.0"))
+# Recent latency is an EWMA, so single slow responses (normal spread) are not a
+# congestion signal. The baseline is the lowest recent latency seen. While
+# healthy it relaxes upwards by BASELINE_DRIFT per response, slower than a
+# growing window raises latency; while congested it holds, unless the limit is
+# already at its minimum: then the platform itself got slower, and it relaxes
+# by BASELINE_SLOWDOWN_DRIFT
+RECENT_WEIGHT = 0.05
+BASELINE_DRIFT = 0.00001
+BASELINE_SLOWDOWN_DRIFT = 0.005
+
+
+class TokenBucket:
+    """Async token bucket; callers wait (FIFO) for a token instead of failing"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def pause(self, seconds: float):
+        """Stop handing out tokens for a while (Retry-After)"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if self.paused_until > now:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                if self.rate <= 0:
+                    return
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AdaptiveConcurrencyLimit:
+    """AIMD concurrency limit.
+
+    Each healthy response grows the limit by 1/limit (about +1 per round of
+    requests); an overload signal (429, 5xx, timeout) halves it, and recent
+    latency staying above LATENCY_TOLERANCE x the typical latency shrinks it by
+    10% at most once per round. Callers over the limit wait in FIFO order.
+    """
+
+    def __init__(self, platform: str, initial: int = PLATFORM_INITIAL_CONCURRENCY,
+                 min_limit: int = 1, max_limit: int = PLATFORM_MAX_CONCURRENCY):
+        self.platform = platform
+        self.min_limit = min_limit
+        self.max_limit = max(min_limit, max_limit)
+        self.limit = float(min(max(initial, min_limit), self.max_limit))
+        self.in_flight = 0
+        self.baseline_latency: Optional[float] = None
+        self.recent_latency: Optional[float] = None
+        # Responses since the last latency backoff
+        self._since_backoff = 0
+        self._waiters = deque()
+        metrics.PLATFORM_CONCURRENCY_LIMIT.labels(platform).set(self.limit)
+
+    async def acquire(self):
+        while self.in_flight >= int(self.limit):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                raise
+        self.in_flight += 1
+
+    def release(self, latency: float, overloaded: bool):
+        self.in_flight -= 1
+        self._since_backoff += 1
+        if overloaded:
+            self.limit = max(self.min_limit, self.limit * OVERLOAD_BACKOFF)
+        elif self.baseline_latency is None:
+            self.baseline_latency = self.recent_latency = latency
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        else:
+            self.recent_latency += RECENT_WEIGHT * (latency - self.recent_latency)
+            congested = self.recent_latency > self.baseline_latency * LATENCY_TOLERANCE
+            if not congested:
+                drift = BASELINE_DRIFT
+            elif self.limit <= self.min_limit:
+                drift = BASELINE_SLOWDOWN_DRIFT
+            else:
+                drift = 0.0
+            self.baseline_latency = min(self.recent_latency, self.baseline_latency * (1 + drift))
+            if not congested:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            elif self._since_backoff >= self.limit:
+                # Sustained growth: back off once, then give the smaller window a round
+                self.limit = max(self.min_limit, self.limit * LATENCY_BACKOFF)
+                self._since_backoff = 0
+        metrics.PLATFORM_CONCURRENCY_LIMIT.labels(self.platform).set(self.limit)
+        self._wake()
+
+    def _wake(self):
+        free = int(self.limit) - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+
+class PlatformLimiter:
+    """Token bucket + adaptive concurrency for one platform"""
+
+    def __init__(self, platform: str, rate: float, burst: int, max_concurrency: int):
+        self.platform = platform
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = AdaptiveConcurrencyLimit(platform, max_limit=max_concurrency)
+
+    async def acquire(self):
+        """Wait until the platform has both rate and concurrency capacity"""
+        started = time.perf_counter()
+        await self.bucket.acquire()
+        await self.concurrency.acquire()
+        metrics.PLATFORM_QUEUE_WAIT.labels(self.platform).observe(time.perf_counter() - started)
+
+    def release(self, latency: float, overloaded: bool, retry_after: Optional[float] = None):
+        if retry_after:
+            logger.warning(f"{self.platform} asked us to back off for {retry_after}s")
+            self.bucket.pause(retry_after)
+        self.concurrency.release(latency, overloaded)
@@ -0,0 +1,287 @@
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Set, Tuple
+import asyncio
+import logging
+import os
+
+from sqlalchemy import bindparam, or_, update
+
+from .database import SessionLocal, engine
+from .models import PostPlatformStatus, ScheduledPost
+from .recurrence import resume_series
+from . import events
+
+logger = logging.getLogger(__name__)
+
+# What to do with posts whose scheduled_time passed while the server was down:
+#   publish    - publish them late (default)
+#   skip       - publish those late by at most CATCHUP_MAX_LATENESS_SECONDS, mark the rest skipped
+#   reschedule - publish those within the threshold, move the rest to the same time on the next day
+CATCHUP_POLICY = os.getenv("CATCHUP_POLICY", "publish").lower()
+CATCHUP_MAX_LATENESS_SECONDS = float(os.getenv("CATCHUP_MAX_LATENESS_SECONDS", "3600"))
+# How many overdue posts are published at the same time during catch-up
+CATCHUP_CONCURRENCY = int(os.getenv("CATCHUP_CONCURRENCY", "10"))
+# A post (or platform retry) whose claim was not renewed for this long belongs
+# to a process that died; it is handed back to the scheduler. Live publishers
+# renew their claims every CLAIM_SWEEP_INTERVAL_SECONDS
+PUBLISH_CLAIM_LEASE_SECONDS = float(os.getenv("PUBLISH_CLAIM_LEASE_SECONDS", "900"))
+CLAIM_SWEEP_INTERVAL_SECONDS = float(os.getenv("CLAIM_SWEEP_INTERVAL_SECONDS", "60"))
+
+_catchup_task: Optional[asyncio.Task] = None
+_sweeper_task: Optional[asyncio.Task] = None
+
+# Claims this process is publishing right now (waiting in a limiter or batch
+# queue included); the sweeper renews them so they never look abandoned
+_held_posts: Set[int] = set()
+_held_retries: Set[Tuple[int, str]] = set()
+
+
+def _next_same_time_of_day(scheduled_time: datetime, now: datetime) -> datetime:
+    days = (now - scheduled_time).days + 1
+    return scheduled_time + timedelta(days=days)
+
+
+def _drop_overdue_jobs(now: datetime):
+    """Remove overdue one-off post jobs from the jobstore in one statement.
+
+    Otherwise APScheduler unpickles every one of them on start and either
+    fires them all at once or drops them as misfired. Retry jobs are kept.
+    """
+    from apscheduler.util import datetime_to_utc_timestamp
+    from .scheduler import get_jobstore
+
+    jobstore = get_jobstore()
+    jobs_t = jobstore.jobs_t
+    jobs_t.create(jobstore.engine, checkfirst=True)
+    with jobstore.engine.begin() as connection:
+        result = connection.execute(
+            jobs_t.delete()
+            .where(jobs_t.c.next_run_time <= datetime_to_utc_timestamp(now.astimezone()))
+            .where(~jobs_t.c.id.like("%\\_retry\\_%", escape="\\"))
+        )
+    return result.rowcount
+
+
+def claim_overdue_posts(now: Optional[datetime] = None) -> Tuple[List[int], List[Tuple[int, datetime]]]:
+    """Find overdue posts and apply the catch-up policy.
+
+    Runs before the scheduler starts: one indexed query over
+    (status, scheduled_time) and bulk UPDATEs for skipped/rescheduled rows.
+    Returns (ids to publish late, [(id, new scheduled_time)]).
+    """
+    now = now or datetime.now()
+    threshold = now - timedelta(seconds=CATCHUP_MAX_LATENESS_SECONDS)
+    db = SessionLocal()
+    try:
+        rows = db.query(ScheduledPost.id, ScheduledPost.scheduled_time).filter(
+            ScheduledPost.status == "scheduled",
+            ScheduledPost.scheduled_time <= now
+        ).order_by(ScheduledPost.scheduled_time).all()
+
+        to_publish, too_late = [], []
+        for post_id, scheduled_time in rows:
+            if CATCHUP_POLICY != "publish" and scheduled_time < threshold:
+                too_late.append((post_id, scheduled_time))
+            else:
+                to_publish.append(post_id)
+
+        rescheduled = []
+        if too_late and CATCHUP_POLICY == "skip":
+            skipped_ids = [post_id for post_id, _ in too_late]
+            # Chunked to stay under the database's bound-parameter limit
+            for start in range(0, len(skipped_ids), 500):
+                db.execute(
+                    update(ScheduledPost)
+                    .where(ScheduledPost.id.in_(skipped_ids[start:start + 500]))
+                    .values(status="skipped", error_message="Missed while the scheduler was down (catch-up policy: skip)")
+                )
+        elif too_late:
+            # reschedule (unknown policies fall back to this, the least destructive option)
+            rescheduled = [
+                (post_id, _next_same_time_of_day(scheduled_time, now))
+                for post_id, scheduled_time in too_late
+            ]
+            db.connection().execute(
+                update(ScheduledPost.__table__)
+                .where(ScheduledPost.__table__.c.id == bindparam("post_id"))
+                .values(scheduled_time=bindparam("new_time")),
+                [{"post_id": post_id, "new_time": new_time} for post_id, new_time in rescheduled]
+            )
+        db.commit()
+    finally:
+        db.close()
+
+    dropped = _drop_overdue_jobs(now)
+    # Recurring series whose occurrence was just skipped move on to the next one
+    resume_series(now)
+    logger.info(
+        f"Startup recovery: {len(rows)} overdue posts ({len(to_publish)} to publish late, "
+        f"{len(too_late)} {'skipped' if CATCHUP_POLICY == 'skip' else 'rescheduled'}), "
+        f"{dropped} stale jobs removed"
+    )
+    return to_publish, rescheduled
+
+
+async def _catch_up(post_ids: List[int], rescheduled):
+    from .scheduler import publish_post, schedule_post
+
+    for index, (post_id, new_time) in enumerate(rescheduled):
+        schedule_post(post_id, new_time)
+        if index % 100 == 99:
+            # Let the server keep answering requests while jobs are re-created
+            await asyncio.sleep(0)
+
+    queue: asyncio.Queue = asyncio.Queue()
+    for post_id in post_ids:
+        queue.put_nowait(post_id)
+
+    async def worker():
+        while True:
+            try:
+                post_id = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                await publish_post(post_id)
+            except Exception as e:
+                logger.error(f"Catch-up publish of post {post_id} failed: {str(e)}")
+
+    await asyncio.gather(*(worker() for _ in range(max(1, CATCHUP_CONCURRENCY))))
+    logger.info(f"Catch-up finished: {len(post_ids)} overdue posts processed")
+
+
+def start_catchup(post_ids: List[int], rescheduled=()):
+    """Re-create jobs for rescheduled posts and publish overdue ones in the background"""
+    global _catchup_task
+    if post_ids or rescheduled:
+        _catchup_task = asyncio.create_task(_catch_up(post_ids, list(rescheduled)))
+
+
+async def stop_catchup():
+    """Cancel an unfinished catch-up; remaining posts are recovered on next start"""
+    global _catchup_task
+    if _catchup_task and not _catchup_task.done():
+        _catchup_task.cancel()
+        try:
+            await _catchup_task
+        except asyncio.CancelledError:
+            pass
+    _catchup_task = None
+
+
+def hold_claims(post_id: int, platforms: Optional[Iterable[str]] = None):
+    """Mark a claimed post (or its claimed platform retries) as being published by this process"""
+    if platforms is None:
+        _held_posts.add(post_id)
+    else:
+        _held_retries.update((post_id, platform) for platform in platforms)
+
+
+def drop_claims(post_id: int, platforms: Optional[Iterable[str]] = None):
+    if platforms is None:
+        _held_posts.discard(post_id)
+    else:
+        _held_retries.difference_update((post_id, platform) for platform in platforms)
+
+
+def renew_claims(posts: Iterable[int], retries: Iterable[Tuple[int, str]], now: Optional[datetime] = None) -> int:
+    """Move claimed_at of claims still in flight to now; returns how many rows were renewed"""
+    now = now or datetime.utcnow()
+    posts, retries = sorted(posts), sorted(retries)
+    posts_t = ScheduledPost.__table__
+    states_t = PostPlatformStatus.__table__
+    renewed = 0
+    with engine.begin() as connection:
+        for start in range(0, len(posts), 500):
+            renewed += connection.execute(
+                update(posts_t)
+                .where(posts_t.c.id.in_(posts[start:start + 500]), posts_t.c.status == "publishing")
+                .values(claimed_at=now)
+            ).rowcount
+        if retries:
+            renewed += connection.execute(
+                update(states_t)
+                .where(states_t.c.post_id == bindparam("held_post_id"), states_t.c.platform == bindparam("held_platform"),
+                       states_t.c.status == "publishing")
+                .values(claimed_at=now),
+                [{"held_post_id": post_id, "held_platform": platform} for post_id, platform in retries]
+            ).rowcount
+    return renewed
+
+
+def release_stale_claims(now: Optional[datetime] = None) -> Tuple[int, int]:
+    """Hand posts and platform retries whose claim outlived the lease back to the scheduler.
+
+    Each is released by one conditional UPDATE ... RETURNING, so with several
+    processes sweeping only one re-schedules a given row. Claims from before
+    claimed_at existed (NULL) count as stale. Returns (posts, platform retries).
+    """
+    from .scheduler import schedule_platform_retry, schedule_post
+
+    cutoff = (now or datetime.utcnow()) - timedelta(seconds=PUBLISH_CLAIM_LEASE_SECONDS)
+    posts_t = ScheduledPost.__table__
+    states_t = PostPlatformStatus.__table__
+    db = SessionLocal()
+    try:
+        posts = db.execute(
+            update(posts_t)
+            .where(posts_t.c.status == "publishing", or_(posts_t.c.claimed_at.is_(None), posts_t.c.claimed_at < cutoff))
+            .values(status="scheduled", claimed_at=None)
+            .returning(posts_t.c.id)
+        ).scalars().all()
+        retries = db.execute(
+            update(states_t)
+            .where(states_t.c.status == "publishing", or_(states_t.c.claimed_at.is_(None), states_t.c.claimed_at < cutoff))
+            .values(status="retrying", claimed_at=None)
+            .returning(states_t.c.post_id, states_t.c.platform)
+        ).all()
+        events.record_many(db, posts, "scheduled")
+        db.commit()
+    finally:
+        db.close()
+    if posts:
+        events.notify()
+
+    # Jobs on the scheduler's clock (naive local), due now
+    run_at = datetime.now()
+    for post_id in posts:
+        schedule_post(post_id, run_at)
+    for post_id, platform in retries:
+        schedule_platform_retry(post_id, platform, run_at)
+    if posts or retries:
+        logger.warning(
+            f"Released {len(posts)} posts and {len(retries)} platform retries claimed more than "
+            f"{PUBLISH_CLAIM_LEASE_SECONDS:.0f}s ago by a publisher that did not finish"
+        )
+    return len(posts), len(retries)
+
+
+async def _sweep():
+    while True:
+        try:
+            # Blocking database work; keep it off the event loop. Own claims are
+            # renewed first, so only those of processes that stopped expire
+            if _held_posts or _held_retries:
+                await asyncio.to_thread(renew_claims, set(_held_posts), set(_held_retries))
+            await asyncio.to_thread(release_stale_claims)
+        except Exception as e:
+            logger.error(f"Releasing stale publish claims failed: {str(e)}")
+        await asyncio.sleep(CLAIM_SWEEP_INTERVAL_SECONDS)
+
+
+def start_claim_sweeper():
+    """Periodically re-schedule work left in publishing by a crashed process"""
+    global _sweeper_task
+    if _sweeper_task is None:
+        _sweeper_task = asyncio.create_task(_sweep())
+
+
+async def stop_claim_sweeper():
+    global _sweeper_task
+    if _sweeper_task is not None:
+        _sweeper_task.cancel()
+        try:
+            await _sweeper_task
+        except asyncio.CancelledError:
+            pass
+    _sweeper_task = None
@@ -0,0 +1,212 @@
+"""Recurring posts.
+
+A RecurringSeries stores the rule (hourly / daily / weekly on given weekdays,
+every N units, until a date or for a number of occurrences) once. Occurrences
+are expanded lazily: only the next one exists as a ScheduledPost with its own
+post_{id} job, and publish_post() advances the series after it ran, so a
+series costs one row and one job however long it runs.
+"""
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+import json
+import logging
+
+from sqlalchemy.orm import Session
+
+from . import crud
+from .database import SessionLocal
+from .models import RecurringSeries, ScheduledPost
+
+logger = logging.getLogger(__name__)
+
+FREQUENCIES = {"hourly": timedelta(hours=1), "daily": timedelta(days=1), "weekly": timedelta(weeks=1)}
+
+# Statuses in which the current occurrence is still going to run
+PENDING_STATUSES = ("scheduled", "publishing")
+
+
+def parse_weekdays(weekdays: Optional[str]) -> List[int]:
+    return sorted({int(day) for day in weekdays.split(",") if day.strip()}) if weekdays else []
+
+
+def next_occurrence(series: RecurringSeries, after: datetime) -> Optional[datetime]:
+    """First occurrence strictly after `after`, or None once the series is past `until`"""
+    step = FREQUENCIES[series.frequency] * max(1, series.interval or 1)
+    start = series.starts_at
+    if series.frequency != "weekly" or not series.weekdays:
+        if after < start:
+            candidate = start
+        else:
+            candidate = start + step * ((after - start) // step + 1)
+    else:
+        # Weeks are counted from the Monday of the week starting_at falls in
+        first_monday = datetime.combine(start.date() - timedelta(days=start.weekday()), start.time())
+        period = max(1, series.interval or 1)
+        week = max(0, (after - first_monday).days // 7 // period * period)
+        candidate = None
+        # The current period may have no weekday left; the next one always has
+        for week in (week, week + period):
+            for day in parse_weekdays(series.weekdays):
+                run_at = first_monday + timedelta(weeks=week, days=day)
+                if run_at > after and run_at >= start:
+                    candidate = run_at
+                    break
+            if candidate:
+                break
+    if series.until and candidate > series.until:
+        return None
+    return candidate
+
+
+def _stage(db: Session, series: RecurringSeries, after: datetime, current_post_id: Optional[int]) -> Tuple[bool, Optional[ScheduledPost]]:
+    """Add the occurrence after `after` (none once the series is over) and point the
+    series at it, without committing; returns whether this call advanced the series.
+
+    Guarded by a conditional UPDATE on next_post_id, so a series is advanced
+    once per occurrence even if several processes try.
+    """
+    run_at = None
+    if series.active and (series.count is None or series.occurrences < series.count):
+        run_at = next_occurrence(series, after)
+
+    post = None
+    if run_at is not None:
+        post = ScheduledPost(
+            content=series.content,
+            image_url=series.image_url,
+            platforms=series.platforms,
+            hashtags=series.hashtags,
+            scheduled_time=run_at,
+            series_id=series.id,
+        )
+        db.add(post)
+        db.flush()
+
+    claimed = db.query(RecurringSeries).filter(
+        RecurringSeries.id == series.id,
+        RecurringSeries.next_post_id.is_(None) if current_post_id is None else RecurringSeries.next_post_id == current_post_id,
+    ).update({
+        "next_post_id": post.id if post else None,
+        "occurrences": RecurringSeries.occurrences + (1 if post else 0),
+        "active": post is not None,
+    }, synchronize_session=False)
+    return bool(claimed), post
+
+
+def _schedule(series: RecurringSeries, post: Optional[ScheduledPost]) -> Optional[ScheduledPost]:
+    """Schedule a committed occurrence, or log that the series ended"""
+    from .scheduler import schedule_post
+
+    if post is None:
+        logger.info(f"Recurring series {series.id} ended after {series.occurrences} occurrences")
+        return None
+    schedule_post(post.id, post.scheduled_time)
+    logger.info(f"Recurring series {series.id}: next occurrence is post {post.id} at {post.scheduled_time}")
+    return post
+
+
+def _materialize(db: Session, series: RecurringSeries, after: datetime, current_post_id: Optional[int]) -> Optional[ScheduledPost]:
+    """Create and schedule the occurrence after `after`, or end the series"""
+    claimed, post = _stage(db, series, after, current_post_id)
+    if not claimed:
+        db.rollback()
+        return None
+    db.commit()
+    return _schedule(series, post)
+
+
+def create_series(db: Session, content: str, platforms: List[str], frequency: str, starts_at: datetime,
+                  interval: int = 1, weekdays: Optional[List[int]] = None, until: Optional[datetime] = None,
+                  count: Optional[int] = None, hashtags: Optional[str] = None,
+                  image_url: Optional[str] = None, now: Optional[datetime] = None) -> RecurringSeries:
+    """Store a series and materialize its first occurrence (not before now) in one transaction"""
+    now = now or datetime.now()
+    series = RecurringSeries(
+        content=content,
+        image_url=image_url,
+        platforms=json.dumps(platforms),
+        hashtags=hashtags,
+        frequency=frequency,
+        interval=interval,
+        weekdays=",".join(str(day) for day in sorted(set(weekdays))) if weekdays else None,
+        starts_at=starts_at,
+        until=until,
+        count=count,
+        occurrences=0,
+        active=True,
+    )
+    db.add(series)
+    # Committed by _materialize together with the first occurrence
+    db.flush()
+    _materialize(db, series, max(now, starts_at - timedelta(microseconds=1)), None)
+    db.refresh(series)
+    return series
+
+
+def advance(db: Session, post_id: int, now: Optional[datetime] = None) -> Optional[ScheduledPost]:
+    """After an occurrence ran, schedule the series' next one (no-op for one-off posts)"""
+    post = db.query(ScheduledPost).filter(ScheduledPost.id == post_id).first()
+    if not post or post.series_id is None:
+        return None
+    series = db.query(RecurringSeries).filter(RecurringSeries.id == post.series_id).first()
+    if not series or series.next_post_id != post.id:
+        return None
+    # Occurrences missed while nothing was running are skipped, not published in a burst
+    return _materialize(db, series, max(post.scheduled_time, now or datetime.now()), post.id)
+
+
+def advance_many(db: Session, post_ids: List[int], now: Optional[datetime] = None) -> int:
+    """advance() for many posts (e.g. a bulk cancel): each affected series moves on
+    once, all in one transaction; returns how many series were advanced"""
+    now = now or datetime.now()
+    current = []
+    for start in range(0, len(post_ids), 500):
+        current.extend(db.query(RecurringSeries, ScheduledPost.scheduled_time).join(
+            ScheduledPost, RecurringSeries.next_post_id == ScheduledPost.id
+        ).filter(ScheduledPost.id.in_(post_ids[start:start + 500])).all())
+
+    staged = []
+    for series, scheduled_time in current:
+        post_id = series.next_post_id
+        claimed, post = _stage(db, series, max(scheduled_time, now), post_id)
+        if claimed:
+            staged.append((series, post))
+        elif post is not None:
+            # Another process moved this series on first
+            db.delete(post)
+            db.flush()
+    db.commit()
+    for series, post in staged:
+        _schedule(series, post)
+    return len(staged)
+
+
+def stop_series(db: Session, series: RecurringSeries) -> Optional[int]:
+    """End a series and cancel its pending occurrence; returns that post's id if it was cancelled"""
+    pending = series.next_post_id
+    series.active = False
+    series.next_post_id = None
+    db.commit()
+    if pending is not None and crud.cancel_post(db, pending):
+        return pending
+    return None
+
+
+def resume_series(now: Optional[datetime] = None) -> int:
+    """Advance series whose current occurrence will not run any more (e.g. skipped by
+    startup recovery); returns how many were advanced"""
+    db = SessionLocal()
+    advanced = 0
+    try:
+        stalled = db.query(ScheduledPost.id).join(
+            RecurringSeries, RecurringSeries.next_post_id == ScheduledPost.id
+        ).filter(
+            RecurringSeries.active.is_(True),
+            ScheduledPost.status.notin_(PENDING_STATUSES),
+        ).all()
+        for (post_id,) in stalled:
+            if advance(db, post_id, now):
+                advanced += 1
+    finally:
+        db.close()
+    return advanced
@@ -0,0 +1,246 @@
+"""Retention for post_analytics.
+
+Raw rows older than ANALYTICS_RAW_RETENTION_DAYS are folded into hourly
+buckets in post_analytics_rollup and deleted; hourly buckets older than
+ANALYTICS_HOURLY_RETENTION_DAYS are folded into daily ones. Work is done in
+batches of ANALYTICS_RETENTION_BATCH_SIZE rows, one short transaction each.
+
+On PostgreSQL with a post_analytics table partitioned by month (see the
+migration and ANALYTICS_PARTITIONING), whole expired months are aggregated
+with one GROUP BY and dropped instead of deleted row by row.
+
+Runs in the background next to the scheduler, or once from cron:
+
+    python -m app.retention
+"""
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import logging
+import os
+import re
+import time
+
+from sqlalchemy import bindparam, insert, select, text, update
+
+from .database import engine
+from .models import PostAnalytics, PostAnalyticsRollup, PostEvent
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_RETENTION = os.getenv("ANALYTICS_RETENTION", "true").lower() == "true"
+ANALYTICS_RAW_RETENTION_DAYS = float(os.getenv("ANALYTICS_RAW_RETENTION_DAYS", "30"))
+ANALYTICS_HOURLY_RETENTION_DAYS = float(os.getenv("ANALYTICS_HOURLY_RETENTION_DAYS", "365"))
+ANALYTICS_RETENTION_BATCH_SIZE = int(os.getenv("ANALYTICS_RETENTION_BATCH_SIZE", "5000"))
+ANALYTICS_RETENTION_INTERVAL_SECONDS = float(os.getenv("ANALYTICS_RETENTION_INTERVAL_SECONDS", "3600"))
+# Pause between batches so other writers get the table
+ANALYTICS_RETENTION_BATCH_PAUSE = float(os.getenv("ANALYTICS_RETENTION_BATCH_PAUSE_MS", "50")) / 1000
+# Status change events only need to outlive client reconnects
+POST_EVENTS_RETENTION_HOURS = float(os.getenv("POST_EVENTS_RETENTION_HOURS", "24"))
+# PostgreSQL only: months of partitions created ahead of time
+ANALYTICS_PARTITIONS_AHEAD = int(os.getenv("ANALYTICS_PARTITIONS_AHEAD", "2"))
+
+SUM_FIELDS = ("views", "likes", "shares", "comments")
+PARTITION_NAME = re.compile(r"^post_analytics_p(\d{4})(\d{2})$")
+
+_retention_task: Optional[asyncio.Task] = None
+
+raw_t = PostAnalytics.__table__
+rollup_t = PostAnalyticsRollup.__table__
+
+
+def bucket_start(timestamp: datetime, resolution: str) -> datetime:
+    timestamp = timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0) if resolution == "day" else timestamp
+
+
+def _merge(connection, resolution: str, aggregates: Dict[Tuple[datetime, str], List[int]]):
+    """Add [samples, views, likes, shares, comments] per (bucket, platform) to the roll-up table"""
+    existing = {}
+    buckets = sorted({bucket for bucket, _ in aggregates})
+    for start in range(0, len(buckets), 500):
+        rows = connection.execute(
+            select(rollup_t.c.id, rollup_t.c.bucket_start, rollup_t.c.platform)
+            .where(rollup_t.c.resolution == resolution)
+            .where(rollup_t.c.bucket_start.in_(buckets[start:start + 500]))
+        )
+        existing.update({(row.bucket_start, row.platform): row.id for row in rows})
+
+    inserts, updates = [], []
+    for (bucket, platform), sums in aggregates.items():
+        values = dict(zip(("samples",) + SUM_FIELDS, sums))
+        if (bucket, platform) in existing:
+            updates.append({"rollup_id": existing[(bucket, platform)], **{f"add_{k}": v for k, v in values.items()}})
+        else:
+            inserts.append({"resolution": resolution, "bucket_start": bucket, "platform": platform, **values})
+    if inserts:
+        connection.execute(insert(rollup_t), inserts)
+    if updates:
+        connection.execute(
+            update(rollup_t).where(rollup_t.c.id == bindparam("rollup_id")).values(**{
+                field: rollup_t.c[field] + bindparam(f"add_{field}") for field in ("samples",) + SUM_FIELDS
+            }),
+            updates,
+        )
+
+
+def _roll_up_batches(source, timestamp_column, resolution: str, cutoff: datetime, extra_filter=None) -> int:
+    """Fold rows of `source` older than cutoff into `resolution` buckets, batch by batch"""
+    batch_size = max(1, ANALYTICS_RETENTION_BATCH_SIZE)
+    samples = source.c.samples if "samples" in source.c else None
+    total = 0
+    while True:
+        with engine.begin() as connection:
+            query = select(
+                source.c.id, timestamp_column, source.c.platform,
+                *(source.c[field] for field in SUM_FIELDS),
+                *((samples,) if samples is not None else ())
+            ).where(timestamp_column < cutoff)
+            if extra_filter is not None:
+                query = query.where(extra_filter)
+            rows = connection.execute(query.order_by(source.c.id).limit(batch_size)).all()
+            if not rows:
+                break
+
+            aggregates: Dict[Tuple[datetime, str], List[int]] = {}
+            for row in rows:
+                sums = aggregates.setdefault((bucket_start(row[1], resolution), row.platform), [0] * 5)
+                sums[0] += row.samples if samples is not None else 1
+                for index, field in enumerate(SUM_FIELDS, start=1):
+                    sums[index] += getattr(row, field) or 0
+            _merge(connection, resolution, aggregates)
+
+            # The batch is exactly the matching rows in [first id, last id]; a range
+            # delete avoids thousands of bound parameters
+            delete = source.delete().where(source.c.id.between(rows[0].id, rows[-1].id)).where(timestamp_column < cutoff)
+            if extra_filter is not None:
+                delete = delete.where(extra_filter)
+            connection.execute(delete)
+        total += len(rows)
+        if len(rows) < batch_size:
+            break
+        time.sleep(ANALYTICS_RETENTION_BATCH_PAUSE)
+    return total
+
+
+# PostgreSQL monthly partitions
+
+def _month_start(value: datetime) -> datetime:
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(value: datetime) -> datetime:
+    return (value.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def is_partitioned(connection) -> bool:
+    if connection.dialect.name != "postgresql":
+        return False
+    return connection.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = 'post_analytics'"
+    )).first() is not None
+
+
+def _partitions(connection) -> Dict[datetime, str]:
+    names = connection.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = 'post_analytics'"
+    )).scalars()
+    partitions = {}
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            partitions[datetime(int(match.group(1)), int(match.group(2)), 1)] = name
+    return partitions
+
+
+def ensure_partitions(connection, now: datetime):
+    """Create this month's partition and ANALYTICS_PARTITIONS_AHEAD more"""
+    existing = _partitions(connection)
+    month = _month_start(now)
+    for _ in range(ANALYTICS_PARTITIONS_AHEAD + 1):
+        if month not in existing:
+            upper = _next_month(month)
+            connection.execute(text(
+                f"CREATE TABLE IF NOT EXISTS post_analytics_p{month:%Y%m} PARTITION OF post_analytics "
+                f"FOR VALUES FROM ('{month.isoformat(sep=' ')}') TO ('{upper.isoformat(sep=' ')}')"
+            ))
+        month = _next_month(month)
+
+
+def _drop_expired_partitions(connection, cutoff: datetime) -> int:
+    """Aggregate and drop every monthly partition that lies entirely before cutoff"""
+    dropped = 0
+    for month, name in sorted(_partitions(connection).items()):
+        if _next_month(month) > cutoff:
+            continue
+        rows = connection.execute(text(
+            f"SELECT date_trunc('hour', created_at) AS bucket, platform, count(*) AS samples, "
+            f"coalesce(sum(views), 0), coalesce(sum(likes), 0), coalesce(sum(shares), 0), coalesce(sum(comments), 0) "
+            f"FROM {name} GROUP BY 1, 2"
+        )).all()
+        _merge(connection, "hour", {(row[0], row[1]): list(row[2:]) for row in rows})
+        connection.execute(text(f"DROP TABLE {name}"))
+        logger.info(f"Dropped analytics partition {name} ({sum(row[2] for row in rows)} rows rolled up)")
+        dropped += 1
+    return dropped
+
+
+def run_retention(now: Optional[datetime] = None) -> dict:
+    """One retention pass; returns how many rows/partitions were rolled up"""
+    now = now or datetime.utcnow()
+    raw_cutoff = now - timedelta(days=ANALYTICS_RAW_RETENTION_DAYS)
+    hourly_cutoff = now - timedelta(days=ANALYTICS_HOURLY_RETENTION_DAYS)
+    result = {"partitions_dropped": 0}
+
+    with engine.begin() as connection:
+        if is_partitioned(connection):
+            ensure_partitions(connection, now)
+            result["partitions_dropped"] = _drop_expired_partitions(connection, raw_cutoff)
+
+    result["raw_rows"] = _roll_up_batches(raw_t, raw_t.c.created_at, "hour", raw_cutoff)
+    result["hourly_buckets"] = _roll_up_batches(
+        rollup_t, rollup_t.c.bucket_start, "day", hourly_cutoff, extra_filter=rollup_t.c.resolution == "hour"
+    )
+    with engine.begin() as connection:
+        events_t = PostEvent.__table__
+        result["post_events"] = connection.execute(
+            events_t.delete().where(events_t.c.created_at < now - timedelta(hours=POST_EVENTS_RETENTION_HOURS))
+        ).rowcount
+    logger.info(f"Analytics retention: {result}")
+    return result
+
+
+async def _run():
+    while True:
+        try:
+            # Blocking database work; keep it off the event loop
+            await asyncio.to_thread(run_retention)
+        except Exception as e:
+            logger.error(f"Analytics retention failed: {str(e)}")
+        await asyncio.sleep(ANALYTICS_RETENTION_INTERVAL_SECONDS)
+
+
+def start_retention():
+    """Run retention periodically in the background (next to the scheduler)"""
+    global _retention_task
+    if ANALYTICS_RETENTION and _retention_task is None:
+        _retention_task = asyncio.create_task(_run())
+
+
+async def stop_retention():
+    global _retention_task
+    if _retention_task is not None:
+        _retention_task.cancel()
+        try:
+            await _retention_task
+        except asyncio.CancelledError:
+            pass
+    _retention_task = None
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(run_retention())
@@ -1,13 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime, timedelta
+import json
 
 from ..database import get_db
 from ..schemas import AnalyticsSummary, AIInsight
-from .. import crud
-# from ..ai_helper import generate_analytics_insight
+from .. import crud, hashtags
+from ..platforms import get_adapters
+from ..ai_helper import generate_analytics_insight, stream_analytics_insight, stream_best_posting_time
 
 router = APIRouter()
 
@@ -72,10 +74,35 @@ async def get_ai_insight(db: Session = Depends(get_db)):
             best_performing_platform="Twitter"
         )
 
+async def _sse(items):
+    """Format {"event": ..., ...} items from the AI stream helpers as Server-Sent Events"""
+    async for item in items:
+        event = item.pop("event")
+        yield f"event: {event}\ndata: {json.dumps(item)}\n\n"
+
+def _sse_response(items) -> StreamingResponse:
+    return StreamingResponse(
+        _sse(items),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/insight/stream")
+def stream_ai_insight(db: Session = Depends(get_db)):
+    """AI insight as Server-Sent Events: `token` events with text as it is
+    generated, then `done` with the complete insight (same shape as /insight)"""
+    posts_summary = crud.get_posts_summary(db)
+    return _sse_response(stream_analytics_insight(posts_summary))
+
+@router.get("/best-time/stream")
+def stream_best_time():
+    """Best posting time recommendation as Server-Sent Events (`token`, then `done`)"""
+    return _sse_response(stream_best_posting_time())
+
 @router.get("/platform/{platform}")
 def get_platform_analytics(platform: str, db: Session = Depends(get_db)):
     """Get analytics for a specific platform"""
-    # Mock platform-specific analytics
+    # Mock platform-specific analytics, except hashtag_performance (app.hashtags)
     mock_data = {
         "platform": platform,
         "total_posts": 25,
@@ -92,34 +119,21 @@ def get_platform_analytics(platform: str, db: Session = Depends(get_db)):
             }
         ],
         "best_posting_times": ["9:00 AM", "7:00 PM"],
-        "hashtag_performance": [
-            {"hashtag": "#marketing", "usage_count": 5, "avg_engagement": 4.8},
-            {"hashtag": "#socialmedia", "usage_count": 8, "avg_engagement": 3.9}
-        ]
+        "hashtag_performance": hashtags.top_tags(db, platform)
     }
     
     return JSONResponse(content=mock_data)
 
 @router.get("/trends")
 def get_engagement_trends(
-    days: int = Query(7, description="Number of days for trend analysis"),
-    db: Session = Depends(get_db)
+    days: int = Query(7, ge=1, le=366, description="Number of days for trend analysis"),
+    platform: Optional[str] = Query(None, description="Only this platform"),
+    resolution: str = Query("day", pattern="^(day|hour)$", description="Bucket size: day or hour")
 ):
     """Get engagement trends over time"""
-    # Generate mock trend data
-    from datetime import date
-    import random
-    
-    trends = []
-    for i in range(days):
-        trend_date = date.today() - timedelta(days=i)
-        trends.append({
-            "date": trend_date.isoformat(),
-            "posts_published": random.randint(1, 5),
-            "total_engagement": random.randint(50, 300),
-            "avg_engagement_rate": round(random.uniform(2.0, 6.0), 2)
-        })
-    
-    trends.reverse()  # Show oldest to newest
-    return JSONResponse(content={"trends": trends})
-
+    if resolution == "hour" and days > 90:
+        raise HTTPException(status_code=400, detail="Hourly trends are limited to 90 days")
+    if platform is not None and platform not in get_adapters():
+        raise HTTPException(status_code=400, detail=f"Unknown platform: {platform}")
+    from ..trends import get_trends
+    return JSONResponse(content=get_trends(days, platform, resolution))
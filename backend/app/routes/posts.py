@@ -1,18 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import json
 import os
 import uuid
 from datetime import datetime
-import aiofiles
 
 from ..database import get_db
-from ..models import ScheduledPost
-from ..schemas import PostCreate, PostResponse, HashtagSuggestion, HashtagResponse, BestTimeResponse
-from .. import crud
-from ..scheduler import schedule_post, get_scheduled_jobs, publish_post
+from ..models import RecurringSeries, ScheduledPost
+from ..schemas import PostCreate, PostResponse, PostSearchResponse, RecurringSeriesCreate, RecurringSeriesResponse, BulkPostFilter, BulkCancelRequest, BulkRescheduleRequest, BulkOperationResponse, HashtagSuggestion, HashtagResponse, BestTimeResponse
+from .. import crud, events, recurrence, search
+from ..hashtags import content_hashtags
+from ..metrics import UPLOAD_BYTES
+from ..scheduler import schedule_post, get_scheduled_jobs, publish_post, cancel_scheduled_post, cancel_scheduled_posts, reschedule_posts
 from datetime import datetime, timedelta
 
 router = APIRouter()
@@ -34,6 +35,7 @@ async def create_scheduled_post(
     content: str = Form(...),
     platforms: str = Form(...),
     scheduled_time: str = Form(...),
+    hashtags: Optional[str] = Form(None),
     image: Optional[UploadFile] = File(None),
     db: Session = Depends(get_db)
 ):
@@ -54,9 +56,11 @@ async def create_scheduled_post(
             file_path = os.path.join(UPLOAD_DIR, unique_filename)
             
             # Save file
+            import aiofiles
             async with aiofiles.open(file_path, 'wb') as f:
                 content_bytes = await image.read()
                 await f.write(content_bytes)
+            UPLOAD_BYTES.labels("post_image").inc(len(content_bytes))
             
             image_url = f"/uploads/{unique_filename}"
         
@@ -64,7 +68,9 @@ async def create_scheduled_post(
         post_data = PostCreate(
             content=content,
             platforms=platforms_list,
-            scheduled_time=scheduled_dt
+            scheduled_time=scheduled_dt,
+            # Tags written in the content are indexed unless given separately
+            hashtags=hashtags or content_hashtags(content)
         )
         
         db_post = crud.create_post(db, post_data, image_url)
@@ -101,4 +107,114 @@ def get_posts(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
             except json.JSONDecodeError:
                 post.platforms = []
     
-    return posts[::-1]
\ No newline at end of file
+    return posts[::-1]
+
+@router.get("/events")
+async def post_status_events(request: Request, last_event_id: Optional[int] = None):
+    """Server-Sent Events stream of post status changes.
+
+    Reconnecting browsers send Last-Event-ID and get the events they missed;
+    ?last_event_id= does the same for other clients.
+    """
+    header = request.headers.get("last-event-id")
+    if header and header.isdigit():
+        last_event_id = int(header)
+    return StreamingResponse(
+        events.stream(last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/search", response_model=PostSearchResponse)
+def search_posts(
+    q: str = Query(..., min_length=1, description="Words to find in content and hashtags"),
+    status: Optional[str] = None,
+    platform: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    db: Session = Depends(get_db)
+):
+    """Full-text search over posts, best matches first"""
+    try:
+        posts, next_cursor = search.search_posts(db, q, status=status, platform=platform, limit=limit, cursor=cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    except search.SearchUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    
+    for post in posts:
+        if isinstance(post.platforms, str):
+            try:
+                post.platforms = json.loads(post.platforms)
+            except json.JSONDecodeError:
+                post.platforms = []
+    
+    return PostSearchResponse(results=posts, next_cursor=next_cursor)
+
+@router.post("/recurring", response_model=RecurringSeriesResponse)
+def create_recurring_post(series: RecurringSeriesCreate, db: Session = Depends(get_db)):
+    """Create a recurring post; only its next occurrence is scheduled at any time"""
+    if series.until and series.until < series.starts_at:
+        raise HTTPException(status_code=400, detail="until is before starts_at")
+    db_series = recurrence.create_series(
+        db,
+        content=series.content,
+        platforms=series.platforms,
+        frequency=series.frequency,
+        starts_at=series.starts_at,
+        interval=series.interval,
+        weekdays=series.weekdays,
+        until=series.until,
+        count=series.count,
+        hashtags=series.hashtags,
+    )
+    return db_series
+
+@router.get("/recurring", response_model=List[RecurringSeriesResponse])
+def get_recurring_posts(active_only: bool = False, db: Session = Depends(get_db)):
+    """List recurring posts"""
+    query = db.query(RecurringSeries)
+    if active_only:
+        query = query.filter(RecurringSeries.active.is_(True))
+    return query.order_by(RecurringSeries.id).all()
+
+@router.delete("/recurring/{series_id}", response_model=RecurringSeriesResponse)
+def stop_recurring_post(series_id: int, db: Session = Depends(get_db)):
+    """Stop a recurring post and cancel its pending occurrence"""
+    db_series = db.query(RecurringSeries).filter(RecurringSeries.id == series_id).first()
+    if not db_series:
+        raise HTTPException(status_code=404, detail="Recurring post not found")
+    cancelled = recurrence.stop_series(db, db_series)
+    if cancelled is not None:
+        cancel_scheduled_post(cancelled)
+    db.refresh(db_series)
+    return db_series
+
+def _bulk_filters(request: BulkPostFilter) -> dict:
+    filters = {
+        "ids": request.ids,
+        "scheduled_from": request.scheduled_from,
+        "scheduled_to": request.scheduled_to,
+        "platform": request.platform,
+    }
+    if not any(value for value in filters.values()):
+        raise HTTPException(status_code=400, detail="At least one of ids, scheduled_from, scheduled_to or platform is required")
+    if request.scheduled_from and request.scheduled_to and request.scheduled_from >= request.scheduled_to:
+        raise HTTPException(status_code=400, detail="scheduled_from must be before scheduled_to")
+    return filters
+
+@router.post("/bulk/cancel", response_model=BulkOperationResponse)
+def bulk_cancel_posts(request: BulkCancelRequest, db: Session = Depends(get_db)):
+    """Cancel every scheduled post matching the filter with one UPDATE and one batched job removal"""
+    cancelled = crud.bulk_cancel_posts(db, **_bulk_filters(request))
+    jobs = cancel_scheduled_posts([post_id for post_id, _ in cancelled])
+    # A cancelled occurrence of a recurring post is skipped; the series goes on
+    recurrence.advance_many(db, [post_id for post_id, series_id in cancelled if series_id is not None])
+    return BulkOperationResponse(posts_updated=len(cancelled), jobs_updated=jobs)
+
+@router.post("/bulk/reschedule", response_model=BulkOperationResponse)
+def bulk_reschedule_posts(request: BulkRescheduleRequest, db: Session = Depends(get_db)):
+    """Shift every scheduled post matching the filter by shift_seconds with one UPDATE and one batched job update"""
+    shifted = crud.bulk_shift_posts(db, request.shift_seconds, **_bulk_filters(request))
+    jobs = reschedule_posts(shifted)
+    return BulkOperationResponse(posts_updated=len(shifted), jobs_updated=jobs)
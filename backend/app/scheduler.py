@@ -1,17 +1,22 @@
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
-from apscheduler.executors.asyncio import AsyncIOExecutor
+from sqlalchemy import bindparam, select
 from sqlalchemy.orm import Session
-from datetime import datetime
-import httpx
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+import asyncio
 import logging
 import json
+import pickle
 import random
-import asyncio
+import time
+import os
 
 from .database import SessionLocal, DATABASE_URL
 from .models import ScheduledPost
-from . import crud
+from . import crud, metrics, recovery, recurrence
+from .profiling import profile_job
+from .query_stats import track_job
+from .platforms import PublishResult, dispatcher
+from .analytics_buffer import buffer as analytics_buffer
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -23,135 +28,301 @@ if DATABASE_URL.startswith("sqlite"):
 else:
     jobstore_url = DATABASE_URL
 
-jobstores = {
-    'default': SQLAlchemyJobStore(url=jobstore_url)
-}
-
-executors = {
-    'default': AsyncIOExecutor(),
-}
+# false: the API only writes jobs to the jobstore and `python -m app.worker`
+# processes publish them, so HTTP handling and publishing scale separately
+RUN_SCHEDULER = os.getenv("RUN_SCHEDULER", "true").lower() == "true"
 
 job_defaults = {
     'coalesce': False,
-    'max_instances': 3
+    'max_instances': 3,
+    # A burst of jobs due at once can start a little late; don't silently drop them.
+    # Longer outages are handled by the startup recovery in app.recovery.
+    'misfire_grace_time': int(os.getenv("SCHEDULER_MISFIRE_GRACE_SECONDS", "300"))
 }
 
-scheduler = AsyncIOScheduler(
-    jobstores=jobstores,
-    executors=executors,
-    job_defaults=job_defaults
-)
-
-# Mock social media APIs endpoints
-MOCK_APIS = {
-    "twitter": "https://jsonplaceholder.typicode.com/posts",  # Using JSONPlaceholder for mock
-    "facebook": "https://jsonplaceholder.typicode.com/posts",
-    "instagram": "https://jsonplaceholder.typicode.com/posts"
-}
+# APScheduler and its SQLAlchemy jobstore (own engine + table check) are only
+# built when something actually schedules or starts jobs
+_scheduler = None
+_jobstore = None
 
-async def publish_post(post_id: int):
-    """Publish a scheduled post to social media platforms"""
-    logger.info(f"!!!!!!!!!!Entered publish_post for post_id: {post_id}")
-    logger.info(f"Attempting to publish post {post_id}")
+def get_scheduler():
+    """Return the process-wide scheduler, creating it on first use"""
+    global _scheduler, _jobstore
+    if _scheduler is None:
+        from apscheduler.schedulers.asyncio import AsyncIOScheduler
+        from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+        from apscheduler.executors.asyncio import AsyncIOExecutor
+
+        _jobstore = SQLAlchemyJobStore(url=jobstore_url)
+        jobstores = {
+            'default': _jobstore
+        }
+
+        executors = {
+            'default': AsyncIOExecutor(),
+        }
+
+        _scheduler = AsyncIOScheduler(
+            jobstores=jobstores,
+            executors=executors,
+            job_defaults=job_defaults
+        )
+    return _scheduler
+
+def start_scheduler():
+    """Start running due jobs in this process (the API by default, or app.worker)"""
+    scheduler = get_scheduler()
+    if not scheduler.running:
+        scheduler.start()
+    elif not scheduler_running():
+        scheduler.resume()
+    return scheduler
+
+def start_enqueue_only():
+    """Start the scheduler paused: add_job()/remove_job() go straight to the shared
+    jobstore, but due jobs are left for a separate publisher worker"""
+    scheduler = get_scheduler()
+    if not scheduler.running:
+        scheduler.start(paused=True)
+    return scheduler
+
+def shutdown_scheduler():
+    """Stop the scheduler if it was started (running or paused)"""
+    if _scheduler is not None and _scheduler.running:
+        _scheduler.shutdown()
+
+def get_jobstore():
+    """The default (SQLAlchemy) jobstore of the scheduler"""
+    get_scheduler()
+    return _jobstore
+
+def scheduler_running() -> bool:
+    """True if this process runs due jobs (never creates the scheduler)"""
+    if _scheduler is None:
+        return False
+    from apscheduler.schedulers.base import STATE_RUNNING
+    return _scheduler.state == STATE_RUNNING
+
+# Retry policy for failed platforms (attempts include the first one)
+PUBLISH_MAX_ATTEMPTS = int(os.getenv("PUBLISH_MAX_ATTEMPTS", "4"))
+PUBLISH_RETRY_BASE_SECONDS = float(os.getenv("PUBLISH_RETRY_BASE_SECONDS", "30"))
+PUBLISH_RETRY_MAX_SECONDS = float(os.getenv("PUBLISH_RETRY_MAX_SECONDS", "3600"))
+
+def compute_retry_delay(attempts: int, retry_after: Optional[float] = None) -> float:
+    """Exponential backoff with jitter: base * 2^(attempts-1), capped, randomised to 50-100%"""
+    delay = min(PUBLISH_RETRY_MAX_SECONDS, PUBLISH_RETRY_BASE_SECONDS * (2 ** max(attempts - 1, 0)))
+    delay = random.uniform(delay / 2, delay)
+    if retry_after:
+        delay = max(delay, retry_after)
+    return delay
+
+def parse_post_platforms(post: ScheduledPost) -> List[str]:
+    # Parse platforms JSON
+    if isinstance(post.platforms, str):
+        try:
+            platforms = json.loads(post.platforms)
+        except json.JSONDecodeError:
+            try:
+                platforms = eval(post.platforms)
+            except:
+                platforms = []
+    else:
+        platforms = post.platforms
+    return platforms
+
+class PostSnapshot:
+    """What publishing needs from a post, copied out of the session in phase 1.
+
+    Plain read-only attributes, so nothing in the network phase can lazy-load
+    through (and hold on to) a database connection.
+    """
+
+    __slots__ = ("id", "content", "image_url", "hashtags", "platforms", "scheduled_time")
+
+    def __init__(self, post: ScheduledPost):
+        for name, value in (
+            ("id", post.id),
+            ("content", post.content),
+            ("image_url", post.image_url),
+            ("hashtags", post.hashtags),
+            ("platforms", tuple(parse_post_platforms(post))),
+            ("scheduled_time", post.scheduled_time),
+        ):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"PostSnapshot is read-only ({name})")
+
+    def __repr__(self):
+        return f"PostSnapshot(id={self.id}, platforms={self.platforms})"
+
+def _load_for_publish(post_id: int, platforms: Optional[List[str]]):
+    """Phase 1: claim the post (or its retrying platforms) and snapshot it.
+
+    Returns (snapshot, targets, previous attempts per target), or None if
+    there is nothing for this process to publish.
+    """
     db = SessionLocal()
+    session_started = time.perf_counter()
     try:
+        # Several publisher processes may share the jobstore; whoever claims the
+        # post (or the platform, for retries) in the database publishes it
+        if platforms is None:
+            claimed = crud.claim_post(db, post_id)
+        else:
+            claimed = [platform for platform in platforms if crud.claim_platform_retry(db, post_id, platform)]
+        if not claimed:
+            logger.info(f"Post {post_id} already claimed by another worker or no longer scheduled")
+            return None
+        if platforms is not None:
+            platforms = claimed
+        
         post = db.query(ScheduledPost).filter(ScheduledPost.id == post_id).first()
-        print("post(((())))",post)
         if not post:
             logger.error(f"Post {post_id} not found")
-            return
-        
-        logger.info(f"Publishing post {post_id} to platforms: {post.platforms}")
-        
-        # Parse platforms JSON
-        if isinstance(post.platforms, str):
-            try:
-                platforms = json.loads(post.platforms)
-            except json.JSONDecodeError:
-                try:
-                    platforms = eval(post.platforms)
-                except:
-                    platforms = []
-        else:
-            platforms = post.platforms
+            return None
+        snapshot = PostSnapshot(post)
         
-        success_count = 0
-        total_platforms = len(platforms)
+        states = crud.get_platform_states(db, post_id)
+        targets = [
+            platform for platform in (platforms or snapshot.platforms)
+            if platform not in states or states[platform].status != "published"
+        ]
+        attempts = {platform: states[platform].attempts if platform in states else 0 for platform in targets}
+        return snapshot, targets, attempts
+    finally:
+        db.close()
+        metrics.DB_SESSION_DURATION.labels("scheduler").observe(time.perf_counter() - session_started)
+
+def _save_results(snapshot: PostSnapshot, results: dict, attempts: dict, first_run: bool):
+    """Phase 3: record every platform's outcome and the post status in one transaction"""
+    post_id = snapshot.id
+    db = SessionLocal()
+    session_started = time.perf_counter()
+    retries = []
+    try:
         errors = []
+        for platform, result in results.items():
+            if result.success:
+                logger.info(f"Successfully published to {platform}")
+                crud.record_platform_attempt(db, post_id, platform, True, external_id=result.external_id)
+                
+                # Create mock analytics (written in bulk by the analytics buffer)
+                analytics_buffer.add(
+                    post_id, 
+                    platform, 
+                    views=random.randint(100, 1000),
+                    likes=random.randint(10, 100),
+                    shares=random.randint(1, 20)
+                )
+                continue
+            
+            error_msg = f"Failed to publish to {platform}"
+            if result.error:
+                error_msg += f" ({result.error})"
+            attempt = attempts[platform] + 1
+            next_attempt_at = None
+            if result.retryable and attempt < PUBLISH_MAX_ATTEMPTS:
+                next_attempt_at = datetime.now() + timedelta(seconds=compute_retry_delay(attempt, result.retry_after))
+                error_msg += f"; retry {attempt}/{PUBLISH_MAX_ATTEMPTS - 1} at {next_attempt_at.isoformat(timespec='seconds')}"
+                retries.append((platform, next_attempt_at))
+            errors.append(error_msg)
+            logger.error(error_msg)
+            crud.record_platform_attempt(db, post_id, platform, False, error=error_msg, next_attempt_at=next_attempt_at)
         
-        for platform in platforms:
-            try:
-                success = await mock_publish_to_platform(platform, post)
-                if success:
-                    success_count += 1
-                    logger.info(f"Successfully published to {platform}")
-                    
-                    # Create mock analytics
-                    crud.create_post_analytics(
-                        db, 
-                        post_id, 
-                        platform, 
-                        views=random.randint(100, 1000),
-                        likes=random.randint(10, 100),
-                        shares=random.randint(1, 20)
-                    )
-                else:
-                    error_msg = f"Failed to publish to {platform}"
-                    errors.append(error_msg)
-                    logger.error(error_msg)
-            except Exception as e:
-                error_msg = f"Error publishing to {platform}: {str(e)}"
-                errors.append(error_msg)
-                logger.error(error_msg)
-        
-        # Update post status
-        if success_count == total_platforms:
+        # Update post status from the per-platform states
+        db.flush()
+        states = crud.get_platform_states(db, post_id)
+        all_platforms = snapshot.platforms
+        published = sum(1 for platform in all_platforms if platform in states and states[platform].status == "published")
+        retrying = any(platform in states and states[platform].status == "retrying" for platform in all_platforms)
+        if published == len(all_platforms):
             status = "published"
-        elif success_count > 0:
+        elif published > 0:
             status = "partially_published"
+        elif retrying:
+            status = "retrying"
         else:
             status = "failed"
         
         error_message = "; ".join(errors) if errors else None
         crud.update_post_status(db, post_id, status, error_message)
-        
         logger.info(f"Post {post_id} status updated to: {status}")
         
-    except Exception as e:
-        logger.error(f"Error publishing post {post_id}: {str(e)}")
-        crud.update_post_status(db, post_id, "failed", str(e))
+        # Only once the attempts are committed, so a retry never sees stale state
+        for platform, next_attempt_at in retries:
+            schedule_platform_retry(post_id, platform, next_attempt_at)
+        if first_run:
+            # Recurring posts: the next occurrence is only created now
+            try:
+                recurrence.advance(db, post_id)
+            except Exception as e:
+                logger.error(f"Scheduling the next occurrence after post {post_id} failed: {str(e)}")
+    finally:
+        db.close()
+        metrics.DB_SESSION_DURATION.labels("scheduler").observe(time.perf_counter() - session_started)
+
+def _mark_failed(post_id: int, error: str, first_run: bool):
+    db = SessionLocal()
+    try:
+        crud.update_post_status(db, post_id, "failed", error)
+        if first_run:
+            recurrence.advance(db, post_id)
     finally:
         db.close()
 
-async def mock_publish_to_platform(platform: str, post: ScheduledPost) -> bool:
-    """Mock function to simulate publishing to social media platforms"""
-    logger.info(f"!!!!!!!!!!Entered mock_publish_to_platform for platform: {platform} and post_id: {post.id}")
+@profile_job()
+@track_job
+async def publish_post(post_id: int, platforms: Optional[List[str]] = None):
+    """Publish a scheduled post to social media platforms.
+
+    platforms limits the run to a subset (used by retry jobs); platforms that
+    already succeeded are always skipped so a retry never double-posts.
+
+    Three phases, so no pooled connection is held while waiting on the
+    network: a short transaction claims the post and copies it into a
+    PostSnapshot, the platform calls run with no session open, and a second
+    short transaction writes the results back.
+    """
+    logger.info(f"Attempting to publish post {post_id}")
+    first_run = platforms is None
     try:
-        # Simulate API delay
-        await asyncio.sleep(random.uniform(0.5, 2.0))
+        loaded = _load_for_publish(post_id, platforms)
+        if loaded is None:
+            return
+        snapshot, targets, attempts = loaded
+    except Exception as e:
+        logger.error(f"Error publishing post {post_id}: {str(e)}")
+        _mark_failed(post_id, str(e), first_run)
+        return
+
+    held = None if first_run else targets
+    recovery.hold_claims(post_id, held)
+    try:
+        if first_run:
+            metrics.observe_scheduler_lag(snapshot.scheduled_time)
+        logger.info(f"Publishing post {post_id} to platforms: {list(snapshot.platforms)}")
         
-        # Prepare mock post data
-        post_data = {
-            "title": post.content[:50] + "..." if len(post.content) > 50 else post.content,
-            "body": post.content,
-            "userId": 1
+        outcomes = await asyncio.gather(
+            *(publish_to_platform(platform, snapshot) for platform in targets), return_exceptions=True
+        )
+        results = {
+            platform: outcome if isinstance(outcome, PublishResult) else PublishResult(False, error=str(outcome))
+            for platform, outcome in zip(targets, outcomes)
         }
         
-        # Make mock API call
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                MOCK_APIS.get(platform, MOCK_APIS["twitter"]),
-                json=post_data,
-                timeout=10.0
-            )
-            
-            # Mock success rate (85% success for realistic simulation)
-            mock_success = random.random() > 0.15
-            return response.status_code < 400 and mock_success
-            
+        _save_results(snapshot, results, attempts, first_run)
+        
     except Exception as e:
-        logger.error(f"Mock API call failed for {platform}: {str(e)}")
-        return False
+        logger.error(f"Error publishing post {post_id}: {str(e)}")
+        _mark_failed(post_id, str(e), first_run)
+    finally:
+        recovery.drop_claims(post_id, held)
+
+async def publish_to_platform(platform: str, post: PostSnapshot) -> PublishResult:
+    """Publish to one platform through its adapter; due posts are batched per platform"""
+    logger.info(f"Publishing post {post.id} to {platform}")
+    return await dispatcher.submit(platform, post)
 
 def schedule_post(post_id: int, scheduled_time: datetime):
     """Schedule a post for publishing"""
@@ -159,12 +330,12 @@ def schedule_post(post_id: int, scheduled_time: datetime):
     try:
         # Remove existing job if it exists
         try:
-            scheduler.remove_job(f'post_{post_id}')
+            get_scheduler().remove_job(f'post_{post_id}')
         except:
             pass
         
         # Add new job
-        scheduler.add_job(
+        get_scheduler().add_job(
             publish_post,
             'date',
             run_date=scheduled_time,
@@ -173,18 +344,94 @@ def schedule_post(post_id: int, scheduled_time: datetime):
             replace_existing=True
         )
         logger.info(f"Post {post_id} scheduled for {scheduled_time}")
-        print(scheduler.get_jobs())
     except Exception as e:
         logger.error(f"Error scheduling post {post_id}: {str(e)}")
 
+def schedule_platform_retry(post_id: int, platform: str, run_at: datetime):
+    """Re-enqueue a single failed platform of a post"""
+    try:
+        get_scheduler().add_job(
+            publish_post,
+            'date',
+            run_date=run_at,
+            args=[post_id, [platform]],
+            id=f'post_{post_id}_retry_{platform}',
+            replace_existing=True,
+            # Startup recovery leaves retry jobs alone, so run them however late
+            misfire_grace_time=None
+        )
+        logger.info(f"Retry of post {post_id} on {platform} scheduled for {run_at}")
+    except Exception as e:
+        logger.error(f"Error scheduling retry of post {post_id} on {platform}: {str(e)}")
+
 def cancel_scheduled_post(post_id: int):
     """Cancel a scheduled post"""
     try:
-        scheduler.remove_job(f'post_{post_id}')
+        get_scheduler().remove_job(f'post_{post_id}')
         logger.info(f"Cancelled scheduled post {post_id}")
     except Exception as e:
         logger.error(f"Error cancelling post {post_id}: {str(e)}")
 
+def cancel_scheduled_posts(post_ids: List[int]) -> int:
+    """Remove the publish jobs of many posts in one transaction; returns how many existed"""
+    jobstore = get_jobstore()
+    jobs_t = jobstore.jobs_t
+    job_ids = [f'post_{post_id}' for post_id in post_ids]
+    removed = 0
+    with jobstore.engine.begin() as connection:
+        # Chunked to stay under the database's bound-parameter limit
+        for start in range(0, len(job_ids), 500):
+            removed += connection.execute(jobs_t.delete().where(jobs_t.c.id.in_(job_ids[start:start + 500]))).rowcount
+    logger.info(f"Cancelled {removed} scheduled jobs of {len(post_ids)} posts")
+    return removed
+
+def reschedule_posts(posts: List[Tuple[int, datetime]]) -> int:
+    """Move the publish jobs of many posts to new run times in one transaction.
+
+    Job states are rewritten in place (one SELECT per 500 jobs, one
+    executemany UPDATE) instead of a remove_job/add_job pair per post. Posts
+    without a job get one through schedule_post(). Returns how many jobs moved.
+    """
+    from apscheduler.triggers.date import DateTrigger
+    from apscheduler.util import datetime_to_utc_timestamp
+
+    scheduler = get_scheduler()
+    jobstore = get_jobstore()
+    jobs_t = jobstore.jobs_t
+    run_times = {f'post_{post_id}': run_at for post_id, run_at in posts}
+    job_ids = list(run_times)
+    moved = []
+    with jobstore.engine.begin() as connection:
+        for start in range(0, len(job_ids), 500):
+            rows = connection.execute(
+                select(jobs_t.c.id, jobs_t.c.job_state).where(jobs_t.c.id.in_(job_ids[start:start + 500]))
+            ).all()
+            for job_id, job_state in rows:
+                state = pickle.loads(job_state)
+                # Naive run times are in the scheduler's timezone, as in schedule_post()
+                state['trigger'] = DateTrigger(run_date=run_times[job_id], timezone=scheduler.timezone)
+                state['next_run_time'] = state['trigger'].run_date
+                moved.append({
+                    'job_id': job_id,
+                    'new_run_time': datetime_to_utc_timestamp(state['next_run_time']),
+                    'new_state': pickle.dumps(state, jobstore.pickle_protocol),
+                })
+        if moved:
+            connection.execute(
+                jobs_t.update().where(jobs_t.c.id == bindparam('job_id'))
+                .values(next_run_time=bindparam('new_run_time'), job_state=bindparam('new_state')),
+                moved
+            )
+    found = {job['job_id'] for job in moved}
+    for post_id, run_at in posts:
+        if f'post_{post_id}' not in found:
+            schedule_post(post_id, run_at)
+    if scheduler_running():
+        # A job may now be due earlier than the scheduler's next wakeup
+        scheduler.wakeup()
+    logger.info(f"Rescheduled {len(posts)} posts ({len(moved)} jobs moved)")
+    return len(moved)
+
 def get_scheduled_jobs():
     """Get all scheduled jobs"""
-    return scheduler.get_jobs()
\ No newline at end of file
+    return get_scheduler().get_jobs()
\ No newline at end of file
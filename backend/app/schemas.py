@@ -19,10 +19,104 @@ class PostResponse(PostBase):
     created_at: datetime
     published_at: Optional[datetime] = None
     error_message: Optional[str] = None
+    series_id: Optional[int] = None
 
     class Config:
         from_attributes = True
 
+class RecurringSeriesBase(BaseModel):
+    content: str
+    platforms: List[str]
+    hashtags: Optional[str] = None
+    frequency: str  # hourly, daily, weekly
+    interval: int = 1
+    weekdays: Optional[List[int]] = None  # weekly only, Monday = 0
+    starts_at: datetime
+    until: Optional[datetime] = None
+    count: Optional[int] = None
+
+class RecurringSeriesCreate(RecurringSeriesBase):
+    @validator("frequency")
+    def check_frequency(cls, v):
+        if v not in ("hourly", "daily", "weekly"):
+            raise ValueError("frequency must be hourly, daily or weekly")
+        return v
+
+    @validator("interval")
+    def check_interval(cls, v):
+        if v < 1:
+            raise ValueError("interval must be at least 1")
+        return v
+
+    @validator("weekdays")
+    def check_weekdays(cls, v):
+        if v and any(day < 0 or day > 6 for day in v):
+            raise ValueError("weekdays are 0 (Monday) to 6 (Sunday)")
+        return v
+
+    @validator("count")
+    def check_count(cls, v):
+        if v is not None and v < 1:
+            raise ValueError("count must be at least 1")
+        return v
+
+    @validator("starts_at", "until")
+    def to_local_time(cls, v):
+        # Posts are scheduled on the server's naive local clock
+        if v is not None and v.tzinfo is not None:
+            return v.astimezone().replace(tzinfo=None)
+        return v
+
+class RecurringSeriesResponse(RecurringSeriesBase):
+    id: int
+    image_url: Optional[str] = None
+    occurrences: int
+    next_post_id: Optional[int] = None
+    active: bool
+    created_at: datetime
+
+    @validator("platforms", pre=True)
+    def parse_platforms(cls, v):
+        return json.loads(v) if isinstance(v, str) else v
+
+    @validator("weekdays", pre=True)
+    def parse_weekdays(cls, v):
+        return [int(day) for day in v.split(",")] if isinstance(v, str) else v
+
+    class Config:
+        from_attributes = True
+
+class BulkPostFilter(BaseModel):
+    """Posts a bulk operation applies to; only posts still scheduled are touched"""
+    # No status filter: published, failed or cancelled posts have nothing left to
+    # cancel or move, and posts publishing / retrying are owned by a publisher
+    ids: Optional[List[int]] = None
+    scheduled_from: Optional[datetime] = None  # inclusive
+    scheduled_to: Optional[datetime] = None  # exclusive
+    platform: Optional[str] = None  # exact platform name, case-insensitive
+
+    @validator("ids")
+    def check_ids(cls, v):
+        if v is not None and len(v) > 10000:
+            raise ValueError("at most 10000 ids per request")
+        return v
+
+class BulkCancelRequest(BulkPostFilter):
+    pass
+
+class BulkRescheduleRequest(BulkPostFilter):
+    shift_seconds: int  # negative moves posts earlier
+
+    @validator("shift_seconds")
+    def check_shift(cls, v):
+        if v == 0:
+            raise ValueError("shift_seconds must not be 0")
+        return v
+
+class BulkOperationResponse(BaseModel):
+    posts_updated: int
+    jobs_updated: int
+
 class HashtagSuggestion(BaseModel):
     content: str
 
@@ -50,6 +144,10 @@ class CustomizationResponse(CustomizationBase):
     class Config:
         from_attributes = True
 
+class PostSearchResponse(BaseModel):
+    results: List[PostResponse]
+    next_cursor: Optional[str] = None
+
 class AnalyticsSummary(BaseModel):
     posts_published: int
     posts_scheduled: int
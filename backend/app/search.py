@@ -0,0 +1,143 @@
+"""Full-text search over post content and hashtags.
+
+SQLite: an external-content FTS5 table (scheduled_posts_fts) kept in sync by
+triggers on scheduled_posts, ranked with bm25(). PostgreSQL: a generated
+tsvector column with a GIN index, ranked with ts_rank(). Both are created by
+the Alembic migration; install() creates them for databases built with
+create_all().
+
+Results are ordered by (score, id) and paged with a keyset cursor, so deep
+pages cost the same as the first one.
+"""
+from typing import List, Optional, Tuple
+import base64
+import re
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from .crud import platform_patterns
+from .models import ScheduledPost
+
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS scheduled_posts_fts USING fts5("
+    "content, hashtags, content='scheduled_posts', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS scheduled_posts_fts_ai AFTER INSERT ON scheduled_posts BEGIN "
+    "INSERT INTO scheduled_posts_fts(rowid, content, hashtags) VALUES (new.id, new.content, new.hashtags); END",
+    "CREATE TRIGGER IF NOT EXISTS scheduled_posts_fts_ad AFTER DELETE ON scheduled_posts BEGIN "
+    "INSERT INTO scheduled_posts_fts(scheduled_posts_fts, rowid, content, hashtags) "
+    "VALUES ('delete', old.id, old.content, old.hashtags); END",
+    # Status updates don't touch the index
+    "CREATE TRIGGER IF NOT EXISTS scheduled_posts_fts_au AFTER UPDATE OF content, hashtags ON scheduled_posts BEGIN "
+    "INSERT INTO scheduled_posts_fts(scheduled_posts_fts, rowid, content, hashtags) "
+    "VALUES ('delete', old.id, old.content, old.hashtags); "
+    "INSERT INTO scheduled_posts_fts(rowid, content, hashtags) VALUES (new.id, new.content, new.hashtags); END",
+]
+SQLITE_OBJECTS = ("scheduled_posts_fts", "scheduled_posts_fts_ai", "scheduled_posts_fts_ad", "scheduled_posts_fts_au")
+# Re-indexes every post; only needed when the table or a trigger was missing
+SQLITE_REBUILD = "INSERT INTO scheduled_posts_fts(scheduled_posts_fts) VALUES ('rebuild')"
+
+POSTGRES_DDL = [
+    "ALTER TABLE scheduled_posts ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('simple', coalesce(hashtags, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(content, '')), 'B')) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_scheduled_posts_search_vector ON scheduled_posts USING gin (search_vector)",
+]
+
+# Hashtag matches count more than matches in the body
+SQLITE_SCORE = "bm25(scheduled_posts_fts, 1.0, 2.0)"
+
+
+def install(connection):
+    """Create the search index for the connection's dialect (no-op if it exists)"""
+    if connection.dialect.name == "sqlite":
+        existing = set(connection.execute(
+            text("SELECT name FROM sqlite_master WHERE name IN (:fts, :ai, :ad, :au)"),
+            dict(zip(("fts", "ai", "ad", "au"), SQLITE_OBJECTS)),
+        ).scalars())
+        if existing == set(SQLITE_OBJECTS):
+            return
+        statements = SQLITE_DDL + [SQLITE_REBUILD]
+    elif connection.dialect.name == "postgresql":
+        statements = POSTGRES_DDL
+    else:
+        return
+    for statement in statements:
+        connection.execute(text(statement))
+
+
+def _terms(query: str) -> List[str]:
+    # Only word characters reach the FTS syntax, so user input can't break the query
+    return re.findall(r"\w+", query.lower())
+
+
+def encode_cursor(score: float, post_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{score!r}:{post_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    score, _, post_id = base64.urlsafe_b64decode(cursor.encode()).decode().partition(":")
+    return float(score), int(post_id)
+
+
+class SearchUnavailable(Exception):
+    """Full-text search is not supported on this database"""
+
+
+def search_posts(db: Session, query: str, status: Optional[str] = None, platform: Optional[str] = None,
+                 limit: int = 20, cursor: Optional[str] = None) -> Tuple[List[ScheduledPost], Optional[str]]:
+    """Ranked matches for query (every word must match, the last one as a prefix).
+
+    Returns (posts, next_cursor); next_cursor is None on the last page.
+    Raises ValueError for an invalid cursor and SearchUnavailable on databases
+    other than SQLite and PostgreSQL.
+    """
+    terms = _terms(query)
+    if not terms:
+        return [], None
+
+    params = {"limit": limit + 1}
+    filters = []
+    if status:
+        filters.append("p.status = :status")
+        params["status"] = status
+    if platform:
+        # Whole element of the JSON text, as in crud's bulk filter
+        patterns = platform_patterns(platform)
+        filters.append("(" + " OR ".join(
+            f"LOWER(CAST(p.platforms AS TEXT)) LIKE :platform_{index} ESCAPE '\\'" for index in range(len(patterns))
+        ) + ")")
+        params.update({f"platform_{index}": pattern for index, pattern in enumerate(patterns)})
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        params["match"] = " ".join(f'"{term}"' for term in terms[:-1]) + f' "{terms[-1]}"*'
+        matches = (
+            f"SELECT p.id AS id, {SQLITE_SCORE} AS score FROM scheduled_posts_fts "
+            f"JOIN scheduled_posts p ON p.id = scheduled_posts_fts.rowid "
+            f"WHERE scheduled_posts_fts MATCH :match"
+        )
+    elif dialect == "postgresql":
+        params["match"] = " & ".join(terms[:-1] + [f"{terms[-1]}:*"])
+        # Negated so that, like bm25(), lower scores rank first
+        matches = (
+            "SELECT p.id AS id, -ts_rank(p.search_vector, to_tsquery('simple', :match)) AS score "
+            "FROM scheduled_posts p WHERE p.search_vector @@ to_tsquery('simple', :match)"
+        )
+    else:
+        raise SearchUnavailable(f"Full-text search is not available on {dialect}")
+    if filters:
+        matches += " AND " + " AND ".join(filters)
+
+    sql = f"SELECT id, score FROM ({matches}) AS matches"
+    if cursor:
+        params["after_score"], params["after_id"] = decode_cursor(cursor)
+        sql += " WHERE score > :after_score OR (score = :after_score AND id > :after_id)"
+    sql += " ORDER BY score, id LIMIT :limit"
+
+    rows = db.execute(text(sql), params).all()
+    page = rows[:limit]
+    next_cursor = encode_cursor(page[-1].score, page[-1].id) if len(rows) > limit else None
+
+    posts = {post.id: post for post in db.query(ScheduledPost).filter(ScheduledPost.id.in_([row.id for row in page]))}
+    return [posts[row.id] for row in page if row.id in posts], next_cursor
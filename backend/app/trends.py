@@ -0,0 +1,199 @@
+"""Engagement trends over post_analytics and its roll-ups, computed with NumPy.
+
+One query per source loads the window into arrays (raw rows pre-grouped per
+bucket by the database); merging with roll-ups, per-platform breakdowns and
+moving averages are bincount/cumsum operations instead of per-row Python loops.
+Publications are distinct posts by post_platform_status.published_at, since
+analytics rows (several per post and platform) and roll-ups don't identify posts.
+"""
+from datetime import datetime, timedelta
+from typing import Optional
+import os
+import threading
+import time
+
+import numpy as np
+from sqlalchemy import Integer, cast, func, select
+
+from .database import engine
+from .models import PostAnalytics, PostAnalyticsRollup, PostPlatformStatus
+
+TRENDS_CACHE_TTL_SECONDS = float(os.getenv("TRENDS_CACHE_TTL_SECONDS", "60"))
+# Most results cached at once; expired ones are dropped first, then the oldest
+TRENDS_CACHE_MAX_ENTRIES = int(os.getenv("TRENDS_CACHE_MAX_ENTRIES", "128"))
+# Moving average length, in buckets
+TRENDS_MOVING_AVERAGE = int(os.getenv("TRENDS_MOVING_AVERAGE", "7"))
+
+RESOLUTIONS = {"day": 86400, "hour": 3600}
+
+_cache = {}
+# Requests are served from the thread pool
+_cache_lock = threading.Lock()
+
+
+def _cache_get(key):
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        _cache.pop(key, None)
+        return None
+
+
+def _cache_set(key, value):
+    now = time.monotonic()
+    with _cache_lock:
+        for stale in [stale for stale, (expires, _) in _cache.items() if expires <= now]:
+            del _cache[stale]
+        _cache.pop(key, None)
+        while _cache and len(_cache) >= TRENDS_CACHE_MAX_ENTRIES:
+            del _cache[next(iter(_cache))]
+        _cache[key] = (now + TRENDS_CACHE_TTL_SECONDS, value)
+
+
+def _epoch(column):
+    """Seconds since the epoch, computed by the database rather than parsed in Python"""
+    if engine.dialect.name == "sqlite":
+        return cast(func.strftime("%s", column), Integer)
+    return cast(func.extract("epoch", column), Integer)
+
+
+def _load(start: datetime, end: datetime, platform: Optional[str], step: int):
+    """Load (bucket epoch, platform, samples, views, likes, shares, comments) arrays for the window.
+
+    Raw rows are grouped per bucket and platform by the database in the same
+    query, so only a few thousand rows cross the wire; roll-ups are loaded as is.
+    """
+    raw = PostAnalytics.__table__
+    rollup = PostAnalyticsRollup.__table__
+    raw_bucket = (_epoch(raw.c.created_at) // step).label("bucket")
+    raw_query = select(
+        raw_bucket, raw.c.platform, func.count(),
+        func.sum(raw.c.views), func.sum(raw.c.likes), func.sum(raw.c.shares), func.sum(raw.c.comments)
+    ).where(raw.c.created_at >= start, raw.c.created_at < end).group_by(raw_bucket, raw.c.platform)
+    rollup_query = select(
+        _epoch(rollup.c.bucket_start) // step, rollup.c.platform, rollup.c.samples,
+        rollup.c.views, rollup.c.likes, rollup.c.shares, rollup.c.comments
+    ).where(rollup.c.bucket_start >= start, rollup.c.bucket_start < end)
+    if platform:
+        raw_query = raw_query.where(raw.c.platform == platform)
+        rollup_query = rollup_query.where(rollup.c.platform == platform)
+
+    with engine.connect() as connection:
+        rows = connection.execute(raw_query).fetchall() + connection.execute(rollup_query).fetchall()
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=object), np.zeros((5, 0))
+    buckets, platforms, *values = zip(*rows)
+    return (
+        np.array(buckets, dtype=np.int64),
+        np.array(platforms, dtype=object),
+        np.array(values, dtype=np.float64).reshape(5, len(rows)),
+    )
+
+
+def _load_publications(start: datetime, end: datetime, platform: Optional[str], step: int):
+    """Distinct published posts as (bucket, platform, posts) and overall (bucket, posts) arrays"""
+    states = PostPlatformStatus.__table__
+    bucket = (_epoch(states.c.published_at) // step).label("bucket")
+    conditions = [states.c.status == "published", states.c.published_at >= start, states.c.published_at < end]
+    if platform:
+        conditions.append(states.c.platform == platform)
+    # One row per (post, platform), so count() is distinct posts per platform
+    per_platform_query = select(bucket, states.c.platform, func.count()).where(*conditions).group_by(bucket, states.c.platform)
+    overall_query = select(bucket, func.count(func.distinct(states.c.post_id))).where(*conditions).group_by(bucket)
+
+    with engine.connect() as connection:
+        per_platform = connection.execute(per_platform_query).fetchall()
+        overall = connection.execute(overall_query).fetchall()
+    buckets, platforms, counts = zip(*per_platform) if per_platform else ((), (), ())
+    overall_buckets, overall_counts = zip(*overall) if overall else ((), ())
+    return (
+        np.array(buckets, dtype=np.int64), np.array(platforms, dtype=object), np.array(counts, dtype=np.float64),
+        np.array(overall_buckets, dtype=np.int64), np.array(overall_counts, dtype=np.float64),
+    )
+
+
+def _moving_average(values: np.ndarray, length: int) -> np.ndarray:
+    """Trailing mean over `length` buckets (shorter at the start of the series)"""
+    sums = np.cumsum(values)
+    sums[length:] = sums[length:] - sums[:-length]
+    return sums / np.minimum(np.arange(1, len(values) + 1), length)
+
+
+def compute_trends(days: int, platform: Optional[str] = None, resolution: str = "day",
+                   now: Optional[datetime] = None) -> dict:
+    """Per-bucket publications, engagement and engagement rate for the last `days` days (UTC)"""
+    step = RESOLUTIONS[resolution]
+    now = now or datetime.utcnow()
+    start = now.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days - 1)
+    end = start + timedelta(days=days)
+    first_bucket = int((start - datetime(1970, 1, 1)).total_seconds()) // step
+    n = days * 86400 // step
+
+    buckets, platforms, (samples, views, likes, shares, comments) = _load(start, end, platform, step)
+    index = np.clip(buckets - first_bucket, 0, max(n - 1, 0))
+    pub_buckets, pub_platforms, pub_counts, overall_buckets, overall_counts = _load_publications(start, end, platform, step)
+    pub_index = np.clip(pub_buckets - first_bucket, 0, max(n - 1, 0))
+
+    posts = np.bincount(np.clip(overall_buckets - first_bucket, 0, max(n - 1, 0)), weights=overall_counts, minlength=n)
+    engagement_values = likes + shares + comments
+    engagement = np.bincount(index, weights=engagement_values, minlength=n)
+    bucket_views = np.bincount(index, weights=views, minlength=n)
+    bucket_rate_numerator = np.bincount(index, weights=likes + shares, minlength=n)
+    rate = np.divide(bucket_rate_numerator * 100, bucket_views, out=np.zeros(n), where=bucket_views > 0)
+    moving = _moving_average(engagement, max(1, TRENDS_MOVING_AVERAGE))
+
+    names = np.unique(np.concatenate([platforms.astype(str), pub_platforms.astype(str)]))
+    combined = np.searchsorted(names, platforms.astype(str)) * n + index
+    per_platform_posts = np.bincount(
+        np.searchsorted(names, pub_platforms.astype(str)) * n + pub_index, weights=pub_counts, minlength=len(names) * n
+    ).reshape(len(names), n)
+    per_platform_engagement = np.bincount(
+        combined, weights=engagement_values, minlength=len(names) * n
+    ).reshape(len(names), n)
+
+    labels = [
+        (start + timedelta(seconds=step * i)).isoformat(timespec="hours" if resolution == "hour" else "auto")
+        for i in range(n)
+    ]
+    if resolution == "day":
+        labels = [label[:10] for label in labels]
+
+    posts_list = posts.astype(np.int64).tolist()
+    engagement_list = engagement.astype(np.int64).tolist()
+    rate_list = np.round(rate, 2).tolist()
+    moving_list = np.round(moving, 2).tolist()
+    return {
+        "days": days,
+        "resolution": resolution,
+        "platform": platform,
+        "trends": [
+            {
+                "date": labels[i],
+                "posts_published": posts_list[i],
+                "total_engagement": engagement_list[i],
+                "avg_engagement_rate": rate_list[i],
+                "engagement_moving_avg": moving_list[i],
+            }
+            for i in range(n)
+        ],
+        "platforms": {
+            str(name): {
+                "posts_published": per_platform_posts[row].astype(np.int64).tolist(),
+                "total_engagement": per_platform_engagement[row].astype(np.int64).tolist(),
+                "total_posts": int(per_platform_posts[row].sum()),
+            }
+            for row, name in enumerate(names)
+        },
+    }
+
+
+def get_trends(days: int, platform: Optional[str] = None, resolution: str = "day") -> dict:
+    """compute_trends() cached per (window, platform, resolution) for TRENDS_CACHE_TTL_SECONDS"""
+    key = (days, platform, resolution)
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
+    result = compute_trends(days, platform, resolution)
+    _cache_set(key, result)
+    return result
@@ -0,0 +1,102 @@
+"""Publisher worker: runs the scheduler and the publishing pipeline without the API.
+
+Run the API with RUN_SCHEDULER=false so it only writes jobs to the shared
+jobstore, and start one or more workers against the same database:
+
+    RUN_SCHEDULER=false uvicorn app.main:app --workers 4
+    python -m app.worker
+
+Workers coordinate through the database: a post (or a platform retry) is
+claimed with a conditional UPDATE before it is published, so a job picked up
+by two workers is only published once.
+"""
+import asyncio
+import logging
+import os
+import signal
+
+from .database import engine, schema_is_current
+from .models import Base
+from .scheduler import shutdown_scheduler, start_scheduler
+from .platforms import close_http_client
+from .analytics_buffer import buffer as analytics_buffer
+from . import engagement, hashtags, recovery, retention, search
+
+logger = logging.getLogger(__name__)
+
+# Jobs added by API processes are not announced to the worker's scheduler;
+# it re-reads the jobstore this often
+WORKER_POLL_SECONDS = float(os.getenv("WORKER_POLL_SECONDS", "1.0"))
+# Serve /metrics on this port (0 = off); with PROMETHEUS_MULTIPROC_DIR the API already exposes them
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "0"))
+
+
+def _start_metrics_server():
+    from prometheus_client import start_http_server
+    from . import metrics
+
+    if metrics.PROMETHEUS_MULTIPROC_DIR:
+        from prometheus_client import CollectorRegistry, multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        start_http_server(WORKER_METRICS_PORT, registry=registry)
+    else:
+        start_http_server(WORKER_METRICS_PORT)
+    logger.info(f"Worker metrics on :{WORKER_METRICS_PORT}/metrics")
+
+
+async def run():
+    """Run until SIGINT/SIGTERM"""
+    if not schema_is_current():
+        Base.metadata.create_all(bind=engine)
+        with engine.begin() as connection:
+            search.install(connection)
+    if WORKER_METRICS_PORT:
+        _start_metrics_server()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            # Windows: fall back to KeyboardInterrupt
+            pass
+
+    overdue, rescheduled = recovery.claim_overdue_posts()
+    scheduler = start_scheduler()
+    recovery.start_catchup(overdue, rescheduled)
+    recovery.start_claim_sweeper()
+    engagement.start_poller()
+    retention.start_retention()
+    hashtags.start_stats()
+    logger.info(f"Publisher worker started (pid {os.getpid()})")
+
+    try:
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=WORKER_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                scheduler.wakeup()
+    finally:
+        logger.info("Publisher worker shutting down...")
+        await recovery.stop_catchup()
+        await recovery.stop_claim_sweeper()
+        await engagement.stop_poller()
+        await retention.stop_retention()
+        await hashtags.stop_stats()
+        shutdown_scheduler()
+        await close_http_client()
+        analytics_buffer.flush()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
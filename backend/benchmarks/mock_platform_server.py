@@ -0,0 +1,171 @@
+"""Local stand-in for the social platform APIs.
+
+Run it and point the backend at it with PLATFORM_API_BASE_URL:
+
+    python -m benchmarks.mock_platform_server --port 9100 --latency lognormal:0.15,0.4 --error-rate 0.02
+    PLATFORM_API_BASE_URL=http://127.0.0.1:9100 uvicorn app.main:app
+
+Latency specs:
+    fixed:<seconds>
+    uniform:<low>,<high>
+    lognormal:<median>,<sigma>
+"""
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+import argparse
+import asyncio
+import itertools
+import math
+import random
+import time
+import uvicorn
+
+
+def parse_latency(spec: str):
+    """Turn a latency spec into a zero-argument sampler using the given RNG"""
+    kind, _, raw_args = spec.partition(":")
+    args = [float(value) for value in raw_args.split(",") if value]
+
+    def build(rng: random.Random):
+        if kind == "fixed":
+            return lambda: args[0]
+        if kind == "uniform":
+            return lambda: rng.uniform(args[0], args[1])
+        if kind == "lognormal":
+            mu = math.log(args[0])
+            return lambda: rng.lognormvariate(mu, args[1])
+        raise ValueError(f"Unknown latency distribution: {spec}")
+
+    return build
+
+
+class TokenBucket:
+    """Classic token bucket; rate tokens/second, up to burst tokens"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Consume a token; returns 0 on success or seconds until one is available"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+def create_app(latency: str = "fixed:0.05", error_rate: float = 0.0,
+               rate_limit: float = 0.0, burst: int = 10, seed: int = 42) -> FastAPI:
+    """Build the stand-in platform app.
+
+    rate_limit is requests/second per platform (0 disables it); requests over
+    the limit get 429 with a Retry-After header.
+    """
+    rng = random.Random(seed)
+    sample_latency = parse_latency(latency)(rng)
+    buckets = {}
+    ids = itertools.count(1)
+    created = {}
+    stats = {"requests": 0, "errors": 0, "rate_limited": 0, "batched_posts": 0, "metrics_requests": 0}
+
+    app = FastAPI(title="Mock platform API")
+    app.state.stats = stats
+
+    async def simulate(platform: str):
+        """Apply rate limiting, latency and random failures; returns an error response or None"""
+        stats["requests"] += 1
+        if rate_limit > 0:
+            bucket = buckets.setdefault(platform, TokenBucket(rate_limit, burst))
+            wait = bucket.take()
+            if wait > 0:
+                stats["rate_limited"] += 1
+                return JSONResponse(
+                    status_code=429,
+                    content={"error": "rate limited"},
+                    headers={"Retry-After": str(max(1, math.ceil(wait)))},
+                )
+        await asyncio.sleep(sample_latency())
+        if rng.random() < error_rate:
+            stats["errors"] += 1
+            return JSONResponse(status_code=503, content={"error": "upstream unavailable"})
+        return None
+
+    def new_post_id() -> int:
+        post_id = next(ids)
+        created[post_id] = time.monotonic()
+        return post_id
+
+    @app.post("/{platform}/posts")
+    async def create_post(platform: str, request: Request):
+        await request.body()
+        error = await simulate(platform)
+        if error is not None:
+            return error
+        return JSONResponse(status_code=201, content={"id": new_post_id(), "platform": platform})
+
+    @app.post("/{platform}/posts/batch")
+    async def create_posts_batch(platform: str, request: Request):
+        """One request, one latency sample and one rate-limit token for the whole batch"""
+        body = await request.json()
+        error = await simulate(platform)
+        if error is not None:
+            return error
+        stats["batched_posts"] += len(body.get("posts", []))
+        return {"results": [{"status": 201, "id": new_post_id()} for _ in body.get("posts", [])]}
+
+    @app.get("/{platform}/posts/metrics")
+    async def get_post_metrics(platform: str, ids: str = ""):
+        """Cumulative engagement of published posts, growing with their age; one token per request"""
+        error = await simulate(platform)
+        if error is not None:
+            return error
+        stats["metrics_requests"] += 1
+        now = time.monotonic()
+        results = []
+        for raw_id in ids.split(","):
+            post_id = int(raw_id) if raw_id.isdigit() else None
+            if post_id not in created:
+                continue
+            views = int(100 * math.log1p((now - created[post_id]) / 60) * (1 + post_id % 7 / 10))
+            results.append({
+                "id": post_id, "views": views, "likes": views // 12, "shares": views // 60, "comments": views // 40,
+            })
+        return {"results": results}
+
+    @app.post("/{platform}/media")
+    async def upload_media(platform: str, request: Request):
+        await request.body()
+        error = await simulate(platform)
+        if error is not None:
+            return error
+        return JSONResponse(status_code=201, content={"id": f"media-{next(ids)}"})
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in social platform API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", default="fixed:0.05", help="fixed:S | uniform:LO,HI | lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="requests/second per platform, 0 = unlimited")
+    parser.add_argument("--burst", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    app = create_app(args.latency, args.error_rate, args.rate_limit, args.burst, args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+"""Replay a day of scheduled posts through the real scheduler on a virtual clock.
+
+Posts are scheduled with schedule_post() and published by APScheduler calling
+publish_post(), as in production; only the platform calls are stubbed (with a
+configurable latency and error rate). The event loop runs on a virtual clock
+that moves at real speed while the process is busy and jumps over idle waits,
+so a day of traffic replays in the time the scheduler actually spends working.
+Dispatch lag therefore reflects real scheduler / database cost.
+
+Reports dispatch lag (virtual time from scheduled_time to publish start),
+peak in-flight posts and platform calls, SQL statements per post (app
+database and jobstore) and memory growth, as JSON like benchmarks.run.
+
+    cd backend
+    python -m benchmarks.replay --posts 1000000 -o replay.json
+    python -m benchmarks.replay --schedule social_scheduler.db      # recorded schedule_time values
+    python -m benchmarks.replay --schedule times.txt --latency lognormal:0.3,0.5 --error-rate 0.02
+    python -m benchmarks.replay --baseline replay.json              # exit 1 on >10% regressions
+"""
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform as py_platform
+import random
+import resource
+import selectors
+import sqlite3
+import sys
+import tempfile
+import time
+
+from benchmarks.mock_platform_server import parse_latency
+from benchmarks.run import BACKEND_DIR, _git_revision, _percentile, compare, unfinished_posts
+
+COMPARED_METRICS = (
+    "dispatch_lag_p50_s", "dispatch_lag_p99_s", "app_statements_per_post",
+    "jobstore_statements_per_post", "rss_growth_mb", "wall_seconds",
+)
+
+# Relative share of posts per local hour for the diurnal profile: quiet nights,
+# peaks around 9:00, 13:00 and 19:00
+DIURNAL_WEIGHTS = (
+    1, 1, 1, 1, 1, 2, 4, 7, 10, 12, 9, 8,
+    9, 11, 8, 7, 7, 8, 10, 12, 10, 7, 4, 2,
+)
+
+
+class VirtualClock:
+    """Epoch-seconds clock that runs at real speed and can jump forward"""
+
+    def __init__(self, start: datetime):
+        self.offset = start.timestamp() - time.monotonic()
+        self.skipped = 0.0
+
+    def time(self) -> float:
+        return time.monotonic() + self.offset
+
+    def skip(self, seconds: float):
+        self.offset += seconds
+        self.skipped += seconds
+
+
+class _SkippingSelector:
+    """Selector that, instead of blocking until the next timer, advances the clock to it"""
+
+    def __init__(self, selector: selectors.BaseSelector, clock: VirtualClock):
+        self._selector = selector
+        self._clock = clock
+
+    def select(self, timeout=None):
+        events = self._selector.select(0)
+        if events or timeout is None or timeout <= 0:
+            return events or (self._selector.select(timeout) if timeout is None else [])
+        self._clock.skip(timeout)
+        return []
+
+    def __getattr__(self, name):
+        return getattr(self._selector, name)
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    def __init__(self, clock: VirtualClock):
+        super().__init__(_SkippingSelector(selectors.DefaultSelector(), clock))
+        self._clock = clock
+
+    def time(self) -> float:
+        return self._clock.time()
+
+
+def _virtual_datetime(clock: VirtualClock):
+    class VirtualDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.fromtimestamp(clock.time(), tz)
+
+        @classmethod
+        def utcnow(cls):
+            return datetime.fromtimestamp(clock.time(), timezone.utc).replace(tzinfo=None)
+
+    return VirtualDatetime
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        # Peak rather than current RSS (kilobytes on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+def synthetic_schedule(posts: int, day: datetime, profile: str, round_seconds: int, seed: int):
+    """Due times for `posts` posts over the day, snapped to round_seconds like times people pick"""
+    rng = random.Random(seed)
+    if profile == "uniform":
+        hours = [rng.randrange(24) for _ in range(posts)]
+    elif profile == "diurnal":
+        hours = rng.choices(range(24), weights=DIURNAL_WEIGHTS, k=posts)
+    else:
+        raise ValueError(f"Unknown profile: {profile}")
+    times = []
+    for hour in hours:
+        seconds = hour * 3600 + rng.randrange(3600)
+        if round_seconds > 1:
+            seconds -= seconds % round_seconds
+        times.append(day + timedelta(seconds=seconds))
+    return sorted(times)
+
+
+def recorded_schedule(path: str, day: datetime):
+    """Due times from a database (scheduled_posts.scheduled_time) or a file of ISO datetimes,
+    shifted so the earliest lands at the start of the replayed day"""
+    if path.endswith((".db", ".sqlite", ".sqlite3")):
+        with sqlite3.connect(path) as connection:
+            values = [row[0] for row in connection.execute("SELECT scheduled_time FROM scheduled_posts")]
+    else:
+        values = [line.strip() for line in Path(path).read_text().splitlines() if line.strip()]
+    times = sorted(datetime.fromisoformat(str(value)).replace(tzinfo=None) for value in values if value)
+    if not times:
+        raise ValueError(f"No scheduled times in {path}")
+    shift = day - times[0]
+    return [value + shift for value in times]
+
+
+class ReplayStats:
+    __slots__ = ("lags", "calls_in_flight", "peak_calls", "posts_in_flight", "peak_posts",
+                 "app_statements", "jobstore_statements", "rss_samples")
+
+    def __init__(self):
+        self.lags = []
+        self.calls_in_flight = 0
+        self.peak_calls = 0
+        self.posts_in_flight = {}
+        self.peak_posts = 0
+        self.app_statements = 0
+        self.jobstore_statements = 0
+        self.rss_samples = []
+
+
+async def _replay(schedule, args, clock: VirtualClock, stats: ReplayStats) -> dict:
+    from sqlalchemy import event, func
+    from app import metrics
+    from app import scheduler as app_scheduler
+    from app.analytics_buffer import buffer as analytics_buffer
+    from app.database import SessionLocal, engine
+    from app.models import ScheduledPost
+    from app.platforms import PublishResult
+
+    rng = random.Random(args.seed)
+    latency = parse_latency(args.latency)(rng)
+    platforms = args.platforms.split(",")
+
+    async def platform_call(platform: str, post) -> PublishResult:
+        stats.calls_in_flight += 1
+        stats.peak_calls = max(stats.peak_calls, stats.calls_in_flight)
+        stats.posts_in_flight[post.id] = stats.posts_in_flight.get(post.id, 0) + 1
+        stats.peak_posts = max(stats.peak_posts, len(stats.posts_in_flight))
+        try:
+            await asyncio.sleep(latency())
+            if rng.random() < args.error_rate:
+                return PublishResult(False, status_code=503, error="simulated outage")
+            return PublishResult(True, status_code=200, external_id=f"{platform}-{post.id}")
+        finally:
+            stats.calls_in_flight -= 1
+            remaining = stats.posts_in_flight.pop(post.id) - 1
+            if remaining:
+                stats.posts_in_flight[post.id] = remaining
+
+    observe_scheduler_lag = metrics.observe_scheduler_lag
+
+    def record_lag(scheduled_time: datetime):
+        stats.lags.append(clock.time() - scheduled_time.timestamp())
+        observe_scheduler_lag(scheduled_time)
+
+    app_scheduler.publish_to_platform = platform_call
+    metrics.observe_scheduler_lag = record_lag
+
+    scheduler = app_scheduler.get_scheduler()
+    jobstore = app_scheduler.get_jobstore()
+
+    def count(counter):
+        def listener(*_):
+            setattr(stats, counter, getattr(stats, counter) + 1)
+        return listener
+
+    event.listen(engine, "before_cursor_execute", count("app_statements"))
+    event.listen(jobstore.engine, "before_cursor_execute", count("jobstore_statements"))
+
+    # Loading the recorded posts stands in for the API and is not measured
+    with engine.begin() as connection:
+        first_id = (connection.execute(func.max(ScheduledPost.id).select()).scalar() or 0) + 1
+        for start in range(0, len(schedule), 50000):
+            connection.execute(ScheduledPost.__table__.insert(), [
+                {"content": f"Replayed post {start + i}", "platforms": json.dumps(platforms),
+                 "scheduled_time": due, "status": "scheduled"}
+                for i, due in enumerate(schedule[start:start + 50000])
+            ])
+    stats.app_statements = 0
+
+    scheduler.start()
+    wall_started = time.perf_counter()
+    virtual_started = clock.time()
+    rss_start = _rss_mb()
+
+    async def sample_memory():
+        while True:
+            stats.rss_samples.append(_rss_mb())
+            await asyncio.sleep(args.sample_seconds)
+
+    sampler = asyncio.create_task(sample_memory())
+
+    # Posts are created `lead` seconds before they are due, like users scheduling ahead
+    lead = timedelta(seconds=args.lead_seconds)
+    for index, due in enumerate(schedule):
+        wait = (due - lead).timestamp() - clock.time()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        app_scheduler.schedule_post(first_id + index, due)
+        if index % 100 == 99:
+            await asyncio.sleep(0)
+
+    deadline = schedule[-1].timestamp() + args.drain_seconds
+    while clock.time() < deadline:
+        db = SessionLocal()
+        try:
+            unfinished = unfinished_posts(db)
+        finally:
+            db.close()
+        if unfinished == 0:
+            break
+        await asyncio.sleep(10)
+
+    sampler.cancel()
+    scheduler.shutdown(wait=False)
+    analytics_buffer.flush()
+    wall_seconds = time.perf_counter() - wall_started
+    rss_end = _rss_mb()
+
+    db = SessionLocal()
+    try:
+        statuses = dict(db.query(ScheduledPost.status, func.count(ScheduledPost.id)).group_by(ScheduledPost.status).all())
+    finally:
+        db.close()
+
+    posts = len(schedule)
+    lags = stats.lags
+    return {
+        "posts": posts,
+        "statuses": statuses,
+        "virtual_seconds": round(clock.time() - virtual_started, 1),
+        "wall_seconds": round(wall_seconds, 2),
+        "speedup": round((clock.time() - virtual_started) / wall_seconds, 1) if wall_seconds else None,
+        "dispatch_lag_p50_s": _round(_percentile(lags, 0.50)),
+        "dispatch_lag_p90_s": _round(_percentile(lags, 0.90)),
+        "dispatch_lag_p99_s": _round(_percentile(lags, 0.99)),
+        "dispatch_lag_p999_s": _round(_percentile(lags, 0.999)),
+        "dispatch_lag_max_s": _round(max(lags) if lags else None),
+        "dispatched": len(lags),
+        "peak_posts_in_flight": stats.peak_posts,
+        "peak_platform_calls_in_flight": stats.peak_calls,
+        "app_statements_per_post": round(stats.app_statements / posts, 2),
+        "jobstore_statements_per_post": round(stats.jobstore_statements / posts, 2),
+        "rss_start_mb": round(rss_start, 1),
+        "rss_peak_mb": round(max(stats.rss_samples + [rss_end]), 1),
+        "rss_end_mb": round(rss_end, 1),
+        "rss_growth_mb": round(rss_end - rss_start, 1),
+    }
+
+
+def _round(value):
+    return round(value, 4) if value is not None else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Virtual-clock scheduler replay")
+    parser.add_argument("--posts", type=int, default=20000, help="synthetic posts over the day")
+    parser.add_argument("--profile", choices=("diurnal", "uniform"), default="diurnal")
+    parser.add_argument("--round-seconds", type=int, default=300,
+                        help="snap synthetic times to this many seconds (bursts at round times)")
+    parser.add_argument("--schedule", help="replay scheduled_time values from a .db file or a file of ISO datetimes")
+    parser.add_argument("--platforms", default="twitter,facebook", help="comma-separated platforms per post")
+    parser.add_argument("--latency", default="lognormal:0.3,0.5", help="stubbed platform call latency (as the mock server)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of platform calls failing with 503")
+    parser.add_argument("--lead-seconds", type=float, default=3600, help="how long before due time posts are scheduled")
+    parser.add_argument("--drain-seconds", type=float, default=7200, help="virtual time allowed after the last due post")
+    parser.add_argument("--sample-seconds", type=float, default=60, help="virtual seconds between memory samples")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("-o", "--output", help="write the JSON report to this file")
+    parser.add_argument("--baseline", help="previous JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative regression")
+    args = parser.parse_args()
+
+    day = (datetime.now() + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    if args.schedule:
+        schedule = recorded_schedule(args.schedule, day)
+        name = f"replay_{Path(args.schedule).stem}"
+    else:
+        schedule = synthetic_schedule(args.posts, day, args.profile, args.round_seconds, args.seed)
+        name = f"replay_{args.profile}_{args.posts}"
+
+    # A fresh database on tmpfs where available: the replay measures the
+    # scheduler, not the disk's fsync latency
+    workdir = tempfile.mkdtemp(prefix="bench-replay-", dir="/dev/shm" if os.path.isdir("/dev/shm") else None)
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir}/replay.db"
+    sys.path.insert(0, str(BACKEND_DIR))
+    os.chdir(workdir)
+    logging.basicConfig(level=logging.WARNING)
+
+    import apscheduler.executors.base
+    import apscheduler.schedulers.base
+    import apscheduler.triggers.date
+    from app import crud, metrics, recurrence, scheduler as app_scheduler
+    from app.database import engine
+    from app.models import Base
+
+    Base.metadata.create_all(bind=engine)
+    logging.getLogger("app").setLevel(logging.WARNING)
+    logging.getLogger("apscheduler").setLevel(logging.ERROR)
+
+    clock = VirtualClock(schedule[0] - timedelta(seconds=args.lead_seconds))
+    virtual_datetime = _virtual_datetime(clock)
+    for module in (apscheduler.schedulers.base, apscheduler.executors.base, apscheduler.triggers.date,
+                   app_scheduler, crud, recurrence, metrics):
+        module.datetime = virtual_datetime
+
+    stats = ReplayStats()
+    loop = VirtualTimeLoop(clock)
+    asyncio.set_event_loop(loop)
+    try:
+        results = loop.run_until_complete(_replay(schedule, args, clock, stats))
+    finally:
+        loop.close()
+
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "tolerance")}
+    report = {
+        "suite": "replay",
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "git_revision": _git_revision(),
+        "python": py_platform.python_version(),
+        "scenarios": [{"name": name, "config": config, "results": results}],
+    }
+
+    output = json.dumps(report, indent=2, default=str)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    print(output)
+
+    if args.baseline:
+        regressions = compare(report, json.loads(Path(args.baseline).read_text()), args.tolerance, COMPARED_METRICS)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
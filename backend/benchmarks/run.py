@@ -0,0 +1,343 @@
+"""Publish pipeline benchmark suite.
+
+Each scenario runs in a fresh process with its own SQLite database and a local
+stand-in platform server (benchmarks/mock_platform_server.py), creates posts
+through the HTTP API, lets the real scheduler publish them and reports
+throughput, publish latency, scheduler lag and DB time as JSON.
+
+    cd backend
+    python -m benchmarks.run                          # all scenarios
+    python -m benchmarks.run -s burst_100 -o out.json
+    python -m benchmarks.run --baseline out.json      # fail on >10% regressions
+"""
+from datetime import datetime, timedelta
+from pathlib import Path
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import multiprocessing
+import os
+import platform as py_platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+# Not finished while in any of these
+UNFINISHED_STATUSES = ("scheduled", "publishing", "retrying")
+
+SCENARIOS = {
+    "burst_100": {
+        "description": "100 posts due at the same instant, three platforms each",
+        "posts": 100, "spread_seconds": 0, "platforms": ["twitter", "facebook", "instagram"],
+        "latency": "lognormal:0.1,0.5", "error_rate": 0.0, "rate_limit": 0,
+    },
+    "spread_300": {
+        "description": "300 posts spread evenly over 15 seconds",
+        "posts": 300, "spread_seconds": 15, "platforms": ["twitter", "facebook"],
+        "latency": "lognormal:0.1,0.5", "error_rate": 0.0, "rate_limit": 0,
+    },
+    "flaky_100": {
+        "description": "100 posts against a platform failing 10% of requests",
+        "posts": 100, "spread_seconds": 0, "platforms": ["twitter", "facebook"],
+        "latency": "lognormal:0.1,0.5", "error_rate": 0.1, "rate_limit": 0,
+    },
+    "rate_limited_100": {
+        "description": "100 posts against a platform limited to 20 req/s",
+        "posts": 100, "spread_seconds": 0, "platforms": ["twitter"],
+        "latency": "fixed:0.05", "error_rate": 0.0, "rate_limit": 20,
+    },
+}
+
+# Metrics where a higher value is better; everything else numeric is lower-is-better
+HIGHER_IS_BETTER = {"throughput_posts_per_s", "published"}
+COMPARED_METRICS = (
+    "throughput_posts_per_s", "end_to_end_p50_s", "end_to_end_p99_s",
+    "publish_latency_p50_s", "publish_latency_p99_s",
+    "scheduler_lag_p50_s", "scheduler_lag_p99_s", "db_time_per_post_ms",
+)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def unfinished_posts(db) -> int:
+    """Posts still scheduled, publishing or retrying, or with a platform that is
+    (a partially_published post can still have a retry pending)"""
+    from app.models import PostPlatformStatus, ScheduledPost
+
+    posts = db.query(ScheduledPost.id).filter(ScheduledPost.status.in_(UNFINISHED_STATUSES))
+    platforms = db.query(PostPlatformStatus.post_id).filter(PostPlatformStatus.status.in_(UNFINISHED_STATUSES))
+    return posts.union(platforms).count()
+
+
+def _percentile(values, q: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _histogram_quantile(histogram, q: float):
+    """Estimate a quantile from a prometheus_client histogram (all label sets merged)"""
+    buckets = {}
+    for metric in histogram.collect():
+        for sample in metric.samples:
+            if sample.name.endswith("_bucket"):
+                bound = float(sample.labels["le"])
+                buckets[bound] = buckets.get(bound, 0.0) + sample.value
+    bounds = sorted(buckets)
+    if not bounds or buckets[bounds[-1]] == 0:
+        return None
+    rank = q * buckets[bounds[-1]]
+    previous_bound, previous_count = 0.0, 0.0
+    for bound in bounds:
+        count = buckets[bound]
+        if count >= rank:
+            if bound == float("inf"):
+                return previous_bound
+            if count == previous_count:
+                return bound
+            return previous_bound + (bound - previous_bound) * (rank - previous_count) / (count - previous_count)
+        previous_bound, previous_count = bound, count
+    return previous_bound
+
+
+def _histogram_totals(histogram):
+    """(sum, count) over all label sets"""
+    total, count = 0.0, 0.0
+    for metric in histogram.collect():
+        for sample in metric.samples:
+            if sample.name.endswith("_sum"):
+                total += sample.value
+            elif sample.name.endswith("_count"):
+                count += sample.value
+    return total, count
+
+
+def _start_platform_server(config: dict, port: int):
+    import uvicorn
+    from benchmarks.mock_platform_server import create_app
+
+    platform_app = create_app(
+        latency=config["latency"],
+        error_rate=config["error_rate"],
+        rate_limit=config["rate_limit"],
+    )
+    server = uvicorn.Server(uvicorn.Config(platform_app, host="127.0.0.1", port=port, log_level="error"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, platform_app
+
+
+async def _drive(config: dict, timeout: float) -> dict:
+    import httpx
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import NullPool
+    from app import metrics
+    from app.main import app
+    from app.database import DATABASE_URL
+    from app.models import ScheduledPost
+    from app.scheduler import get_scheduler
+
+    # Observe through a separate, unpooled engine so polling never competes
+    # with the application's connection pool
+    ObserverSession = sessionmaker(bind=create_engine(DATABASE_URL, poolclass=NullPool))
+
+    scheduler = get_scheduler()
+    scheduler.start()
+    posts = config["posts"]
+    # Leave enough headroom for the API to accept every post before the first one is due
+    lead = config.get("lead_seconds", 2 + posts * 0.02)
+    first_due = datetime.now() + timedelta(seconds=lead)
+
+    transport = httpx.ASGITransport(app=app)
+    create_started = time.perf_counter()
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        for i in range(posts):
+            offset = config["spread_seconds"] * i / max(posts - 1, 1)
+            response = await client.post("/api/posts/", data={
+                "content": f"Benchmark post {i} #benchmark",
+                "platforms": json.dumps(config["platforms"]),
+                "scheduled_time": (first_due + timedelta(seconds=offset)).isoformat(),
+            })
+            response.raise_for_status()
+    create_seconds = time.perf_counter() - create_started
+
+    deadline = time.monotonic() + lead + config["spread_seconds"] + timeout
+    while time.monotonic() < deadline:
+        db = ObserverSession()
+        try:
+            pending = unfinished_posts(db)
+        finally:
+            db.close()
+        if pending == 0:
+            break
+        await asyncio.sleep(0.25)
+    scheduler.shutdown(wait=False)
+
+    db = ObserverSession()
+    try:
+        rows = db.query(ScheduledPost.status, ScheduledPost.scheduled_time, ScheduledPost.published_at).all()
+    finally:
+        db.close()
+
+    statuses = {}
+    for status, _, _ in rows:
+        statuses[status] = statuses.get(status, 0) + 1
+    published = [(scheduled, done) for status, scheduled, done in rows if status == "published" and done]
+    end_to_end = [(done - scheduled).total_seconds() for scheduled, done in published]
+    if published:
+        window = (max(done for _, done in published) - min(scheduled for scheduled, _ in published)).total_seconds()
+    else:
+        window = 0.0
+    db_time, db_queries = _histogram_totals(metrics.DB_QUERY_DURATION)
+
+    return {
+        "posts": posts,
+        "create_seconds": round(create_seconds, 3),
+        "creation_overran_schedule": create_seconds > lead,
+        "statuses": statuses,
+        "published": statuses.get("published", 0),
+        "unfinished": sum(statuses.get(status, 0) for status in UNFINISHED_STATUSES),
+        "throughput_posts_per_s": round(len(published) / window, 3) if window > 0 else None,
+        "end_to_end_p50_s": _percentile(end_to_end, 0.50),
+        "end_to_end_p99_s": _percentile(end_to_end, 0.99),
+        # Estimated from histogram buckets, like Prometheus' histogram_quantile()
+        "publish_latency_p50_s": _histogram_quantile(metrics.PUBLISH_LATENCY, 0.50),
+        "publish_latency_p99_s": _histogram_quantile(metrics.PUBLISH_LATENCY, 0.99),
+        "scheduler_lag_p50_s": _histogram_quantile(metrics.SCHEDULER_LAG, 0.50),
+        "scheduler_lag_p99_s": _histogram_quantile(metrics.SCHEDULER_LAG, 0.99),
+        "db_time_s": round(db_time, 4),
+        "db_queries": int(db_queries),
+        "db_time_per_post_ms": round(db_time * 1000 / posts, 3) if posts else None,
+    }
+
+
+def _scenario_process(name: str, config: dict, timeout: float, queue):
+    """Child process entry point: isolated DB, metrics registry and scheduler"""
+    sys.path.insert(0, str(BACKEND_DIR))
+    workdir = tempfile.mkdtemp(prefix=f"bench-{name}-")
+    port = _free_port()
+    os.environ.update({
+        "TZ": "UTC",  # published_at is UTC, scheduled_time is local: keep them comparable
+        "DATABASE_URL": f"sqlite:///{workdir}/benchmark.db",
+        "PLATFORM_API_BASE_URL": f"http://127.0.0.1:{port}",
+        "SQL_INSTRUMENTATION": "true",
+        "SQL_SLOW_QUERY_MS": "1000000",
+        # Retries have to finish within the scenario's drain timeout
+        "PUBLISH_RETRY_BASE_SECONDS": "0.5",
+    })
+    time.tzset()
+    os.chdir(workdir)
+
+    try:
+        server, platform_app = _start_platform_server(config, port)
+        # Configure logging first so the app's basicConfig(level=INFO) becomes a no-op
+        logging.basicConfig(level=logging.WARNING)
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            from app.database import engine
+            from app.models import Base
+
+            Base.metadata.create_all(bind=engine)
+            result = asyncio.run(_drive(config, timeout))
+        result["platform_server"] = dict(platform_app.state.stats)
+        server.should_exit = True
+        queue.put({"name": name, "config": config, "results": result})
+    except Exception as e:
+        queue.put({"name": name, "config": config, "error": repr(e)})
+
+
+def run_scenario(name: str, config: dict, timeout: float = 60.0) -> dict:
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_scenario_process, args=(name, config, timeout, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def compare(report: dict, baseline: dict, tolerance: float, compared_metrics=COMPARED_METRICS):
+    """Return a list of human-readable regressions against a previous report"""
+    regressions = []
+    previous = {scenario["name"]: scenario for scenario in baseline.get("scenarios", [])}
+    for scenario in report["scenarios"]:
+        old = previous.get(scenario["name"])
+        if not old or "results" not in old or "results" not in scenario:
+            continue
+        for metric in compared_metrics:
+            new_value, old_value = scenario["results"].get(metric), old["results"].get(metric)
+            if not new_value or not old_value:
+                continue
+            change = (new_value - old_value) / old_value
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            if worse > tolerance:
+                regressions.append(
+                    f"{scenario['name']}.{metric}: {old_value} -> {new_value} ({change:+.1%})"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Publish pipeline benchmarks")
+    parser.add_argument("-s", "--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="scenario to run (repeatable, default: all)")
+    parser.add_argument("--posts", type=int, help="override the number of posts for every scenario")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait for publishing to drain")
+    parser.add_argument("-o", "--output", help="write the JSON report to this file")
+    parser.add_argument("--baseline", help="previous JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative regression")
+    args = parser.parse_args()
+
+    report = {
+        "suite": "publish_pipeline",
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "git_revision": _git_revision(),
+        "python": py_platform.python_version(),
+        "scenarios": [],
+    }
+    for name in args.scenario or list(SCENARIOS):
+        config = dict(SCENARIOS[name])
+        if args.posts:
+            config["posts"] = args.posts
+        print(f"Running {name}...", file=sys.stderr)
+        report["scenarios"].append(run_scenario(name, config, args.timeout))
+
+    output = json.dumps(report, indent=2, default=str)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    print(output)
+
+    if args.baseline:
+        regressions = compare(report, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Cold start benchmark: import time of app.main and time to first 200 on /health.
+
+Every run starts a fresh interpreter against a migrated SQLite database, like an
+autoscaled replica coming up.
+
+    cd backend
+    python -m benchmarks.startup --runs 5 -o startup.json
+    python -m benchmarks.startup --baseline startup.json
+    python -m benchmarks.startup --pending 100000   # with a large backlog of scheduled posts
+"""
+from datetime import datetime, timedelta
+from pathlib import Path
+import argparse
+import json
+import os
+import platform as py_platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from benchmarks.run import BACKEND_DIR, _free_port, _git_revision, compare
+
+COMPARED_METRICS = ("import_seconds_median", "first_200_seconds_median")
+
+IMPORT_SNIPPET = (
+    "import time; started = time.perf_counter(); import app.main; "
+    "print(time.perf_counter() - started)"
+)
+
+
+def _environment(workdir: str) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{workdir}/startup.db",
+        "PYTHONPATH": str(BACKEND_DIR),
+    })
+    return env
+
+
+def _prepare_database(workdir: str, pending: int):
+    """Create the schema and stamp it with the Alembic head, like a migrated deployment"""
+    env = _environment(workdir)
+    subprocess.run(
+        [sys.executable, "-c",
+         "from app.database import engine; from app.models import Base; Base.metadata.create_all(engine)"],
+        cwd=workdir, env=env, check=True, capture_output=True,
+    )
+    subprocess.run(
+        [sys.executable, "-m", "alembic", "-c", str(BACKEND_DIR / "alembic.ini"), "stamp", "head"],
+        cwd=BACKEND_DIR, env=env, check=True, capture_output=True,
+    )
+    if pending:
+        start = datetime.now() + timedelta(days=1)
+        with sqlite3.connect(f"{workdir}/startup.db") as connection:
+            connection.executemany(
+                "INSERT INTO scheduled_posts (content, platforms, scheduled_time, status, created_at) "
+                "VALUES (?, ?, ?, 'scheduled', ?)",
+                [
+                    (f"Pending post {i}", '["twitter"]', (start + timedelta(seconds=i)).isoformat(sep=" "),
+                     datetime.utcnow().isoformat(sep=" "))
+                    for i in range(pending)
+                ],
+            )
+
+
+def measure_import(workdir: str) -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        cwd=workdir, env=_environment(workdir), check=True, capture_output=True, text=True,
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def measure_first_200(workdir: str, timeout: float = 60.0) -> float:
+    port = _free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir, env=_environment(workdir), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.005)
+        raise TimeoutError(f"/health did not answer within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold start benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--pending", type=int, default=0, help="scheduled posts to seed the database with")
+    parser.add_argument("-o", "--output", help="write the JSON report to this file")
+    parser.add_argument("--baseline", help="previous JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative regression")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-startup-")
+    _prepare_database(workdir, args.pending)
+
+    imports, first_200 = [], []
+    for _ in range(args.runs):
+        imports.append(measure_import(workdir))
+        first_200.append(measure_first_200(workdir))
+
+    report = {
+        "suite": "startup",
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "git_revision": _git_revision(),
+        "python": py_platform.python_version(),
+        "scenarios": [{
+            "name": f"cold_start_pending_{args.pending}",
+            "config": {"runs": args.runs, "pending": args.pending},
+            "results": {
+                "import_seconds_median": round(statistics.median(imports), 4),
+                "import_seconds_min": round(min(imports), 4),
+                "first_200_seconds_median": round(statistics.median(first_200), 4),
+                "first_200_seconds_min": round(min(first_200), 4),
+            },
+        }],
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    print(output)
+
+    if args.baseline:
+        regressions = compare(report, json.loads(Path(args.baseline).read_text()), args.tolerance, COMPARED_METRICS)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()